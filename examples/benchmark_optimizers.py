@@ -0,0 +1,60 @@
+# examples/benchmark_optimizers.py
+#
+# Compara o tempo de cálculo dos pesos dos otimizadores do portfoliolib com o SharpeOptimizer,
+# usando curvas de equity sintéticas (modelo de fatores) para diferentes números de traders.
+#
+# Uso: python examples/benchmark_optimizers.py [n_traders ...]
+
+import sys
+import time
+import numpy as np
+import pandas as pd
+from portfoliolib import (SharpeOptimizer, SimplexOptimizer, MinVarianceOptimizer,
+                          RiskParityOptimizer, HRPOptimizer, EqualWeightOptimizer, FrontierOptimizer)
+
+
+def synthetic_equity_curves(n_traders: int, n_days: int = 504, n_factors: int = 5, seed: int = 0) -> pd.DataFrame:
+    """Curvas de equity de traders com retornos correlacionados por fatores comuns."""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (n_days, n_factors))
+    loadings = rng.normal(0, 0.5, (n_factors, n_traders))
+    drift = rng.normal(0.0003, 0.0004, n_traders)
+    vol = rng.uniform(0.005, 0.02, n_traders)
+    returns = factors @ loadings + drift + rng.normal(0, 1, (n_days, n_traders)) * vol
+    equity = 100000.0 * np.cumprod(1 + returns, axis=0)
+    return pd.DataFrame(equity, columns=[f"trader_{i}" for i in range(n_traders)])
+
+
+def benchmark(optimizer, curves: pd.DataFrame, repeat: int = 3) -> float:
+    """Menor tempo (s) de calculate_weights em repeat execuções."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        optimizer.calculate_weights(curves)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    sizes = [int(n) for n in sys.argv[1:]] or [20, 100, 300]
+    optimizers = {
+        'EqualWeight': EqualWeightOptimizer(),
+        'Sharpe': SharpeOptimizer(),
+        'Simplex (sharpe)': SimplexOptimizer('sharpe'),
+        'MinVariance': MinVarianceOptimizer(),
+        'RiskParity (ERC)': RiskParityOptimizer(),
+        'HRP': HRPOptimizer(),
+        'Frontier (50 pontos)': FrontierOptimizer(50),
+    }
+    rows = {}
+    for n in sizes:
+        curves = synthetic_equity_curves(n)
+        rows[n] = {name: benchmark(optimizer, curves) * 1000 for name, optimizer in optimizers.items()}
+        print(f"{n} traders: " + ", ".join(f"{name} {ms:.1f} ms" for name, ms in rows[n].items()))
+
+    table = pd.DataFrame(rows).T
+    table.index.name = 'traders'
+    print("\nTempo de calculate_weights (ms):")
+    print(table.round(2).to_string())
+    print("\nRazão em relação ao SharpeOptimizer:")
+    print((table.div(table['Sharpe'], axis=0)).round(2).to_string())
@@ -21,6 +21,9 @@ from pytz import timezone
 
 ############
 from mt5se.mt5se import *
+import mt5se.indicators as indicators
+import mt5se.panel as panel
+import mt5se.cache as cache
 import mt5se.tech as tech
 import mt5se.finmath as finmath
 import mt5se.sampleTraders as sampleTraders
@@ -28,4 +31,7 @@ import mt5se.analysts as analysts
 import mt5se.backtest as backtest
 import mt5se.operations as operations
 import mt5se.ai_utils as ai_utils
+import mt5se.retraining as retraining
+import mt5se.validation as validation
+import mt5se.screener as screener
 
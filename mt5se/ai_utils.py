@@ -99,79 +99,90 @@ private boolean createArff(String fileName,StringBuffer tab,
 	}
 
 """
+import os
+import hashlib
+import threading
+import queue
+from datetime import timedelta
+from concurrent.futures import ProcessPoolExecutor
 import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
 import pandas as pd
-
+from mt5se.indicators import StreamingIndicator
+
+
+# sliding windows
+def lagged_view(values,timeFrame):
+	"""
+	Returns a read only strided view (no copy) of shape (samples, timeFrame*features) over values (time x features),
+	where row i holds bars i..i+timeFrame-1 (all features of each bar, in time order).
+	Since the timeFrame consecutive rows of a C-contiguous matrix are contiguous in memory, every row is just a
+	window of the flattened matrix that starts features elements after the previous one.
+	"""
+	values=np.ascontiguousarray(values)
+	if values.ndim==1:
+		values=values.reshape(-1,1)
+	nfeatures=values.shape[1]
+	if len(values)<timeFrame:
+		return np.empty((0,timeFrame*nfeatures),dtype=values.dtype)
+	return sliding_window_view(values.ravel(),timeFrame*nfeatures)[::nfeatures]
+
+def sliding_dataset(values,target,timeFrame,horizon=1,copy=False):
+	"""
+	Returns X,y where X[i] holds bars i..i+timeFrame-1 of values (time x features), as in lagged_view(),
+	and y[i]=target[i+timeFrame-1+horizon], the target horizon bars after the last bar of X[i].
+	All (samples=len(values)-timeFrame-horizon+1) aligned samples are returned. X is a strided view, or one
+	contiguous copy if copy=True
+	"""
+	target=np.asarray(target)
+	samples=max(len(values)-timeFrame-horizon+1,0)
+	X=lagged_view(values,timeFrame)[:samples]
+	if copy:
+		X=np.ascontiguousarray(X)
+	y=target[timeFrame-1+horizon:timeFrame-1+horizon+samples]
+	return X,y
 
 # X is an array of arrays with values 
 def ts2Dataset(X,timeFrame):
-    ds=np.array()
-    for line in range(len(X)-timeFrame):
-        for x in X:
-            for i in range(timeFrame):
-                ds=ds.append(x[line+i])
-
-    n_fields=len(X)
-    size=len(ds)
-    ds.reshape(size/(n_fields*timeFrame),n_fields*timeFrame)
-    return ds
+	"""
+	Returns a matrix with len(X[0])-timeFrame lines, where line t holds X[0][t..t+timeFrame-1], X[1][t..t+timeFrame-1], ...
+	"""
+	X=np.asarray(X,dtype=float)
+	if X.ndim==1:
+		X=X.reshape(1,-1)
+	n_fields,size=X.shape
+	lines=max(size-timeFrame,0)
+	ds=sliding_window_view(X,timeFrame,axis=1)[:,:lines] # (fields, lines, timeFrame)
+	return np.ascontiguousarray(ds.transpose(1,0,2)).reshape(lines,n_fields*timeFrame)
+
 # From bars to dataset
 def bars2Dataset(bars,target,timeFrame,horizon=1):
-	ds=pd.DataFrame()
-	lines=len(bars)
-	for time in range(timeFrame):
-		for s in bars.keys():
-			aux=bars[s][time:lines-horizon-timeFrame+time]
-			aux=aux.reset_index(drop=True)
-			#del aux['index']
-			#print('aux type=',type(aux))
-			ds[s+str(time)]=aux
-	#print(bars[target][timeFrame+horizon:].shift(-timeFrame),' timeF=',timeFrame,' h=',horizon  )
-	aux=bars[target][timeFrame+horizon-1:]
-	aux=aux.reset_index(drop=True)
-	#del aux['index']
-	ds['target']=aux
+	"""
+	Returns a DataFrame with columns <field><time> for time in 0..timeFrame-1 and 'target', where line i holds
+	bars i..i+timeFrame-1 and target=bars[target][i+timeFrame+horizon-1]. It has len(bars)-timeFrame-horizon lines
+	"""
+	lines=max(len(bars)-horizon-timeFrame,0)
+	columns=[s+str(time) for time in range(timeFrame) for s in bars.keys()]
+	X=lagged_view(bars.to_numpy(),timeFrame)[:lines]
+	ds=pd.DataFrame(np.ascontiguousarray(X),columns=columns,copy=False)
+	ds['target']=np.asarray(bars[target])[timeFrame+horizon-1:timeFrame+horizon-1+lines]
 	return ds
 
 def fromDs2NpArrayAllBut(ds,fieldList):
-	all=ds.keys()
-	for f in fieldList:
-		all=all.drop(f)
-	fieldList=[]
-	for f in all:
-		fieldList.append(f)
-	return fromDs2NpArray(ds,fieldList)
+	return fromDs2NpArray(ds,[f for f in ds.keys() if f not in fieldList])
 
 # se.ai_utils.get_X( dataframe,features list, time frame ) -> returns a np array
 # From bars to dataset
 def get_X(df,attr_list,timeFrame,horizon):
-	ds=pd.DataFrame()
-	lines=len(df)
-	for time in range(timeFrame):
-		for s in df.keys():
-			if s in attr_list:
-				aux=df[s][time:lines-timeFrame-horizon+time]
-				aux=aux.reset_index(drop=True)
-				#del aux['index']
-				#print('aux type=',type(aux))
-				ds[s+str(time)]=aux
-	#print(bars[target][timeFrame+horizon:].shift(-timeFrame),' timeF=',timeFrame,' h=',horizon  )
-	#aux=aux.reset_index(drop=True)
-	#del aux['index']
-	return np.array(ds)
+	lines=max(len(df)-timeFrame-horizon,0)
+	fields=[s for s in df.keys() if s in attr_list]
+	return np.ascontiguousarray(lagged_view(df[fields].to_numpy(),timeFrame)[:lines])
 
 
 # se.ai_utils.get_X( dataframe,features list, time frame ) -> returns a np array
 # From bars to dataset
 def get_Y(df,target,timeFrame,horizon):
-	Y=pd.DataFrame()
-	lines=len(df)
-	aux=df[target][timeFrame+horizon:]
-	aux=aux.reset_index(drop=True)
-	#del aux['index']
-	Y['target']=aux
-
-	return np.array(Y)
+	return np.asarray(df[target])[timeFrame+horizon:].reshape(-1,1)
 
 def get_XY(df,feature_list,target,timeFrame,horizon):
 	return get_X(df,feature_list,timeFrame,horizon),get_Y(df,target,timeFrame,horizon)
@@ -183,14 +194,92 @@ def fromDs2NpArray(ds,fieldList=[]):
 		return None
 	elif nfields==1:
 		return np.array(ds[fieldList[0]])
-	else:
-		a=np.array(ds[fieldList[0]])
-	
-	for i in range(1,nfields):
-		a=np.column_stack((a,np.array(ds[fieldList[i]])))
-	return a
-
-
+	return ds[list(fieldList)].to_numpy()
+
+
+
+# streaming mini-batches
+def bars_chunks(symbol,start,end,timeFrame=None,chunk=timedelta(days=30)):
+	"""
+	Yields the bars of symbol from start to end as consecutive DataFrames, each one covering chunk of time,
+	so that a long history is never loaded at once. Bars already yielded (same time) are not repeated
+	"""
+	import mt5se.mt5se as se
+	if timeFrame is None:
+		timeFrame=se.DAILY
+	last=None
+	t=start
+	while t<end:
+		t_end=min(t+chunk,end)
+		bars=se.get_bars(symbol,t,t_end,timeFrame)
+		if bars is not None and len(bars)>0:
+			if last is not None:
+				bars=bars[bars['time']>last]
+			if len(bars)>0:
+				last=bars['time'].iloc[-1]
+				yield bars.reset_index(drop=True)
+		t=t_end
+
+def _read_ahead(chunks,feature_list,target,dtype,q,stop):
+	"""
+	Producer of batch_generator(): reads chunks and puts (features,target) arrays in q, then None.
+	Exceptions are passed to the consumer through q
+	"""
+	def put(item):
+		while not stop.is_set():
+			try:
+				q.put(item,timeout=0.1)
+				return True
+			except queue.Full:
+				pass
+		return False
+	try:
+		for bars in chunks:
+			if stop.is_set():
+				return
+			item=(np.asarray(bars[feature_list],dtype=dtype),np.asarray(bars[target],dtype=dtype))
+			if not put(item):
+				return
+		put(None)
+	except Exception as e:
+		put(e)
+
+def batch_generator(chunks,feature_list,target,timeFrame,horizon=1,batch_size=1024,prefetch=2,dtype=np.float64):
+	"""
+	Yields (X,y) mini-batches of lagged windows (see sliding_dataset()) from an iterable of bars DataFrames in time
+	order, like bars_chunks() or pd.read_csv(file,chunksize=n). The last timeFrame+horizon-1 rows (plus the samples
+	that did not fill a batch) of each chunk are carried to the next one, so windows crossing chunk boundaries are
+	built exactly as if the whole history were in memory. Memory use depends on the chunk size and prefetch only:
+	a background thread reads up to prefetch chunks ahead while the consumer trains.
+	"""
+	q=queue.Queue(maxsize=max(prefetch,1))
+	stop=threading.Event()
+	reader=threading.Thread(target=_read_ahead,args=(chunks,list(feature_list),target,dtype,q,stop),daemon=True)
+	reader.start()
+	keep=timeFrame+horizon-1 # rows needed to continue the windows in the next chunk
+	tail_x=np.empty((0,len(feature_list)),dtype=dtype)
+	tail_y=np.empty(0,dtype=dtype)
+	try:
+		while True:
+			item=q.get()
+			if item is None:
+				break
+			if isinstance(item,Exception):
+				raise item
+			x=np.concatenate((tail_x,item[0]))
+			yv=np.concatenate((tail_y,item[1]))
+			X,y=sliding_dataset(x,yv,timeFrame,horizon)
+			full=len(X)//batch_size*batch_size
+			for i in range(0,full,batch_size):
+				yield np.ascontiguousarray(X[i:i+batch_size]),y[i:i+batch_size].copy()
+			start=min(full,max(len(x)-keep,0)) # first row of the samples not yielded yet
+			tail_x=x[start:].copy()
+			tail_y=yv[start:].copy()
+		X,y=sliding_dataset(tail_x,tail_y,timeFrame,horizon)
+		if len(X)>0:
+			yield np.ascontiguousarray(X),y.copy()
+	finally:
+		stop.set()
 
 def discTarget(discretizer,target):
 	x=np.array(target)
@@ -252,3 +341,140 @@ def y(y,timeFrame):
 		  	 
             """
 
+
+############### model training and cache
+
+def model_key(X,Y,**params):
+    """
+        Returns a content hash (hex string) of a training window (X,Y), the model hyperparameters and the
+            sklearn and joblib versions. Models trained on the same data with the same parameters have the same key,
+            and models pickled by another version are never loaded
+    """
+    import sklearn, joblib
+    h=hashlib.sha256()
+    h.update(('sklearn='+sklearn.__version__+',joblib='+joblib.__version__).encode())
+    for a in (X,Y):
+        a=np.ascontiguousarray(a)
+        h.update(str((a.shape,a.dtype.str)).encode())
+        h.update(a.tobytes())
+    h.update(repr(sorted(params.items())).encode())
+    return h.hexdigest()
+
+
+class ModelCache:
+    """
+        Content-addressed cache of fitted models in a folder. Each model is saved with joblib in <path>/<key>.joblib
+            and loaded memory-mapped (mmap_mode='r'), so the model arrays are shared with the OS page cache instead of copied
+    """
+    def __init__(self,path='model_cache',mmap_mode='r'):
+        self.path=path
+        self.mmap_mode=mmap_mode
+
+    def file(self,key):
+        return os.path.join(self.path,key+'.joblib')
+
+    def load(self,key):
+        """
+            Returns the model saved with key or None
+        """
+        import joblib
+        f=self.file(key)
+        if not os.path.isfile(f):
+            return None
+        try:
+            return joblib.load(f,mmap_mode=self.mmap_mode)
+        except Exception as e:
+            print('Could not load model ',f,': ',e)
+            return None
+
+    def save(self,key,model):
+        """
+            Saves model with key (writes to a temporary file first, so readers never see a partial file)
+        """
+        import joblib
+        os.makedirs(self.path,exist_ok=True)
+        f=self.file(key)
+        tmp=f+'.'+str(os.getpid())+'.tmp'
+        joblib.dump(model,tmp)
+        os.replace(tmp,f)
+
+
+def _fit(estimator,X,Y):
+    return estimator.fit(X,Y)
+
+
+def fit_many(estimators,datasets,n_jobs=None):
+    """
+        Fits estimators[i] with datasets[i]=(X,Y) and returns the list of fitted estimators.
+            With n_jobs!=1 the fits are fanned out over a process pool (n_jobs=None uses all cpus)
+    """
+    if n_jobs==1 or len(estimators)<=1:
+        return [_fit(e,X,Y) for e,(X,Y) in zip(estimators,datasets)]
+    workers=min(len(estimators),n_jobs if n_jobs is not None else (os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures=[pool.submit(_fit,e,X,Y) for e,(X,Y) in zip(estimators,datasets)]
+        return [f.result() for f in futures]
+
+
+############### incremental features for per bar inference
+
+class LaggedFeatures(StreamingIndicator):
+    """
+        Keeps the lagged feature row of the last timeFrame bars, in the same column order used by bars2Dataset
+        (bar t-timeFrame+1 fields, ..., bar t fields), so a model trained with bars2Dataset can predict with it.
+            update(bar) costs O(features): each bar is written twice in a buffer of 2*timeFrame rows, so the last
+            timeFrame bars are always a contiguous slice and the row is returned without copying.
+            sync(bars) feeds only the new bars (see mt5se.indicators.StreamingIndicator).
+        The row is a view of the internal buffer, copy it if it should be kept after the next update
+    """
+    def __init__(self,timeFrame=10,fields=None):
+        """
+            fields - list of bars columns used as features, by default all columns but 'time'
+        """
+        super().__init__()
+        self.timeFrame=timeFrame
+        self.fields=fields
+        self.buffer=None
+        self.pos=0
+        self.count=0
+        self.value=None
+
+    def _fields(self,names):
+        if self.fields is None:
+            self.fields=[f for f in names if f!='time']
+        return self.fields
+
+    def row(self):
+        """
+            Returns the inference row (timeFrame*features values) or None if there are less than timeFrame bars
+        """
+        if self.count<self.timeFrame:
+            return None
+        return self.buffer[self.pos:self.pos+self.timeFrame].ravel()
+
+    def update(self,bar):
+        if isinstance(bar,(pd.Series,dict)):
+            fields=self._fields(list(bar.keys()))
+            x=np.fromiter((bar[f] for f in fields),float,len(fields))
+        else:
+            x=np.asarray(bar,dtype=float)
+        if self.buffer is None:
+            self.buffer=np.zeros((2*self.timeFrame,len(x)))
+        self.buffer[self.pos]=x
+        self.buffer[self.pos+self.timeFrame]=x
+        self.pos=(self.pos+1)%self.timeFrame
+        self.count+=1
+        self.value=self.row()
+        return self.value
+
+    def warmup(self,bars):
+        fields=self._fields(list(bars.keys()))
+        x=np.asarray(bars[fields].values[-self.timeFrame:],dtype=float)
+        self.buffer=np.zeros((2*self.timeFrame,len(fields)))
+        n=len(x)
+        self.buffer[:n]=x
+        self.buffer[self.timeFrame:self.timeFrame+n]=x
+        self.pos=n%self.timeFrame
+        self.count=n
+        self.value=self.row()
+        return self.value
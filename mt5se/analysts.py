@@ -1,11 +1,27 @@
 import mt5se as se
 import pandas as pd
 import numpy as np
+import time
+import shelve
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait
 
 
 ## Defines the RandomForestAnalyst
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.preprocessing import KBinsDiscretizer
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import SGDClassifier
+from sklearn.base import clone, is_regressor
+
+
+def _last_value(asset,bars,name,indicator,**params):
+    """
+        Returns the current value of a streaming indicator of asset through the process-wide se.cache, keyed by
+            (asset, name, params, number of bars, last bar time), so analysts and traders asking for the same
+            indicator on the same bar compute it once. On a miss the indicator is synced with the new bars
+    """
+    return se.cache.indicator(asset,bars,name,lambda b,**p: indicator.sync(b),**params)
 
 
 class RsiAnalyst(se.Analyst):
@@ -16,6 +32,7 @@ class RsiAnalyst(se.Analyst):
         self.mu = se.mean_historical_return(df)
         self.alpha=0.5
         self.dbars=dbars
+        self.rsi=dict() # incremental RSI for each asset, updated with the new bars only
 
 
     def analyze(self,dbars):
@@ -25,7 +42,10 @@ class RsiAnalyst(se.Analyst):
         for asset in assets:
             bars=dbars[asset]
             # number of shares that you can buy of asset 
-            rsi=se.tech.rsi(bars)
+            # same as se.tech.rsi(bars), without recomputing the whole window
+            if asset not in self.rsi or self.rsi[asset].length!=len(bars):
+                self.rsi[asset]=se.indicators.RSI(len(bars),method='simple')
+            rsi=_last_value(asset,bars,'rsi.last',self.rsi[asset],length=len(bars),method='simple')
             er=self.mu[asset]
             if rsi>=70: 
                 exp_ret=er+alpha*abs(er)          
@@ -43,6 +63,8 @@ class MAAnalyst(se.Analyst):
         self.alpha=0.5
         self.mu=mu
         self.period=10
+        self.ma=dict()    # incremental moving average for each asset
+        self.trend=dict() # incremental slope of the whole window for each asset
 
     def analyze(self,dbars):
         assets=dbars.keys()
@@ -51,10 +73,15 @@ class MAAnalyst(se.Analyst):
             bars=dbars[asset]
             # number of shares that you can buy of asset 
             er=self.mu[asset]
-            m=np.mean(bars['close'][-self.period:])
-            if se.tech.trend(bars['close'])>0 and bars['close'].iloc[-1]<m:
+            if asset not in self.ma:
+                self.ma[asset]=se.indicators.RollingMean(self.period)
+            if asset not in self.trend or self.trend[asset].length!=len(bars):
+                self.trend[asset]=se.indicators.RollingSlope(len(bars))
+            m=_last_value(asset,bars,'sma.last',self.ma[asset],length=self.period)
+            trend=_last_value(asset,bars,'slope.last',self.trend[asset],length=len(bars)) # same as se.tech.trend(bars['close'])
+            if trend>0 and bars['close'].iloc[-1]<m:
                 exp_ret=er+self.alpha*abs(er)
-            elif se.tech.trend(bars['close'])<0 and m<bars['close'].iloc[-1]:
+            elif trend<0 and m<bars['close'].iloc[-1]:
                 exp_ret=er-self.alpha*abs(er)
             else:
                 exp_ret=None
@@ -74,6 +101,7 @@ class MACDAnalyst(se.Analyst):
         self.dbars=dbars
         self.mu=mu
         self.lastMacdUnderSignal=True
+        self.means=dict() # incremental (longer,shorter,signaling) moving averages for each asset
         if len(df)<self.period+self.signal:
             print('The setup period (prestart-start) should have at least ',self.period+self.signal,' data points')
             return
@@ -91,9 +119,9 @@ class MACDAnalyst(se.Analyst):
             bars=dbars[asset]
             # number of shares that you can buy of asset 
             #m=np.mean(bars['close'])
-            longer=np.mean(bars['close'][-self.period:])
-            shorter=np.mean(bars['close'][-self.short_period:])
-            signaling=np.mean(bars['close'][-self.signal:])
+            if asset not in self.means:
+                self.means[asset]=[se.indicators.RollingMean(n) for n in (self.period,self.short_period,self.signal)]
+            longer,shorter,signaling=[_last_value(asset,bars,'sma.last',m,length=m.length) for m in self.means[asset]]
             er=self.mu[asset]
             if((shorter-longer)>signaling):
                 MacdUnderSignal=False
@@ -114,13 +142,31 @@ class MACDAnalyst(se.Analyst):
 
 
 class RandomForestAnalyst(se.Analyst):
+    def __init__(self,n_estimators=10,random_state=None,n_jobs=None,cache_dir=None,pooled=False):
+        """
+            n_estimators, random_state - RandomForestClassifier parameters
+            n_jobs - number of processes used to train the models of the assets (None uses all cpus, 1 trains in sequence)
+            cache_dir - folder of the fitted models cache (e.g. 'model_cache'), None (default) disables it. Models are keyed
+                by a hash of the training window, the parameters and the sklearn version, so a rerun over the same data
+                loads them instead of training again
+            pooled - if True, one model is trained for all assets on their stacked feature rows plus an asset id feature,
+                and each bar is analyzed with one predict over all assets
+        """
+        self.n_estimators=n_estimators
+        self.pooled=pooled
+        self.random_state=random_state
+        self.n_jobs=n_jobs
+        self.cache=se.ai_utils.ModelCache(cache_dir) if cache_dir is not None else None
+
     def setup(self,dbars):
         assets=list(dbars.keys())
         df=se.get_close_prices_from_dbars(assets,dbars)
         mu = se.mean_historical_return(df)
         self.clf=dict()
+        self.asset_id={asset:i for i,asset in enumerate(assets)}
+        datasets=[] # (asset,X,Y) of each asset
         for asset in assets:
-            bars=dbars[assets[0]]
+            bars=dbars[asset]
             bars=bars.copy()
             # remove irrelevant info
             if 'time' in bars:
@@ -135,34 +181,51 @@ class RandomForestAnalyst(se.Analyst):
             #print('ds=',ds)
             ds['target']=se.ai_utils.discTarget(discretizer,ds['target'])
             Y=se.ai_utils.fromDs2NpArray(ds,['target'])
-            # train model for each asset
-            clf = RandomForestClassifier(n_estimators=10)
-            clf = clf.fit(X, Y)
+            datasets.append((asset,X,Y))
+        if self.pooled:
+            # one dataset with the rows of all assets, the last column is the asset id
+            X=np.concatenate([np.column_stack((X,np.full(len(X),self.asset_id[asset]))) for asset,X,Y in datasets])
+            Y=np.concatenate([Y for asset,X,Y in datasets])
+            datasets=[(None,X,Y)]
+        to_train=[] # (asset,key,X,Y) of the models not found in cache
+        for asset,X,Y in datasets:
+            key=se.ai_utils.model_key(X,Y,model='RandomForestClassifier',n_estimators=self.n_estimators,random_state=self.random_state)
+            clf=self.cache.load(key) if self.cache is not None else None
+            if clf is not None:
+                self.clf[asset]=clf
+            else:
+                to_train.append((asset,key,X,Y))
+        # train model for each asset (in parallel)
+        estimators=[RandomForestClassifier(n_estimators=self.n_estimators,random_state=self.random_state) for t in to_train]
+        fitted=se.ai_utils.fit_many(estimators,[(X,Y) for asset,key,X,Y in to_train],self.n_jobs)
+        for (asset,key,X,Y),clf in zip(to_train,fitted):
             self.clf[asset]=clf
+            if self.cache is not None:
+                self.cache.save(key,clf)
         self.steps=dict()
         self.alpha=0.5
         self.dbars=dbars
         self.mu=mu
+        self.features=dict() # lagged feature row of each asset, updated with the new bars only
     def analyze(self,dbars):
-            assets=dbars.keys()
+            assets=list(dbars.keys())
             returns=dict()
             timeFrame=10 # it takes into account the last 10 bars
-            horizon=1 # it project the closing price for next bar
-            target='close' # name of the target column
+            rows=[]
             for asset in assets:
                 #print('Tempo1.1=',datetime.now())
-                # get new information (bars), transform it in X
+                # get new information (bars), transform it in X (same columns as bars2Dataset, latest bars)
                 bars=dbars[asset]
-                bars=bars.copy()
-                #remove irrelevant info
-                if 'time' in bars:
-                    del bars['time']
-                # convert from bars to dataset
-                ds=se.ai_utils.bars2Dataset(bars,target,timeFrame,horizon)
-                # Get X fields
-                X=se.ai_utils.fromDs2NpArrayAllBut(ds,['target'])
+                if asset not in self.features:
+                    self.features[asset]=se.ai_utils.LaggedFeatures(timeFrame)
+                rows.append(self.features[asset].sync(bars))
+            if self.pooled:
+                # predict the result of all assets at once, using the latest info
+                X=np.column_stack((np.array(rows),[self.asset_id[asset] for asset in assets]))
+                predictions=self.clf[None].predict(X)
+            for i,asset in enumerate(assets):
                 # predict the result, using the latest info
-                p=self.clf[asset].predict([X[-1]])
+                p=predictions[i] if self.pooled else self.clf[asset].predict([rows[i]])
                 er=self.mu[asset]
                 if p==2:
                     exp_ret=er+self.alpha*abs(er)      #buy it
@@ -178,6 +241,237 @@ class RandomForestAnalyst(se.Analyst):
             return returns    
 
 
+"""
+  Analyst that learns online: its model is trained in setup and then updated with each new labelled bar
+    using partial_fit, so it adapts to new data without retraining from scratch.
+    The label of a bar is its next bar return: 2 (up), 0 (down) or 1 (inside a band of band*std of the returns)
+"""
+class OnlineAnalyst(se.Analyst):
+    stateful=True # the model learns in every analyze() call
+
+    def __init__(self,estimator=None,timeFrame=10,band=0.5):
+        """
+            estimator - sklearn estimator with partial_fit (e.g. SGDClassifier, GaussianNB, SGDRegressor), cloned for each asset.
+                Classifiers learn the label, regressors learn the next bar return (classified with the same band)
+            timeFrame - number of lagged bars used as features
+            band - a return is up or down only if its absolute value is greater than band*std of the asset returns
+        """
+        self.estimator=estimator if estimator is not None else SGDClassifier()
+        self.timeFrame=timeFrame
+        self.band=band
+        self.classes=np.array([0,1,2])
+
+    def label(self,asset,ret):
+        limit=self.band*self.std[asset]
+        return np.where(ret>limit,2,np.where(ret<-limit,0,1))
+
+    def learn(self,asset,X,ret):
+        """
+            Updates the scaler and the model of asset with the feature rows X and their next bar returns ret
+        """
+        scaler=self.scaler[asset]
+        scaler.partial_fit(X)
+        X=scaler.transform(X)
+        if is_regressor(self.model[asset]):
+            self.model[asset].partial_fit(X,ret)
+        else:
+            self.model[asset].partial_fit(X,self.label(asset,ret),classes=self.classes)
+
+    def learn_new_bars(self,asset,bars,previous):
+        """
+            Labels and learns the feature rows of the bars up to the one before the last, newer than previous (the
+                last bar seen). The row of previous, kept in self.last, gets its label from the first new bar, so
+                gaps of several bars (e.g. after a reconnect) are learned too
+        """
+        times=bars['time'].values
+        k=int(np.searchsorted(times,np.datetime64(previous),side='right')) # first bar newer than previous
+        if k>=len(bars):
+            return
+        close=bars['close'].to_numpy(dtype=float)
+        if k>0 and times[k-1]==np.datetime64(previous):
+            last_x,last_close=self.last[asset]
+            self.learn(asset,last_x.reshape(1,-1),np.array([close[k]/last_close-1]))
+        # rows ending at bars k..len(bars)-2, labelled with the return of the next bar
+        start=max(k-self.timeFrame+1,0)
+        ret=np.zeros(len(close)-start)
+        ret[1:]=close[start+1:]/close[start:-1]-1
+        fields=self.features[asset].fields
+        X,y=se.ai_utils.sliding_dataset(bars[fields].to_numpy(dtype=float)[start:],ret,self.timeFrame)
+        if len(X)>0:
+            self.learn(asset,X.reshape(len(X),-1),y)
+
+    def setup(self,dbars):
+        assets=list(dbars.keys())
+        df=se.get_close_prices_from_dbars(assets,dbars)
+        self.mu=se.mean_historical_return(df)
+        self.alpha=0.5
+        self.model=dict()
+        self.scaler=dict()
+        self.std=dict()
+        self.features=dict()
+        self.last=dict() # (feature row,close) of the last bar of each asset, labelled when the next bar arrives
+        for asset in assets:
+            bars=dbars[asset]
+            fields=[f for f in bars.columns if f!='time']
+            close=bars['close'].to_numpy(dtype=float)
+            ret=np.empty(len(close))
+            ret[0]=0
+            ret[1:]=close[1:]/close[:-1]-1 # ret[t] is the return of bar t-1 to bar t
+            self.std[asset]=np.std(ret[1:]) if len(ret)>1 else 0.0
+            self.model[asset]=clone(self.estimator)
+            self.scaler[asset]=StandardScaler()
+            self.features[asset]=se.ai_utils.LaggedFeatures(self.timeFrame,fields)
+            X,y=se.ai_utils.sliding_dataset(bars[fields].to_numpy(dtype=float),ret,self.timeFrame)
+            if len(X)>0:
+                self.learn(asset,X.reshape(len(X),-1),y)
+
+    def analyze(self,dbars):
+        assets=dbars.keys()
+        returns=dict()
+        for asset in assets:
+            bars=dbars[asset]
+            features=self.features[asset]
+            previous=features.last_time
+            x=features.sync(bars)
+            close=bars['close'].iloc[-1]
+            if asset in self.last and previous is not None:
+                self.learn_new_bars(asset,bars,previous)
+            if x is None:
+                returns[asset]=None
+                continue
+            self.last[asset]=(x.copy(),close)
+            if not hasattr(self.model[asset],'coef_') and not hasattr(self.model[asset],'classes_'):
+                returns[asset]=None # not trained yet
+                continue
+            p=self.model[asset].predict(self.scaler[asset].transform(x.reshape(1,-1)))
+            if is_regressor(self.model[asset]):
+                p=self.label(asset,p)
+            er=self.mu[asset]
+            if p[0]==2:
+                exp_ret=er+self.alpha*abs(er)
+            elif p[0]==0:
+                exp_ret=er-self.alpha*abs(er)
+            else:
+                exp_ret=None
+            returns[asset]=exp_ret
+        return returns
+
+
+def _init_params(analyst):
+    """
+        Returns the hashable configuration of an analyst: get_params() if it has one, otherwise its attributes
+            (as set by __init__). Objects are described by their class and their own configuration, other values by repr()
+    """
+    params=analyst.get_params() if hasattr(analyst,'get_params') else vars(analyst)
+    return tuple((k,_param_value(v)) for k,v in sorted(params.items()))
+
+
+def _param_value(v):
+    v=se.cache._freeze(v)
+    if isinstance(v,(int,float,str,bool,type(None))):
+        return v
+    if isinstance(v,tuple):
+        return tuple(_param_value(x) for x in v)
+    if hasattr(v,'get_params') or hasattr(v,'__dict__'):
+        return (type(v).__qualname__,_init_params(v))
+    return repr(v)
+
+
+def _bars_fingerprint(dbars):
+    """
+        Returns a content hash of the bars of each asset (e.g. the setup/training window of an analyst)
+    """
+    h=hashlib.sha256()
+    for asset in sorted(dbars.keys()):
+        bars=dbars[asset]
+        h.update(repr((asset,list(bars.columns),len(bars))).encode())
+        for column in bars.columns:
+            h.update(np.ascontiguousarray(bars[column].to_numpy()).tobytes())
+    return h.hexdigest()
+
+
+"""
+  Analyst that memoizes the analyses of another analyst, so each forecast is computed once per bar even if
+    several consumers (traders, ensembles) ask for it. Analyses are keyed by (name, params, setup fingerprint,
+    assets, number of bars and last bar time of each asset) and stored in a bounded LRU cache (by default the process-wide
+    se.cache.forecast_cache, shared by all CachedAnalyst), and optionally in a file to be replayed in later runs
+"""
+class CachedAnalyst(se.Analyst):
+    def __init__(self,analyst,name=None,params=None,cache=None,path=None,lazy_setup=True):
+        """
+            analyst - the analyst whose analyses are cached
+            name, params - identify the analyst configuration in the keys (default: module and class name, and the
+                analyst attributes at construction, i.e. its init params). A fingerprint of the setup bars is added, so
+                an analyst set up (trained) with other bars never reads these analyses
+            cache - LRUCache used (default se.cache.forecast_cache)
+            path - file (shelve) where analyses are also stored and looked up, so later runs can replay them
+            lazy_setup - analyst.setup is only called when an analysis is not found in cache, so a replayed run
+                does not train the analyst again
+        """
+        if getattr(analyst,'stateful',False):
+            raise ValueError(type(analyst).__name__+' keeps state between analyze() calls and can not be cached')
+        self.analyst=analyst
+        self.name=name if name is not None else type(analyst).__module__+'.'+type(analyst).__qualname__
+        self.params=se.cache._freeze(params) if params is not None else _init_params(analyst)
+        self.fingerprint=None
+        self.cache=cache if cache is not None else se.cache.forecast_cache
+        self.path=path
+        self.store=None
+        self.lazy_setup=lazy_setup
+        self.setup_dbars=None
+
+    def setup(self,dbars):
+        if self.path is not None and self.store is None:
+            self.store=shelve.open(self.path)
+        self.fingerprint=_bars_fingerprint(dbars)
+        if self.lazy_setup:
+            self.setup_dbars=dbars
+        else:
+            self.analyst.setup(dbars)
+
+    def key(self,dbars):
+        """
+            Returns the key of the analysis of dbars, or None if some bars have no 'time' column
+        """
+        bars=[]
+        for asset in sorted(dbars.keys()):
+            b=dbars[asset]
+            if 'time' not in b or len(b)==0:
+                return None
+            bars.append((asset,len(b),b['time'].iloc[-1]))
+        return (self.name,self.params,self.fingerprint,tuple(bars))
+
+    def _analyze(self,dbars):
+        if self.setup_dbars is not None:
+            self.analyst.setup(self.setup_dbars)
+            self.setup_dbars=None
+        return self.analyst.analyze(dbars)
+
+    def analyze(self,dbars):
+        key=self.key(dbars)
+        if key is None:
+            return self._analyze(dbars)
+        missing=object()
+        returns=self.cache.get(key,missing)
+        if returns is missing and self.store is not None:
+            returns=self.store.get(repr(key),missing)
+            if returns is not missing:
+                self.cache.put(key,returns)
+        if returns is missing:
+            returns=self._analyze(dbars)
+            self.cache.put(key,returns)
+            if self.store is not None:
+                self.store[repr(key)]=returns
+        return dict(returns) if returns is not None else None # a copy, so consumers can not change the cached analysis
+
+    def ending(self,dbars):
+        if self.setup_dbars is None:
+            self.analyst.ending(dbars)
+        if self.store is not None:
+            self.store.close()
+            self.store=None
+
+
 def ensembleAnalyses(analysts_mus,mu):
     expected_returns=dict()
     assets=analysts_mus[0].keys()
@@ -199,15 +493,37 @@ def ensembleAnalyses(analysts_mus,mu):
 """
   Analyst that ensembles the analyses of several analyst in order to form just one analysis of several assets
     It uses a weigthed mean to ensemble the analyses. If weights are not provided, then it uses a simple arithmetic mean
+    Members may be evaluated in sequence (default) or concurrently in a thread or process pool
 """
 class EnsembleAnalyst(se.Analyst):
-    def __init__(self):
+    def __init__(self,mode='sequential',max_workers=None,timeout=None):
+        """
+            mode - 'sequential', 'thread' (members run concurrently, good when they release the GIL, e.g. numpy/sklearn)
+                or 'process' (each member and dbars are sent to a worker process every bar, which returns the updated member)
+            max_workers - pool size (None uses the number of members)
+            timeout - seconds to wait for the members in thread/process mode. A member that did not answer in time abstains
+                in this bar (and in the next ones while it is still running). When it finishes, its result and state are
+                harvested before it is resubmitted, and that result is used if the new call also times out
+        """
+        if mode not in ('sequential','thread','process'):
+            raise ValueError('Invalid mode '+str(mode))
         self.analysts=dict()
         self.weights=dict()
+        self.mode=mode
+        self.max_workers=max_workers
+        self.timeout=timeout
+        self.executor=None
+        self.running=dict() # name -> future of a member that timed out and is still running
+        self.latency=dict() # name -> [calls, total seconds, last seconds, max seconds, timeouts]
+
+    @property
+    def stateful(self):
+        return any(getattr(analyst,'stateful',False) for analyst in self.analysts.values())
 
     def add_analyst(self,analyst,name,weight=1):
         self.analysts[name]=analyst
         self.weights[name]=weight  # weight of each analyst, if not provided it will be uniform!
+        self.latency[name]=[0,0.0,0.0,0.0,0]
 
     def setup(self,dbars):
         s=0
@@ -216,37 +532,102 @@ class EnsembleAnalyst(se.Analyst):
             s=s+self.weights[name]
         for name in self.analysts.keys():
             self.weights[name]=self.weights[name]/s   # defines the relative weight for each analyst 
-        
+        if self.mode!='sequential' and self.executor is None:
+            workers=self.max_workers if self.max_workers is not None else max(len(self.analysts),1)
+            if self.mode=='thread':
+                self.executor=ThreadPoolExecutor(workers)
+            else:
+                self.executor=ProcessPoolExecutor(workers)
+
+    def _record(self,name,elapsed):
+        stats=self.latency[name]
+        stats[0]+=1
+        stats[1]+=elapsed
+        stats[2]=elapsed
+        stats[3]=max(stats[3],elapsed)
+
+    def _harvest(self,name,future):
+        """
+            Returns the prices of a finished member future, keeping the member state updated by the worker (process mode)
+        """
+        prices,elapsed,analyst=future.result()
+        if analyst is not None:
+            self.analysts[name]=analyst
+        self._record(name,elapsed)
+        return prices
+
+    def latency_stats(self):
+        """
+            Returns a DataFrame with calls, mean, last and max latency (seconds) and timeouts of each member
+        """
+        rows=dict()
+        for name,(calls,total,last,peak,timeouts) in self.latency.items():
+            rows[name]={'calls':calls,'mean':total/calls if calls>0 else 0.0,'last':last,'max':peak,'timeouts':timeouts}
+        return pd.DataFrame.from_dict(rows,orient='index',columns=['calls','mean','last','max','timeouts'])
+
     # Receives dbars[asset] - a bars dataframe for each asset in a dictionary
     #   and returns a dictionary with the target price for each asset
     def analyze(self,dbars):
         analysts_prices=dict()
-        for name in self.analysts.keys():
-            prices=self.analysts[name].analyze(dbars)
-            analysts_prices[name]=prices
+        if self.executor is None:
+            for name in self.analysts.keys():
+                start=time.perf_counter()
+                analysts_prices[name]=self.analysts[name].analyze(dbars)
+                self._record(name,time.perf_counter()-start)
+        else:
+            futures=dict()
+            late=dict() # name -> prices of a timed out member that finished since the previous bar
+            for name in list(self.analysts.keys()):
+                if name in self.running:
+                    if not self.running[name].done():
+                        self.latency[name][4]+=1 # still busy with a previous bar
+                        continue
+                    # harvest it before resubmitting, so its updated state is kept
+                    late[name]=self._harvest(name,self.running.pop(name))
+                futures[name]=self.executor.submit(_analyze_member,self.analysts[name],dbars,self.mode=='process')
+            done,not_done=wait(list(futures.values()),timeout=self.timeout)
+            for name,future in futures.items():
+                if future in not_done:
+                    self.running[name]=future
+                    self.latency[name][4]+=1
+                    if name in late:
+                        analysts_prices[name]=late[name] # a slow member contributes one bar late
+                    continue
+                analysts_prices[name]=self._harvest(name,future)
         assets=dbars.keys()
         return self.ensembleExpectReturns(analysts_prices,assets)
 
     # Receives dbars[asset] - a bars dataframe for each asset in a dictionary
     #   and frees resources used by the Analyst
     def ending(self,dbars):
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor=None
+            self.running=dict()
         for name in self.analysts.keys():
-            self.analysts[name].setup(dbars)
+            self.analysts[name].ending(dbars)
 
     # analyst_prices is a dict with entry for each analyst, and for each analyst it is a dict for 
     # the target price for each asset
     def ensembleExpectReturns(self,analysts_prices,assets):
-        expectReturns=dict()
-        for asset in assets:
-            w_sum=0
-            expectReturns[asset]=0
-            for anl in analysts_prices.keys(): # list of analysts
-                if analysts_prices[anl][asset]!=None and analysts_prices[anl][asset]>0: # if analyst has estimate, it is included!
-                    expectReturns[asset]=expectReturns[asset]+analysts_prices[anl][asset]*self.weights[anl]
-                    #print('anl=',anl,' w=',self.weights[anl], ' anl price',analysts_prices[anl][asset],)
-                    w_sum=w_sum+self.weights[anl]
-            if w_sum>0:
-                expectReturns[asset]=expectReturns[asset]/w_sum # calculates mean target price of all that did not abstained
-            else:
-                expectReturns[asset]=-1 # if no analyst informed anything it abstain from giving a target price
-        return expectReturns
+        assets=list(assets)
+        names=[anl for anl in analysts_prices.keys() if analysts_prices[anl] is not None]
+        # prices matrix (analyst x asset), NaN where the analyst has no estimate
+        prices=np.array([[np.nan if analysts_prices[anl].get(asset) is None else analysts_prices[anl][asset] for asset in assets]
+                         for anl in names],dtype=float).reshape(len(names),len(assets))
+        w=np.array([self.weights[anl] for anl in names],dtype=float).reshape(-1,1)
+        valid=prices>0 # if analyst has estimate, it is included!
+        w_sum=(valid*w).sum(axis=0)
+        total=(np.where(valid,prices,0.0)*w).sum(axis=0)
+        # mean target price of all that did not abstained, -1 if no analyst informed anything
+        expected=np.where(w_sum>0,total/np.where(w_sum>0,w_sum,1),-1.0)
+        return dict(zip(assets,expected.tolist()))
+
+
+def _analyze_member(analyst,dbars,return_analyst=False):
+    """
+        Runs analyst.analyze(dbars) in a pool worker, returns (prices, elapsed seconds, analyst or None)
+    """
+    start=time.perf_counter()
+    prices=analyst.analyze(dbars)
+    return prices,time.perf_counter()-start,(analyst if return_analyst else None)
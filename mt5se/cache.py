@@ -0,0 +1,150 @@
+# This file is part of the mt5se package
+#  mt5se home: https://github.com/paulo-al-castro/mt5se
+
+"""
+Cache Module - process-wide cache of indicator results shared by all traders and analysts.
+
+Several traders often compute the same indicator for the same asset on the same bar. With
+    rsi=se.cache.indicator(asset,bars,'rsi',length=14)
+or, for an indicator function of your own,
+    rsi=se.cache.indicator(asset,bars,'my_rsi',calculate_rsi,period=10)
+the work is done once per bar: the result is stored under the key
+(symbol, timeframe, indicator, params, number of bars, last bar time) and every other call with
+the same key gets the stored result. Results should be treated as read only.
+The cache has LRU eviction and hit/miss counters, see indicator_cache.stats()
+The analyses of analysts are cached the same way in forecast_cache, see mt5se.analysts.CachedAnalyst
+"""
+
+import threading
+from collections import OrderedDict
+import mt5se.indicators as indicators
+
+
+class LRUCache:
+    """
+        Thread safe dictionary with a maximum size, least recently used entries are evicted first.
+            It counts hits and misses of get()
+    """
+    def __init__(self, maxsize=20000):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        """
+            Returns the value stored with key (and marks it as recently used), or default
+        """
+        with self.lock:
+            if key in self.data:
+                self.data.move_to_end(key)
+                self.hits += 1
+                return self.data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+            Stores value with key, evicting the least recently used entries if needed
+        """
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        """
+            Returns the value stored with key, or computes it with func(*args,**kwargs) and stores it
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = func(*args, **kwargs)
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        """
+            Removes all entries and resets the counters
+        """
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        """
+            Returns a dictionary with size, maxsize, hits, misses, evictions and hit_rate
+        """
+        total = self.hits + self.misses
+        return {'size': len(self.data), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'hit_rate': self.hits / total if total > 0 else 0.0}
+
+
+def _freeze(value):
+    """
+        Returns a hashable version of a parameter value
+    """
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class IndicatorCache(LRUCache):
+    """
+        LRU cache of indicator results keyed by (symbol, timeframe, indicator, params, number of bars, last bar time)
+    """
+    def key(self, symbol, bars, name, params, timeframe=None):
+        """
+            Returns the cache key of an indicator computed over bars, or None if bars has no 'time' column
+        """
+        if bars is None or 'time' not in bars or len(bars) == 0:
+            return None
+        return (symbol, timeframe, name, _freeze(params), len(bars), bars['time'].iloc[-1])
+
+    def compute(self, symbol, bars, name, func=None, timeframe=None, **params):
+        """
+            Returns func(bars,**params), computing it only if the same indicator was not computed yet for this bar.
+                If func is None, name should be a function of mt5se.indicators (e.g. 'rsi', 'macd', 'atr').
+                Bars without 'time' column can not be identified, so the indicator is just computed
+        """
+        if func is None:
+            func = getattr(indicators, name)
+        key = self.key(symbol, bars, name, params, timeframe)
+        if key is None:
+            return func(bars, **params)
+        return self.get_or_compute(key, func, bars, **params)
+
+
+indicator_cache = IndicatorCache()
+
+
+# forecasts of analysts, see mt5se.analysts.CachedAnalyst
+forecast_cache = LRUCache(maxsize=5000)
+
+
+def indicator(symbol, bars, name, func=None, timeframe=None, **params):
+    """
+        Returns an indicator for symbol using the process-wide indicator_cache, see IndicatorCache.compute()
+    """
+    return indicator_cache.compute(symbol, bars, name, func, timeframe, **params)
+
+
+def stats():
+    """
+        Returns the hit/miss statistics of the process-wide indicator_cache
+    """
+    return indicator_cache.stats()
@@ -0,0 +1,611 @@
+# This file is part of the mt5se package
+#  mt5se home: https://github.com/paulo-al-castro/mt5se
+
+"""
+Indicators Module - full-series (vectorized) technical indicators.
+
+Every function computes the indicator for the whole serie at once, using cumulative-sum
+and convolution (linear filter) kernels instead of Python loops. Inputs may be a list, a
+numpy array, a pandas.Series or a 2-D array (time x assets); computations run along the
+first axis (time) and the result has the same length as the input. Points where the
+indicator is not yet defined (warm-up) are NaN.
+
+The scalar functions of mt5se.tech are equal to the last point of these series, e.g.
+    tech.rsi(returns) == indicators.rsi(returns, len(returns), method='simple')[-1]
+    tech.slope(serie) == indicators.slope(serie, len(serie))[-1]
+    tech.ma(serie, 10)[-1] == indicators.sma(serie, 10)[-1]
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import signal
+
+
+def _values(serie, field='close'):
+    """
+        Returns the given serie as a float numpy array. If serie is a bars DataFrame, it uses the column field
+    """
+    if isinstance(serie, pd.DataFrame):
+        serie = serie[field]
+    return np.asarray(serie, dtype=float)
+
+
+def _cumsum0(x):
+    """
+        Cumulative sum along time with a leading zero row, so that sum(x[i:j])=c[j]-c[i]
+    """
+    c = np.zeros((x.shape[0] + 1,) + x.shape[1:])
+    np.cumsum(x, axis=0, out=c[1:])
+    return c
+
+
+def rolling_sum(serie, length):
+    """
+        Returns the rolling sum of the last length points (NaN for the first length-1 points)
+    """
+    x = _values(serie)
+    c = _cumsum0(x)
+    out = np.full(x.shape, np.nan)
+    if length <= len(x):
+        out[length - 1:] = c[length:] - c[:-length]
+    return out
+
+
+def sma(serie, length=10, min_periods=None):
+    """
+        Returns the simple moving average of the last length points.
+            If min_periods is given, the first points (before length points are available) are the average
+            from 0 to index, as long as there are at least min_periods points. Otherwise they are NaN.
+    """
+    x = _values(serie)
+    c = _cumsum0(x)
+    out = np.full(x.shape, np.nan)
+    if length <= len(x):
+        out[length - 1:] = (c[length:] - c[:-length]) / length
+    if min_periods is not None:
+        head = min(length - 1, len(x))
+        n = np.arange(1, head + 1).reshape((-1,) + (1,) * (x.ndim - 1))
+        out[:head] = c[1:head + 1] / n
+        out[:min_periods - 1] = np.nan
+    return out
+
+
+def _recursive_mean(x, alpha, seed):
+    """
+        Exponential smoothing y[t]=alpha*x[t]+(1-alpha)*y[t-1] with y[-1]=seed, computed as an IIR filter
+    """
+    zi = (1 - alpha) * np.asarray(seed, dtype=float).reshape((1,) + x.shape[1:])
+    y, _ = signal.lfilter([alpha], [1.0, alpha - 1.0], x, axis=0, zi=zi)
+    return y
+
+
+def ema(serie, length=10):
+    """
+        Returns the exponential moving average with alpha=2/(length+1), seeded with the first point
+    """
+    x = _values(serie)
+    if len(x) == 0:
+        return x.copy()
+    alpha = 2.0 / (length + 1)
+    # seed=x[0] makes y[0]=x[0]
+    return _recursive_mean(x, alpha, x[0])
+
+
+def wilder(serie, length=14):
+    """
+        Returns Wilder's smoothing (alpha=1/length) seeded with the simple average of the first length points
+            The first length-1 points are NaN
+    """
+    x = _values(serie)
+    out = np.full(x.shape, np.nan)
+    if length > len(x):
+        return out
+    seed = x[:length].mean(axis=0)
+    out[length - 1] = seed
+    if length < len(x):
+        out[length:] = _recursive_mean(x[length:], 1.0 / length, seed)
+    return out
+
+
+def rsi(serie, length=14, method='wilder'):
+    """
+        Returns the RSI (Relative Strength Index) serie.
+            method='wilder' - serie is a price serie; average gains and losses of price changes use Wilder's smoothing.
+                              The first length points are NaN
+            method='simple' - serie is a serie of returns; over the last length returns, it averages the non negative
+                              returns and the absolute negative returns (each by its own count), like mt5se.tech.rsi
+        If serie is a bars DataFrame, it uses the close prices (wilder) or the returns close/open-1 (simple)
+    """
+    if method == 'simple':
+        if isinstance(serie, pd.DataFrame):
+            serie = serie['close'] / serie['open'] - 1
+        r = _values(serie)
+        up = r >= 0
+        u = rolling_sum(np.where(up, r, 0.0), length)
+        uc = rolling_sum(up, length)
+        d = rolling_sum(np.where(up, 0.0, -r), length)
+        dc = length - uc
+        with np.errstate(divide='ignore', invalid='ignore'):
+            u = np.where(uc > 0, u / uc, 0.0)
+            d = np.where(dc > 0, d / dc, 0.0)
+        d = np.where(d == 0, 1.0, d)
+        out = 100 * (1 - 1 / (1 + u / d))
+        out[np.isnan(uc)] = np.nan
+        return out
+    elif method == 'wilder':
+        x = _values(serie)
+        out = np.full(x.shape, np.nan)
+        if len(x) <= length:
+            return out
+        delta = np.diff(x, axis=0)
+        gain = wilder(np.clip(delta, 0, None), length)
+        loss = wilder(np.clip(-delta, 0, None), length)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rs = gain / loss
+            out[1:] = np.where(loss == 0, 100.0, 100 - 100 / (1 + rs))
+        out[1:][np.isnan(gain)] = np.nan
+        return out
+    else:
+        raise ValueError("method should be 'wilder' or 'simple'")
+
+
+def macd(serie, fast=12, slow=26, signal_length=9):
+    """
+        Returns three series (macd, signal, histogram)
+            macd=ema(fast)-ema(slow), signal=ema(macd,signal_length), histogram=macd-signal
+    """
+    x = _values(serie)
+    line = ema(x, fast) - ema(x, slow)
+    sig = ema(line, signal_length)
+    return line, sig, line - sig
+
+
+def slope(serie, length=10):
+    """
+        Returns the rolling angular coefficient of the linear regression (slope) of the last length points,
+            for a serie in regular intervals. It is computed as a convolution with the OLS weights
+            w[j]=(j-mean(j))/sum((j-mean(j))**2)
+    """
+    x = _values(serie)
+    out = np.full(x.shape, np.nan)
+    if length < 2 or length > len(x):
+        return out
+    j = np.arange(length, dtype=float)
+    j = j - j.mean()
+    w = j / np.dot(j, j)
+    # FIR filter: y[t]=sum_k b[k]*x[t-k], so b is w reversed
+    y = signal.lfilter(w[::-1], [1.0], x, axis=0)
+    out[length - 1:] = y[length - 1:]
+    return out
+
+
+def rolling_std(serie, length=20, ddof=0):
+    """
+        Returns the rolling standard deviation of the last length points
+    """
+    x = _values(serie)
+    if len(x) == 0:
+        return x.copy()
+    # shifting by the first point keeps the sums of squares small and the result accurate
+    x = x - x[0]
+    s1 = rolling_sum(x, length)
+    s2 = rolling_sum(x * x, length)
+    var = (s2 - s1 * s1 / length) / (length - ddof)
+    return np.sqrt(np.clip(var, 0, None))
+
+
+def bollinger(serie, length=20, k=2.0):
+    """
+        Returns three series (middle, upper, lower) of the Bollinger bands
+            middle=sma(length), upper/lower=middle +/- k*rolling_std(length)
+    """
+    x = _values(serie)
+    mid = sma(x, length)
+    dev = k * rolling_std(x, length)
+    return mid, mid + dev, mid - dev
+
+
+def true_range(high, low=None, close=None):
+    """
+        Returns the true range serie max(high-low,|high-previous close|,|low-previous close|)
+            If high is a bars DataFrame, low and close are taken from it
+    """
+    if isinstance(high, pd.DataFrame):
+        high, low, close = high['high'], high['low'], high['close']
+    h = _values(high)
+    l = _values(low)
+    c = _values(close)
+    tr = h - l
+    if len(tr) > 1:
+        prev = c[:-1]
+        tr[1:] = np.maximum(tr[1:], np.maximum(np.abs(h[1:] - prev), np.abs(l[1:] - prev)))
+    return tr
+
+
+def atr(high, low=None, close=None, length=14, method='wilder'):
+    """
+        Returns the ATR (Average True Range) serie, using Wilder's smoothing (default) or a simple moving average
+            If high is a bars DataFrame, low and close are taken from it
+    """
+    tr = true_range(high, low, close)
+    if method == 'wilder':
+        return wilder(tr, length)
+    elif method == 'simple':
+        return sma(tr, length)
+    else:
+        raise ValueError("method should be 'wilder' or 'simple'")
+
+
+###############################
+# Incremental (stateful) indicators
+#   Each object takes one new bar with update(bar) in constant time and returns the current value.
+#   warmup(serie) seeds the state from history with one vectorized call, and sync(bars) feeds only
+#   the bars that are newer than the last one seen (or warms up again if the history does not match).
+
+def _price(bar, field='close'):
+    """
+        Returns the value of a bar given as a number or as a mapping (e.g. a bars row) with field
+    """
+    if np.isscalar(bar):
+        return float(bar)
+    return float(bar[field])
+
+
+class StreamingIndicator:
+    """
+        Base class for incremental indicators
+    """
+    field = 'close'
+
+    def __init__(self):
+        self.value = np.nan
+        self.last_time = None
+
+    def warmup(self, serie):
+        """
+            Seeds the indicator state from a serie (or bars DataFrame) and returns the current value
+        """
+        raise NotImplementedError
+
+    def update(self, bar):
+        """
+            Adds one new bar (a number or a bars row) and returns the current value
+        """
+        raise NotImplementedError
+
+    def sync(self, bars):
+        """
+            Receives a bars DataFrame (with 'time' column) whose last rows may be new, feeds the new rows
+            to update() and returns the current value. If the previous last bar is not in bars,
+            the state is rebuilt with warmup()
+        """
+        if 'time' not in bars or len(bars) == 0:
+            self.last_time = None
+            return self.warmup(bars)
+        times = bars['time']
+        if self.last_time is not None:
+            if len(bars) > 1 and times.iloc[-2] == self.last_time:
+                start = len(bars) - 1
+            elif times.iloc[-1] == self.last_time:
+                return self.value
+            else:
+                start = int(np.searchsorted(times.values, np.datetime64(self.last_time), side='right'))
+                if start == 0 or times.iloc[start - 1] != self.last_time:
+                    start = None
+            if start is not None:
+                for i in range(start, len(bars)):
+                    self.update(bars.iloc[i])
+                self.last_time = times.iloc[-1]
+                return self.value
+        self.warmup(bars)
+        self.last_time = times.iloc[-1]
+        return self.value
+
+
+class EMA(StreamingIndicator):
+    """
+        Incremental exponential moving average with alpha=2/(length+1)
+    """
+    def __init__(self, length=10):
+        super().__init__()
+        self.length = length
+        self.alpha = 2.0 / (length + 1)
+
+    def warmup(self, serie):
+        x = ema(serie, self.length)
+        self.value = x[-1] if len(x) > 0 else np.nan
+        return self.value
+
+    def update(self, bar):
+        x = _price(bar, self.field)
+        if np.isnan(self.value):
+            self.value = x
+        else:
+            self.value = self.value + self.alpha * (x - self.value)
+        return self.value
+
+
+class MACD(StreamingIndicator):
+    """
+        Incremental MACD. value is the macd line, signal and histogram are also kept
+    """
+    def __init__(self, fast=12, slow=26, signal_length=9):
+        super().__init__()
+        self.fast = EMA(fast)
+        self.slow = EMA(slow)
+        self.signal_ema = EMA(signal_length)
+        self.signal = np.nan
+        self.histogram = np.nan
+
+    def warmup(self, serie):
+        line, sig, hist = macd(serie, self.fast.length, self.slow.length, self.signal_ema.length)
+        if len(line) == 0:
+            return self.value
+        self.fast.warmup(serie)
+        self.slow.warmup(serie)
+        self.signal_ema.value = sig[-1]
+        self.value, self.signal, self.histogram = line[-1], sig[-1], hist[-1]
+        return self.value
+
+    def update(self, bar):
+        self.value = self.fast.update(bar) - self.slow.update(bar)
+        self.signal = self.signal_ema.update(self.value)
+        self.histogram = self.value - self.signal
+        return self.value
+
+
+class _Window(StreamingIndicator):
+    """
+        Ring buffer of the last length points with running sums. The sums are recomputed from the buffer
+        every time it wraps around, which keeps floating point drift bounded at amortized O(1) cost
+    """
+    def __init__(self, length):
+        super().__init__()
+        self.length = length
+        self.buffer = np.zeros(length)
+        self.count = 0
+        self.pos = 0
+
+    def _load(self, x):
+        x = x[-self.length:]
+        n = len(x)
+        self.buffer[:n] = x
+        self.count = n
+        self.pos = n % self.length
+        self._resum()
+
+    def _resum(self):
+        pass
+
+    def _push(self, x):
+        old = self.buffer[self.pos] if self.count == self.length else None
+        self.buffer[self.pos] = x
+        self.pos = (self.pos + 1) % self.length
+        if old is None:
+            self.count += 1
+        return old
+
+    def _ordered(self):
+        if self.count < self.length:
+            return self.buffer[:self.count]
+        return np.roll(self.buffer, -self.pos)
+
+
+class RollingMean(_Window):
+    """
+        Incremental simple moving average of the last length points
+    """
+    def __init__(self, length=10):
+        super().__init__(length)
+        self.s1 = 0.0
+        self.s2 = 0.0
+
+    def _resum(self):
+        b = self._ordered()
+        self.s1 = b.sum()
+        self.s2 = np.dot(b, b)
+        self._value()
+
+    def _value(self):
+        self.value = self.s1 / self.count if self.count == self.length else np.nan
+
+    def warmup(self, serie):
+        self._load(_values(serie, self.field))
+        return self.value
+
+    def update(self, bar):
+        x = _price(bar, self.field)
+        old = self._push(x)
+        if old is not None:
+            self.s1 += x - old
+            self.s2 += x * x - old * old
+        else:
+            self.s1 += x
+            self.s2 += x * x
+        if self.pos == 0:
+            self._resum()
+        else:
+            self._value()
+        return self.value
+
+
+class RollingVariance(RollingMean):
+    """
+        Incremental variance of the last length points (ddof=0 by default). mean is also kept
+    """
+    def __init__(self, length=20, ddof=0):
+        super().__init__(length)
+        self.ddof = ddof
+        self.mean = np.nan
+
+    def _value(self):
+        if self.count == self.length:
+            self.mean = self.s1 / self.length
+            var = (self.s2 - self.s1 * self.mean) / (self.length - self.ddof)
+            self.value = max(var, 0.0)
+        else:
+            self.mean = np.nan
+            self.value = np.nan
+
+
+class RollingSlope(_Window):
+    """
+        Incremental slope of the linear regression of the last length points (positions 0..length-1).
+            It keeps sy=sum(y) and sxy=sum(j*y); when a point enters and the oldest leaves, every remaining
+            point moves one position back, so sxy=sxy-(sy-old)+(length-1)*new
+    """
+    def __init__(self, length=10):
+        super().__init__(length)
+        n = length
+        self.xm = (n - 1) / 2.0
+        self.sxx = n * (n * n - 1) / 12.0
+        self.sy = 0.0
+        self.sxy = 0.0
+
+    def _resum(self):
+        b = self._ordered()
+        self.sy = b.sum()
+        self.sxy = np.dot(np.arange(len(b)), b)
+        self._value()
+
+    def _value(self):
+        if self.count == self.length and self.length > 1:
+            self.value = (self.sxy - self.xm * self.sy) / self.sxx
+        else:
+            self.value = np.nan
+
+    def warmup(self, serie):
+        self._load(_values(serie, self.field))
+        return self.value
+
+    def update(self, bar):
+        y = _price(bar, self.field)
+        old = self._push(y)
+        if old is not None:
+            self.sxy += -(self.sy - old) + (self.length - 1) * y
+            self.sy += y - old
+        else:
+            self.sxy += (self.count - 1) * y
+            self.sy += y
+        if self.pos == 0:
+            self._resum()
+        else:
+            self._value()
+        return self.value
+
+
+class RSI(StreamingIndicator):
+    """
+        Incremental RSI, see rsi() for the meaning of method.
+            method='wilder' - update() receives prices (or bars rows, using close)
+            method='simple' - update() receives returns (or bars rows, using close/open-1)
+    """
+    def __init__(self, length=14, method='wilder'):
+        super().__init__()
+        if method not in ('wilder', 'simple'):
+            raise ValueError("method should be 'wilder' or 'simple'")
+        self.length = length
+        self.method = method
+        if method == 'simple':
+            self.returns = _Window(length)
+            self.u = 0.0
+            self.uc = 0
+            self.d = 0.0
+        else:
+            self.prev = np.nan
+            self.gain = np.nan
+            self.loss = np.nan
+            self.n = 0  # number of price changes seen while warming up
+
+    def _return(self, bar):
+        if np.isscalar(bar):
+            return float(bar)
+        return float(bar['close']) / float(bar['open']) - 1
+
+    def _simple_value(self):
+        w = self.returns
+        if w.count < self.length:
+            self.value = np.nan
+            return self.value
+        dc = self.length - self.uc
+        u = self.u / self.uc if self.uc > 0 else 0.0
+        d = self.d / dc if dc > 0 else 0.0
+        if d == 0:
+            d = 1.0
+        self.value = 100 * (1 - 1 / (1 + u / d))
+        return self.value
+
+    def _simple_resum(self):
+        b = self.returns._ordered()
+        up = b >= 0
+        self.u = b[up].sum()
+        self.uc = int(up.sum())
+        self.d = -b[~up].sum()
+
+    def _wilder_value(self):
+        if self.n < self.length:
+            self.value = np.nan
+        elif self.loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100 - 100 / (1 + self.gain / self.loss)
+        return self.value
+
+    def warmup(self, serie):
+        if self.method == 'simple':
+            if isinstance(serie, pd.DataFrame):
+                serie = serie['close'] / serie['open'] - 1
+            self.returns._load(_values(serie))
+            self._simple_resum()
+            return self._simple_value()
+        x = _values(serie, self.field)
+        self.prev = x[-1] if len(x) > 0 else np.nan
+        self.n = max(len(x) - 1, 0)
+        if self.n >= self.length:
+            delta = np.diff(x)
+            self.gain = wilder(np.clip(delta, 0, None), self.length)[-1]
+            self.loss = wilder(np.clip(-delta, 0, None), self.length)[-1]
+        else:
+            delta = np.diff(x)
+            self.gain = np.clip(delta, 0, None).sum()
+            self.loss = np.clip(-delta, 0, None).sum()
+        return self._wilder_value()
+
+    def update(self, bar):
+        if self.method == 'simple':
+            r = self._return(bar)
+            old = self.returns._push(r)
+            if old is not None:
+                if old >= 0:
+                    self.u -= old
+                    self.uc -= 1
+                else:
+                    self.d += old
+            if r >= 0:
+                self.u += r
+                self.uc += 1
+            else:
+                self.d -= r
+            if self.returns.pos == 0:
+                self._simple_resum()
+            return self._simple_value()
+        x = _price(bar, self.field)
+        if np.isnan(self.prev):
+            self.prev = x
+            self.gain = self.loss = 0.0
+            return self.value
+        delta = x - self.prev
+        self.prev = x
+        g, l = max(delta, 0.0), max(-delta, 0.0)
+        self.n += 1
+        if self.n < self.length:
+            # while warming up gain and loss hold plain sums
+            self.gain += g
+            self.loss += l
+        elif self.n == self.length:
+            self.gain = (self.gain + g) / self.length
+            self.loss = (self.loss + l) / self.length
+        else:
+            self.gain = (self.gain * (self.length - 1) + g) / self.length
+            self.loss = (self.loss * (self.length - 1) + l) / self.length
+        return self._wilder_value()
@@ -1456,7 +1456,11 @@ class Trader:
 class Analyst:
     """
         Basic Analyst class for mt5se. It may be used for Trader to get target prices.
+        Analysts whose analyses depend on previous calls, and not only on dbars and the setup, should set stateful=True,
+        so they are not cached (see mt5se.analysts.CachedAnalyst)
     """
+    stateful=False
+
     def __init__(self):
         """
             Analyst's constructor
@@ -0,0 +1,178 @@
+# This file is part of the mt5se package
+#  mt5se home: https://github.com/paulo-al-castro/mt5se
+
+"""
+Panel Module - indicators for a whole universe of assets at once.
+
+A panel is a pandas.DataFrame indexed by time with one column per asset (time x asset), like the
+one returned by get_panel(dbars). Each function computes an indicator for every asset in one call
+and returns a panel of the same shape, so analysts can just slice it: rsi(closes)[asset].
+
+Assets may have different listing dates or missing bars (NaN in the panel). Each column is treated
+as its own serie of valid observations: they are packed to the top of the matrix, the kernels of
+mt5se.indicators run over all columns together, and the results are scattered back to the original
+rows. So the result for an asset is the same as computing the indicator on its own bars, and it is
+NaN where the asset has no bar.
+"""
+
+import numpy as np
+import pandas as pd
+import mt5se.indicators as indicators
+
+
+def get_panels(dbars, fields=('open', 'high', 'low', 'close'), assets=None):
+    """
+        Returns a dictionary with one panel (time x asset) for each field, with the field column of each asset bars
+            in dbars aligned by the 'time' column. Missing bars are NaN.
+            Bars without 'time' column are aligned by their last row
+    """
+    if assets is None:
+        assets = list(dbars.keys())
+    assets = [a for a in assets if dbars.get(a) is not None and len(dbars[a]) > 0]
+    if len(assets) == 0:
+        return {field: pd.DataFrame(dtype=float) for field in fields}
+    if all('time' in dbars[a] for a in assets):
+        times = [dbars[a]['time'].values for a in assets]
+        first = times[0]
+        if all(len(t) == len(first) and (t == first).all() for t in times):
+            # usual case: all assets have the same bars times, no alignment needed
+            index = pd.DatetimeIndex(first, name='time')
+            rows = None
+        else:
+            union = np.unique(np.concatenate(times))
+            index = pd.DatetimeIndex(union, name='time')
+            rows = [np.searchsorted(union, t) for t in times]
+    else:
+        length = max(len(dbars[a]) for a in assets)
+        index = pd.RangeIndex(length)
+        rows = [np.arange(length - len(dbars[a]), length) for a in assets]
+    panels = dict()
+    for field in fields:
+        x = np.full((len(index), len(assets)), np.nan)
+        for j, a in enumerate(assets):
+            values = np.asarray(dbars[a][field], dtype=float)
+            if rows is None:
+                x[:, j] = values
+            else:
+                x[rows[j], j] = values
+        panels[field] = pd.DataFrame(x, index=index, columns=assets)
+    return panels
+
+
+def get_panel(dbars, field='close', assets=None):
+    """
+        Returns a panel (time x asset) with the field column of each asset bars in dbars, see get_panels()
+    """
+    return get_panels(dbars, (field,), assets)[field]
+
+
+def _pack(x, valid):
+    """
+        Moves the valid rows of each column to the top, keeping their order.
+            Returns the packed matrix (padded with the last valid value), the row order and the valid counts
+    """
+    order = np.argsort(~valid, axis=0, kind='stable')
+    packed = np.take_along_axis(x, order, axis=0)
+    counts = valid.sum(axis=0)
+    rows = np.arange(len(x)).reshape(-1, 1)
+    last = np.take_along_axis(packed, np.maximum(counts - 1, 0).reshape(1, -1), axis=0)
+    packed = np.where(rows < counts, packed, last)
+    return packed, order, counts
+
+
+def _unpack(y, order, counts):
+    """
+        Inverse of _pack(), rows that were not valid become NaN
+    """
+    rows = np.arange(len(y)).reshape(-1, 1)
+    y = np.where(rows < counts, y, np.nan)
+    out = np.empty_like(y)
+    np.put_along_axis(out, order, y, axis=0)
+    return out
+
+
+def apply(kernel, *panels, **kwargs):
+    """
+        Applies a kernel of mt5se.indicators (e.g. indicators.rsi) to one or more panels with the same shape,
+            handling NaN as described in the module documentation. A bar is valid when it is not NaN in all given panels.
+            Returns a panel, or a tuple of panels if the kernel returns a tuple
+    """
+    ref = panels[0]
+    values = [np.asarray(p, dtype=float) for p in panels]
+    if ref.size == 0:
+        return ref.copy()
+    valid = np.ones(values[0].shape, dtype=bool)
+    for v in values:
+        valid &= ~np.isnan(v)
+    packed = []
+    for v in values:
+        p, order, counts = _pack(v, valid)
+        packed.append(p)
+    res = kernel(*packed, **kwargs)
+    wrap = lambda y: pd.DataFrame(_unpack(y, order, counts), index=ref.index, columns=ref.columns)
+    if isinstance(res, tuple):
+        return tuple(wrap(y) for y in res)
+    return wrap(res)
+
+
+def sma(panel, length=10):
+    """
+        Simple moving average of each asset, see indicators.sma()
+    """
+    return apply(indicators.sma, panel, length=length)
+
+
+def ema(panel, length=10):
+    """
+        Exponential moving average of each asset, see indicators.ema()
+    """
+    return apply(indicators.ema, panel, length=length)
+
+
+def rsi(panel, length=14, method='wilder'):
+    """
+        RSI of each asset, see indicators.rsi(). For method='simple' the panel should hold returns
+    """
+    return apply(indicators.rsi, panel, length=length, method=method)
+
+
+def macd(panel, fast=12, slow=26, signal_length=9):
+    """
+        MACD of each asset, returns three panels (macd, signal, histogram), see indicators.macd()
+    """
+    return apply(indicators.macd, panel, fast=fast, slow=slow, signal_length=signal_length)
+
+
+def slope(panel, length=10):
+    """
+        Rolling slope of each asset, see indicators.slope()
+    """
+    return apply(indicators.slope, panel, length=length)
+
+
+def rolling_std(panel, length=20, ddof=0):
+    """
+        Rolling standard deviation of each asset, see indicators.rolling_std()
+    """
+    return apply(indicators.rolling_std, panel, length=length, ddof=ddof)
+
+
+def bollinger(panel, length=20, k=2.0):
+    """
+        Bollinger bands of each asset, returns three panels (middle, upper, lower), see indicators.bollinger()
+    """
+    return apply(indicators.bollinger, panel, length=length, k=k)
+
+
+def atr(high, low, close, length=14, method='wilder'):
+    """
+        ATR of each asset from the high, low and close panels, see indicators.atr()
+    """
+    return apply(indicators.atr, high, low, close, length=length, method=method)
+
+
+def returns(open, close):
+    """
+        Returns the panel of bar returns close/open-1 (the returns used by tech.rsi)
+    """
+    return close / open - 1
@@ -0,0 +1,184 @@
+# This file is part of the mt5se package
+#  mt5se home: https://github.com/paulo-al-castro/mt5se
+
+"""
+Retraining Module - walk-forward retraining of the models used by traders and analysts.
+
+A RetrainScheduler keeps the model that is serving predictions and decides when a new one should
+be trained: every N new bars, when a period of time has passed since the last training, or when the
+recent hit rate of the model drops (drift). The new model is trained in a background worker on a
+copy of the latest bars while the current model keeps serving, and it replaces the current one at
+once when it is ready. If a background training fails, the error is logged and the current model keeps
+serving. For instance,
+    sched=se.retraining.RetrainScheduler(train,every_bars=50)
+    sched.start(bars)                 # first model, trained synchronously
+    ...
+    model=sched.step(bars)            # every bar: starts a retraining if needed, returns the serving model
+    sched.record(prediction,actual)   # optional, feeds the drift trigger
+where train(bars,model) returns a fitted model (model is the current one, see warm_start_fit()).
+"""
+
+import copy
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from sklearn.base import clone
+
+
+def warm_start_fit(model, X, Y, grow=10):
+    """
+        Returns a new model fitted on X,Y without changing model. Estimators with warm_start and n_estimators
+            (e.g. RandomForestClassifier) keep their trees and add grow trees fitted on X,Y.
+            Other estimators are fitted from scratch
+    """
+    params = model.get_params() if hasattr(model, 'get_params') else dict()
+    if 'warm_start' in params and 'n_estimators' in params and hasattr(model, 'estimators_'):
+        new = copy.deepcopy(model)
+        new.set_params(warm_start=True, n_estimators=len(model.estimators_) + grow)
+        return new.fit(X, Y)
+    return clone(model).fit(X, Y)
+
+
+class RetrainScheduler:
+    """
+        Trains models in background and swaps them when ready, see the module documentation
+    """
+    def __init__(self, train, every_bars=None, every=None, drift=None, drift_window=50, executor=None):
+        """
+            train - function train(bars,model) that returns a fitted model, model is the serving one (None at start)
+            every_bars - retrains after this number of new bars
+            every - datetime.timedelta, retrains when the last bar is this much newer than the bars of the last training
+            drift - retrains when the hit rate of the last drift_window records (see record()) is lower than drift
+            executor - concurrent.futures executor used to train (default: one background thread).
+                With a process pool, train, bars and model must be picklable
+        """
+        self.train = train
+        self.every_bars = every_bars
+        self.every = every
+        self.drift = drift
+        self.hits = deque(maxlen=drift_window)
+        self.executor = executor if executor is not None else ThreadPoolExecutor(1)
+        self.own_executor = executor is None
+        self.lock = threading.Lock()
+        self.model = None
+        self.future = None
+        self.new_bars = 0
+        self.last_time = None     # time of the last bar seen
+        self.trained_time = None  # time of the last bar used in the serving model training
+        self.retrains = 0
+        self.failures = 0
+        self.last_error = None
+
+    def start(self, bars):
+        """
+            Trains the first model synchronously and returns it
+        """
+        self.model = self.train(bars, None)
+        self.trained_time = self._last(bars)
+        self.last_time = self.trained_time
+        self.new_bars = 0
+        self.hits.clear()
+        return self.model
+
+    def _last(self, bars):
+        if 'time' in bars and len(bars) > 0:
+            return bars['time'].iloc[-1]
+        return None
+
+    def _count(self, bars):
+        """
+            Returns the number of bars newer than the last bar seen
+        """
+        if self.last_time is None or 'time' not in bars:
+            return 1
+        times = bars['time'].values
+        return len(times) - int(np.searchsorted(times, np.datetime64(self.last_time), side='right'))
+
+    def record(self, prediction, actual):
+        """
+            Records whether a prediction was right, used by the drift trigger
+        """
+        self.hits.append(prediction == actual)
+
+    def hit_rate(self):
+        """
+            Hit rate of the recorded predictions (NaN if there is none)
+        """
+        return float(np.mean(self.hits)) if len(self.hits) > 0 else np.nan
+
+    def due(self):
+        """
+            Returns the reason to retrain now ('bars', 'time' or 'drift') or None
+        """
+        if self.every_bars is not None and self.new_bars >= self.every_bars:
+            return 'bars'
+        if self.every is not None and self.last_time is not None and self.trained_time is not None \
+                and self.last_time - self.trained_time >= self.every:
+            return 'time'
+        if self.drift is not None and len(self.hits) == self.hits.maxlen and self.hit_rate() < self.drift:
+            return 'drift'
+        return None
+
+    def _swap(self):
+        """
+            Replaces the serving model by the trained one, if the training is finished
+        """
+        if self.future is not None and self.future.done():
+            future, self.future = self.future, None
+            error = future.exception()
+            if error is not None:
+                # keeps serving the current model, a new training starts when the next trigger fires
+                self.failures += 1
+                self.last_error = error
+                print('Background retraining failed, keeping the current model: ', repr(error))
+                return
+            model, trained_time = future.result()
+            with self.lock:
+                self.model = model
+                self.trained_time = trained_time
+                self.retrains += 1
+            self.hits.clear()
+
+    def step(self, bars):
+        """
+            Receives the latest bars (every bar), starts a background training on a copy of them if one is due
+            and no training is running, and returns the serving model
+        """
+        self._swap()
+        self.new_bars += self._count(bars)
+        last = self._last(bars)
+        if last is not None:
+            self.last_time = last
+        if self.future is None and self.due() is not None:
+            self.new_bars = 0
+            self.future = self.executor.submit(_train, self.train, bars.copy(), self.model, last)
+        return self.get_model()
+
+    def get_model(self):
+        """
+            Returns the serving model
+        """
+        with self.lock:
+            return self.model
+
+    def wait(self):
+        """
+            Waits for the running training (if any), swaps the model and returns it
+        """
+        if self.future is not None:
+            self.future.exception()  # waits without raising, failures are handled by _swap()
+            self._swap()
+        return self.get_model()
+
+    def close(self):
+        """
+            Waits for the running training and releases the worker
+        """
+        self.wait()
+        if self.own_executor:
+            self.executor.shutdown(wait=True)
+
+
+def _train(train, bars, model, last_time):
+    return train(bars, model), last_time
@@ -42,7 +42,7 @@ class MonoAssetTrader(se.Trader):
         # number of shares that you can buy
         price=se.get_last(bars)
         free_shares=se.get_affor_shares(asset,price)
-        rsi=se.tech.rsi(bars)
+        rsi=se.tech.rsi(bars,asset)
         if rsi>=70:   
             order=se.buyOrder(asset,free_shares)
         else:
@@ -68,7 +68,7 @@ class MultiAssetTrader(se.Trader):
             # number of shares that you can buy of asset 
             price=se.get_last(bars)
             free_shares=se.get_affor_shares(asset,price,money)
-            rsi=se.tech.rsi(bars)
+            rsi=se.tech.rsi(bars,asset)
             if rsi>=70 and free_shares>0: 
                 order=se.buyOrder(asset,free_shares)
             elif  rsi<70 and curr_shares>0:
@@ -90,7 +90,7 @@ class SimpleAITrader(se.Trader):
         if len(assets)!=1:
             print('Error, this trader is supposed to deal with just one asset')
             return None
-        bars=dbars[assets[0]]
+        bars=dbars[assets[0]].copy()
         # remove irrelevant info
         if 'time' in bars:
             del bars['time']
@@ -109,31 +109,25 @@ class SimpleAITrader(se.Trader):
 
         clf = clf.fit(X, Y)
         self.clf=clf
+        self.features=dict() # lagged feature row of each asset, updated with the new bars only
 
     def trade(self,dbars):
             assets=dbars.keys()
             orders=[]
             timeFrame=10 # it takes into account the last 10 bars
-            horizon=1 # it project the closing price for next bar
-            target='close' # name of the target column
             money=se.get_balance()/len(assets) # shares the balance equally among the assets
             for asset in assets:
                 bars=dbars[asset]
                 curr_shares=se.get_shares(asset)
                 price=se.get_last(bars)
                 free_shares=se.get_affor_shares(asset,price,money)
-                # get new information (bars), transform it in X
-                bars=dbars[asset]
-                #remove irrelevant info
-                if 'time' in bars:
-                    del bars['time']
-                # convert from bars to dataset
-                ds=se.ai_utils.bars2Dataset(bars,target,timeFrame,horizon)
-                # Get X fields
-                X=se.ai_utils.fromDs2NpArrayAllBut(ds,['target'])
+                # get new information (bars), transform it in X (same columns as bars2Dataset, latest bars)
+                if asset not in self.features:
+                    self.features[asset]=se.ai_utils.LaggedFeatures(timeFrame)
+                x=self.features[asset].sync(bars)
 
                 # predict the result, using the latest info
-                p=self.clf.predict([X[-1]])
+                p=self.clf.predict([x])
                 if p==2:
                     #buy it
                     order=se.buyOrder(asset,free_shares)
@@ -152,13 +146,22 @@ from sklearn.ensemble import RandomForestClassifier
 #from sklearn.preprocessing import KBinsDiscretizer
 
 class RandomForestTrader(se.Trader):
-
-    def setup(self,dbars):
-        assets=list(dbars.keys())
-        if len(assets)!=1:
-            print('Error, this trader is supposed to deal with just one asset')
-            return None
-        bars=dbars[assets[0]]
+    def __init__(self,retrain_every=None,warm_start=False,drift=None,drift_window=50):
+        """
+            retrain_every - if given, the model is retrained in background every retrain_every bars with the latest bars
+                (see mt5se.retraining), while the current model keeps trading. By default the model is trained only in setup
+            warm_start - retrainings add trees fitted on the latest bars to the current forest instead of fitting a new one
+            drift - if given, the model is also retrained when the hit rate of its last drift_window predictions
+                (checked against the class of the next bar close) is lower than drift
+        """
+        self.retrain_every=retrain_every
+        self.warm_start=warm_start
+        self.drift=drift
+        self.drift_window=drift_window
+        self.scheduler=None
+
+    def train(self,bars,model=None):
+        bars=bars.copy()
         # remove irrelevant info
         if 'time' in bars:
             del bars['time']
@@ -173,35 +176,70 @@ class RandomForestTrader(se.Trader):
         ds['target']=se.ai_utils.discTarget(discretizer,ds['target'])
         Y=se.ai_utils.fromDs2NpArray(ds,['target'])
 
-        #clf = tree.DecisionTreeClassifier()
-        clf = RandomForestClassifier(n_estimators=10)
-        clf = clf.fit(X, Y)
-        self.clf=clf
+        if model is not None and self.warm_start:
+            clf=se.retraining.warm_start_fit(model,X,Y)
+        else:
+            #clf = tree.DecisionTreeClassifier()
+            clf = RandomForestClassifier(n_estimators=10)
+            clf = clf.fit(X, Y)
+        clf.discretizer_=discretizer # classes of the target, used to check the predictions (drift)
+        return clf
+
+    def setup(self,dbars):
+        assets=list(dbars.keys())
+        if len(assets)!=1:
+            print('Error, this trader is supposed to deal with just one asset')
+            return None
+        bars=dbars[assets[0]]
+        if self.retrain_every is not None or self.drift is not None:
+            self.scheduler=se.retraining.RetrainScheduler(self.train,every_bars=self.retrain_every,drift=self.drift,
+                                                          drift_window=self.drift_window)
+            self.clf=self.scheduler.start(bars)
+        else:
+            self.clf=self.train(bars)
+        self.features=dict() # lagged feature row of each asset, updated with the new bars only
+        self.pending=dict()  # (prediction,discretizer,bar time) of each asset, checked when the next bar arrives
+
+    def ending(self,dbars):
+        if self.scheduler is not None:
+            self.scheduler.close()
+
+    def record_prediction(self,asset,bars):
+        """
+            Feeds the drift trigger: the prediction made at the previous bar is compared with the class of this bar close
+        """
+        if asset not in self.pending or 'time' not in bars or len(bars)<2:
+            return
+        p,discretizer,time=self.pending[asset]
+        if bars['time'].iloc[-2]==time:
+            actual=discretizer.transform([[bars['close'].iloc[-1]]])[0,0]
+            self.scheduler.record(p,actual)
+            del self.pending[asset]
+        elif bars['time'].iloc[-1]!=time:
+            del self.pending[asset] # more than one new bar, the prediction horizon was missed
 
     def trade(self,dbars):
             assets=dbars.keys()
             orders=[]
             timeFrame=10 # it takes into account the last 10 bars
-            horizon=1 # it project the closing price for next bar
-            target='close' # name of the target column
             money=se.get_balance()/len(assets) # shares the balance equally among the assets
             for asset in assets:
                 bars=dbars[asset]
                 curr_shares=se.get_shares(asset)
                 price=se.get_last(bars)
                 free_shares=se.get_affor_shares(asset,price,money)
-                # get new information (bars), transform it in X
-                bars=dbars[asset]
-                #remove irrelevant info
-                if 'time' in bars:
-                    del bars['time']
-                # convert from bars to dataset
-                ds=se.ai_utils.bars2Dataset(bars,target,timeFrame,horizon)
-                # Get X fields
-                X=se.ai_utils.fromDs2NpArrayAllBut(ds,['target'])
+                # get new information (bars), transform it in X (same columns as bars2Dataset, latest bars)
+                if asset not in self.features:
+                    self.features[asset]=se.ai_utils.LaggedFeatures(timeFrame)
+                x=self.features[asset].sync(bars)
+                if self.scheduler is not None:
+                    self.record_prediction(asset,bars)
+                    self.clf=self.scheduler.step(bars) # latest trained model, retraining in background when due
 
                 # predict the result, using the latest info
-                p=self.clf.predict([X[-1]])
+                p=self.clf.predict([x])
+                if self.scheduler is not None and 'time' in bars:
+                    self.pending[asset]=(p[0],self.clf.discretizer_,bars['time'].iloc[-1])
                 if p==2:
                     #buy it
                     order=se.buyOrder(asset,free_shares)
@@ -253,15 +291,10 @@ class AnalystTrader(se.Trader):
 
     def saveAnalystFile(self):
             print('save analyst file')
-            df=pd.DataFrame()
-            df['date']=[]
-            df['current']=[]
-            df['predicted']=[] # predicted (annualized) return 
-            df['actual']=[]  # actual (annualized) return from the last cycle (p[t]/p[t-1])^252-1
-            #df['price']=[]   #asset price
-
-            for i in range(len(self.dates)):
-                df.loc[i]=[self.dates[i],self.current[i],self.predicted[i],self.actual[i]]
+            df=pd.DataFrame({'date':self.dates,
+                'current':self.current,
+                'predicted':self.predicted, # predicted (annualized) return 
+                'actual':self.actual})  # actual (annualized) return from the last cycle (p[t]/p[t-1])^252-1
             df.to_csv('analyst_performance.csv') 
 
 
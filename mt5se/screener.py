@@ -0,0 +1,165 @@
+# This file is part of the mt5se package
+#  mt5se home: https://github.com/paulo-al-castro/mt5se
+
+"""
+Screener Module - scans a universe of assets for signals.
+
+The screener loads the latest bars of every asset, builds aligned panels (see mt5se.panel) and
+evaluates a declarative list of indicator conditions for all assets at once. For instance,
+    scr=se.screener.Screener(bars=100)
+    scr.add_condition('rsi','>',70,length=14)
+    scr.add_condition('close','>','sma_50')       # compares with another column of the table
+    scr.add_condition('sma','<','close',length=50)
+    scr.rank_by('rsi_14')
+    table=scr.run(assets)
+returns a table (one row per asset) with the last value of each indicator, whether each
+condition holds, the number of conditions that hold (score) and passed (all conditions hold),
+ranked with the assets that passed first.
+"""
+
+import operator
+import numpy as np
+import pandas as pd
+import mt5se.mt5se as se
+import mt5se.panel as panel
+
+
+_OPS = {'>': operator.gt, '<': operator.lt, '>=': operator.ge, '<=': operator.le,
+        '==': operator.eq, '!=': operator.ne}
+_CROSS = ('crosses_above', 'crosses_below')
+
+_INDICATORS = ('rsi', 'sma', 'ema', 'slope', 'macd', 'bollinger', 'rolling_std', 'atr')
+# indicators that need other panels than the field panel
+_MULTI = {'atr': ('high', 'low', 'close')}
+
+
+class Screener:
+    """
+        Declarative screener, see the module documentation
+    """
+    def __init__(self, timeframe=se.DAILY, bars=100):
+        """
+            timeframe - bars time frame used to load the universe (default DAILY)
+            bars - number of bars loaded for each asset, it should cover the longest indicator window
+        """
+        self.timeframe = timeframe
+        self.bars = bars
+        self.indicators = dict()  # column name -> (indicator, field, output, params)
+        self.conditions = []      # (column, op, value)
+        self.rank_column = None
+        self.rank_ascending = False
+
+    def add_indicator(self, indicator, name=None, field='close', output=0, **params):
+        """
+            Adds an indicator column to the table and returns its name (e.g. 'rsi_14').
+                indicator - name of a function of mt5se.panel ('rsi','sma','ema','slope','macd','bollinger','rolling_std','atr')
+                            or a bars field ('close','open','high','low', ...)
+                output - for indicators with several outputs (macd, bollinger), the index of the output used
+        """
+        if name is None:
+            name = '_'.join([indicator] + [str(v) for v in params.values()])
+            if output:
+                name = name + '_' + str(output)
+        self.indicators[name] = (indicator, field, output, params)
+        return name
+
+    def add_condition(self, indicator, op, value, name=None, field='close', output=0, **params):
+        """
+            Adds the condition 'indicator op value' and returns the indicator column name.
+                op - one of '>','<','>=','<=','==','!=','crosses_above','crosses_below'
+                value - a number or the name of another column of the table (e.g. 'close' or 'sma_50')
+        """
+        if op not in _OPS and op not in _CROSS:
+            raise ValueError('Invalid operator ' + str(op))
+        name = self.add_indicator(indicator, name, field, output, **params)
+        self.conditions.append((name, op, value))
+        return name
+
+    def rank_by(self, column, ascending=False):
+        """
+            Defines the column used to rank the assets that passed (default: score)
+        """
+        self.rank_column = column
+        self.rank_ascending = ascending
+
+    def _fields(self):
+        fields = {'close'}
+        for indicator, field, output, params in self.indicators.values():
+            if indicator in _INDICATORS:
+                fields.update(_MULTI.get(indicator, (field,)))
+            else:
+                fields.add(indicator)
+        for column, op, value in self.conditions:
+            if isinstance(value, str) and value not in self.indicators:
+                fields.add(value)
+        return fields
+
+    def load(self, assets, dbars=None):
+        """
+            Returns a dictionary of panels (one for each needed field) with the latest bars of assets.
+                If dbars is not given, the bars are loaded with se.get_multi_bars()
+        """
+        if dbars is None:
+            dbars = se.get_multi_bars(assets, self.bars, type=self.timeframe)
+        dbars = {a: b for a, b in dbars.items() if b is not None and len(b) > 0}
+        return panel.get_panels(dbars, sorted(self._fields()), assets=[a for a in assets if a in dbars])
+
+    def _series(self, panels, indicator, field, output, params):
+        """
+            Returns the indicator panel (time x asset)
+        """
+        if indicator not in _INDICATORS:
+            return panels[indicator]
+        func = getattr(panel, indicator)
+        args = [panels[f] for f in _MULTI.get(indicator, (field,))]
+        res = func(*args, **params)
+        if isinstance(res, tuple):
+            res = res[output]
+        return res
+
+    def evaluate(self, panels):
+        """
+            Evaluates indicators and conditions over the panels and returns the table (not ranked)
+        """
+        close = panels['close']
+        table = pd.DataFrame(index=close.columns)
+        table['close'] = close.ffill().iloc[-1]
+        previous = dict()
+        for name, (indicator, field, output, params) in self.indicators.items():
+            res = self._series(panels, indicator, field, output, params).ffill()
+            table[name] = res.iloc[-1]
+            previous[name] = res.iloc[-2] if len(res) > 1 else res.iloc[-1] * np.nan
+        for f in panels:
+            if f not in table:
+                table[f] = panels[f].ffill().iloc[-1]
+                previous[f] = panels[f].ffill().iloc[-2] if len(panels[f]) > 1 else table[f] * np.nan
+        previous['close'] = close.ffill().iloc[-2] if len(close) > 1 else table['close'] * np.nan
+        score = pd.Series(0, index=table.index)
+        for column, op, value in self.conditions:
+            if isinstance(value, str):
+                other, other_prev = table[value], previous[value]
+            else:
+                other, other_prev = value, value
+            label = column + ' ' + op + ' ' + str(value)
+            if op == 'crosses_above':
+                ok = (previous[column] <= other_prev) & (table[column] > other)
+            elif op == 'crosses_below':
+                ok = (previous[column] >= other_prev) & (table[column] < other)
+            else:
+                ok = _OPS[op](table[column], other)
+            table[label] = ok.fillna(False).astype(bool)
+            score = score + table[label]
+        table['score'] = score
+        table['passed'] = score == len(self.conditions)
+        return table
+
+    def run(self, assets, dbars=None):
+        """
+            Screens assets and returns the ranked table: assets that passed first, then by the rank column
+        """
+        panels = self.load(assets, dbars)
+        table = self.evaluate(panels)
+        column = self.rank_column if self.rank_column is not None else 'score'
+        table = table.sort_values(['passed', column], ascending=[False, self.rank_ascending])
+        table.index.name = 'asset'
+        return table
@@ -4,37 +4,24 @@
 # Date: 2020-11-17
 
 import pandas as pd 
-import numpy as np 
 import mt5se.mt5se as se
-from scipy import stats
+import mt5se.indicators as indicators
+import mt5se.cache as cache
 
-def rsi(returns):
+def rsi(returns,asset=None):
     """
     	Returns the RSI (Relative Strengh Index) of a given serie of returns.
             if the parameter is a pandas.DataFrame it uses the function mt5se.get_return() to get the
-            serie of returns
+            serie of returns. If it is a bars DataFrame and asset is given, the RSI is computed once per bar
+            for all traders through mt5se.cache
     """
+    if asset is not None and type(returns)==pd.core.frame.DataFrame:
+        return cache.indicator(asset,returns,'tech.rsi',lambda bars: rsi(bars))
     if type(returns)==pd.core.frame.DataFrame:
         returns=se.get_returns(returns)
-    u=0.0
-    uc=0
-    d=0.0
-    dc=0
-    for r in returns:
-        if r>=0:
-            u=u+r
-            uc=uc+1
-        else:
-            d=d+abs(r)
-            dc=dc+1
-    if uc>0:
-        u=u/uc
-    if dc>0:
-        d=d/dc   
-    if d==0:
-        d=1.0
-    ifr=100*( 1 - 1/(1+u/d))
-    return ifr
+    if len(returns)==0:
+        return 0.0
+    return indicators.rsi(returns,len(returns),method='simple')[-1]
 
 
 def slope(serie):
@@ -42,10 +29,7 @@ def slope(serie):
     	Returns the angular coefficient of linear regression (slope)
           for a serie of prices in regular intervals
     """
-    x=np.array(range(len(serie)))
-    #y=np.array(serie)
-    s=stats.linregress(x,serie)
-    return s.slope
+    return indicators.slope(serie,len(serie))[-1]
 
 # equals to slope
 def trend(serie):
@@ -62,12 +46,4 @@ def ma(serie,length=10):
             In the fist points (0-length), it calculcates the average from 0 to index.
             So, the first ma is equal to the first number of the serie, the second is the average between the first and second numbers of the serie, and so on
     """
-    mov_avg=[]
-    for i in range(len(serie)):
-        if i <=length:
-            mov_avg.append(np.mean(serie[0:i+1]))
-        else:
-            mov_avg.append(np.mean(serie[i-9:i+1]))
-    return mov_avg
-
-    
\ No newline at end of file
+    return list(indicators.sma(serie,length,min_periods=1))
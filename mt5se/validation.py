@@ -0,0 +1,175 @@
+# This file is part of the mt5se package
+#  mt5se home: https://github.com/paulo-al-castro/mt5se
+
+"""
+Validation Module - purged walk-forward cross-validation of analysts and models.
+
+Instead of a full backtest, an analyst is evaluated on time-series folds: it is set up with the
+bars before each test block and its analyses over the test block are compared with the forward
+returns (close[t+horizon]/close[t]-1). The forward returns are computed once for all folds, and
+the folds run in parallel processes. For instance,
+    res=se.validation.validate_analyst(se.analysts.RsiAnalyst(),dbars,n_folds=5,window=100)
+    res['hit_rate'].values, res['ic'].values
+Folds are purged: the last horizon bars before a test block are left out of the training, since
+their labels are only known inside the test block. With walk_forward=False, the training also uses
+bars after the test block, and embargo bars just after it are left out too.
+validate_estimator() does the same for a sklearn estimator and a dataset built once (e.g. with
+mt5se.ai_utils.sliding_dataset).
+"""
+
+import os
+import copy
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+from sklearn.base import clone, is_regressor
+
+
+def purged_folds(n, n_folds=5, horizon=1, embargo=0, walk_forward=True, min_train=None, max_train=None):
+    """
+        Returns a list of (train,test) index arrays over n time ordered samples.
+            walk_forward - train only with samples before the test block (min_train samples are never tested,
+                default n//(n_folds+1)), otherwise with samples before and after it
+            horizon - samples before the test block whose labels overlap it, removed from the training (purge)
+            embargo - samples after the test block removed from the training (only when walk_forward=False)
+            max_train - maximum number of training samples (the latest ones), None uses all
+    """
+    if walk_forward:
+        if min_train is None:
+            min_train = n // (n_folds + 1)
+        bounds = np.linspace(min_train, n, n_folds + 1).astype(int)
+    else:
+        bounds = np.linspace(0, n, n_folds + 1).astype(int)
+    folds = []
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        if b <= a:
+            continue
+        test = np.arange(a, b)
+        end = max(a - horizon, 0)
+        start = max(end - max_train, 0) if max_train is not None else 0
+        train = np.arange(start, end)
+        if not walk_forward and b + embargo < n:
+            after = np.arange(b + embargo, n)
+            train = np.concatenate((train, after))
+        if len(train) > 0:
+            folds.append((train, test))
+    return folds
+
+
+def _scores(predicted, actual, target=None, classes=False):
+    """
+        Returns (number of predictions, hit rate, information coefficient) of the not NaN predictions.
+            The hit rate is the fraction of predictions equal to target (classes=True) or with the same sign of actual,
+            the IC is the rank correlation between predictions and actual returns
+    """
+    predicted = np.asarray(predicted, dtype=float).ravel()
+    actual = np.asarray(actual, dtype=float).ravel()
+    valid = ~np.isnan(predicted) & ~np.isnan(actual)
+    n = int(valid.sum())
+    if n == 0:
+        return 0, np.nan, np.nan
+    if classes:
+        hit = np.mean(predicted[valid] == np.asarray(target, dtype=float).ravel()[valid])
+    else:
+        hit = np.mean(np.sign(predicted[valid]) == np.sign(actual[valid]))
+    if n > 1 and np.ptp(predicted[valid]) > 0 and np.ptp(actual[valid]) > 0:
+        ic = spearmanr(predicted[valid], actual[valid])[0]
+    else:
+        ic = np.nan
+    return n, hit, ic
+
+
+def _run(func, tasks, n_jobs):
+    """
+        Returns [func(*task) for task in tasks], in a process pool if n_jobs!=1 (None uses all cpus)
+    """
+    if n_jobs == 1 or len(tasks) <= 1:
+        return [func(*task) for task in tasks]
+    workers = min(len(tasks), n_jobs if n_jobs is not None else (os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func, *task) for task in tasks]
+        return [f.result() for f in futures]
+
+
+def _table(results, folds):
+    rows = []
+    for i, ((train, test), (n, hit, ic)) in enumerate(zip(folds, results)):
+        rows.append({'fold': i, 'train_start': train[0], 'train_end': train[-1], 'test_start': test[0],
+                     'test_end': test[-1], 'n': n, 'hit_rate': hit, 'ic': ic})
+    return pd.DataFrame(rows, columns=['fold', 'train_start', 'train_end', 'test_start', 'test_end', 'n', 'hit_rate', 'ic'])
+
+
+def _estimator_fold(estimator, X, y, returns, train, test):
+    estimator.fit(X[train], y[train])
+    predicted = estimator.predict(X[test])
+    actual = returns[test] if returns is not None else y[test]
+    if is_regressor(estimator):
+        return _scores(predicted, actual)
+    return _scores(predicted, actual, y[test], classes=True)
+
+
+def validate_estimator(estimator, X, y, returns=None, n_folds=5, horizon=1, embargo=0, walk_forward=True,
+                       min_train=None, max_train=None, n_jobs=None):
+    """
+        Cross-validates a sklearn estimator over a time ordered dataset X,y (e.g. from ai_utils.sliding_dataset,
+            X may be 3-D) and returns a DataFrame with n, hit_rate and ic of each fold (see purged_folds()).
+            For classifiers the hit rate compares predictions and y, for regressors their signs.
+            The IC is computed against returns (the forward return of each sample) if given, otherwise y
+    """
+    X = np.asarray(X)
+    if X.ndim > 2:
+        X = X.reshape(len(X), -1)
+    y = np.asarray(y).ravel()
+    if returns is not None:
+        returns = np.asarray(returns, dtype=float).ravel()
+    folds = purged_folds(len(X), n_folds, horizon, embargo, walk_forward, min_train, max_train)
+    tasks = [(clone(estimator), X, y, returns, train, test) for train, test in folds]
+    return _table(_run(_estimator_fold, tasks, n_jobs), folds)
+
+
+def forward_returns(dbars, horizon=1, assets=None):
+    """
+        Returns the matrix (bars x assets) of forward returns close[t+horizon]/close[t]-1 (NaN in the last horizon bars)
+    """
+    if assets is None:
+        assets = list(dbars.keys())
+    close = np.column_stack([np.asarray(dbars[a]['close'], dtype=float) for a in assets])
+    fwd = np.full(close.shape, np.nan)
+    fwd[:len(close) - horizon] = close[horizon:] / close[:len(close) - horizon] - 1
+    return fwd
+
+
+def _analyst_fold(analyst, dbars, assets, fwd, train, test, window):
+    analyst.setup({a: dbars[a].iloc[train[0]:train[-1] + 1].reset_index(drop=True) for a in assets})
+    predicted = np.full((len(test), len(assets)), np.nan)
+    for i, t in enumerate(test):
+        start = max(t - window + 1, 0)
+        analysis = analyst.analyze({a: dbars[a].iloc[start:t + 1].reset_index(drop=True) for a in assets})
+        for j, a in enumerate(assets):
+            value = analysis.get(a) if analysis is not None else None
+            if value is not None:
+                predicted[i, j] = value
+    return _scores(predicted, fwd[test])
+
+
+def validate_analyst(analyst, dbars, n_folds=5, horizon=1, window=None, min_train=None, max_train=None, n_jobs=None):
+    """
+        Walk-forward validation of an analyst: for each fold it is set up with the bars before the test block
+            (purged by horizon bars) and analyze() is called for each test bar with the last window bars
+            (default min_train). Returns a DataFrame with n, hit_rate and ic of each fold, comparing the analyses
+            (None is ignored) with the forward returns of each asset.
+            The bars of all assets should be aligned (same times). With n_jobs!=1 folds run in a process pool,
+            so the analyst should be picklable; each fold uses its own copy of the analyst
+    """
+    assets = list(dbars.keys())
+    n = min(len(dbars[a]) for a in assets)
+    dbars = {a: dbars[a].iloc[len(dbars[a]) - n:].reset_index(drop=True) for a in assets}
+    fwd = forward_returns(dbars, horizon, assets)
+    if min_train is None:
+        min_train = (n - horizon) // (n_folds + 1)
+    if window is None:
+        window = min_train
+    folds = purged_folds(n - horizon, n_folds, horizon, 0, True, min_train, max_train)
+    tasks = [(copy.deepcopy(analyst), dbars, assets, fwd, train, test, window) for train, test in folds]
+    return _table(_run(_analyst_fold, tasks, n_jobs), folds)
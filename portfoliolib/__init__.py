@@ -1,7 +1,12 @@
 # portfoliolib/__init__.py
 
 # Torna as classes principais facilmente acessíveis ao importar o pacote
-from .optimizers import BaseOptimizer, EqualWeightOptimizer, SharpeOptimizer
+from .optimizers import (BaseOptimizer, EqualWeightOptimizer, SharpeOptimizer, SimplexOptimizer,
+                         MinVarianceOptimizer, RiskParityOptimizer, HRPOptimizer, FrontierOptimizer,
+                         ResampledOptimizer)
+from .moments import RollingMoments
+from .risk import RiskEngine
+from .stress import StressTester, HISTORICAL_SCENARIOS
 from .manager import PortfolioManager
 from .backtester import PortfolioBacktester, WeightToOrderAdapter
 from .agent import PortfolioAgent
@@ -18,7 +18,19 @@ class PortfolioAgent:
                  lookback_period: pd.DateOffset,
                  rebalance_frequency: str = 'D',  # 'D', 'W', 'M', 'Q', 'Y', '1H', '30T'
                  trade_interval_seconds: int = 60,
-                 state_file: str = "portfolio_state.json"):
+                 state_file: str = "portfolio_state.json",
+                 incremental: bool = False):
+        """
+        Args:
+            incremental: Após o primeiro rebalanceamento, roda os backtests dos traders só desde a última barra
+                já vista e acrescenta os novos retornos ao histórico do manager (append_returns), em vez de
+                refazer todo o lookback; o otimizador só é chamado se chegaram barras novas. É uma aproximação:
+                o backtest de se.backtest não continua de onde parou, cada trecho recomeça zerado (setup,
+                capital, sem posições) na última barra vista. Como só entram retornos, o capital não importa, e
+                para traders que devolvem pesos a carteira é remontada na primeira barra; diferem da curva contínua
+                os traders cujo estado depende das ordens passadas (ex: stops, contagem de barras na posição).
+                Por isso é opcional; o padrão refaz todo o lookback a cada rebalanceamento (update_weights)
+        """
         
         self.manager = manager
         self.prestart_dt = prestart_dt
@@ -26,6 +38,9 @@ class PortfolioAgent:
         self.rebalance_frequency = rebalance_frequency
         self.trade_interval = trade_interval_seconds
         self.state_file = state_file
+        self.incremental = incremental
+        self.last_curve_time = None  # última barra das curvas dos traders já passada ao manager
+        self.curve_traders = None  # traders com curva no histórico incremental
         self.all_assets = self._get_all_assets()
         self.last_rebalance_time = None
         self.trader_frequencies = {}
@@ -41,6 +56,11 @@ class PortfolioAgent:
         self.enable_strategy_trading = False  # Desabilita trading de estratégias por padrão
         self.min_rebalance_interval = timedelta(minutes=5)  # Intervalo mínimo entre rebalances
         
+        # Screeners agendados (ver add_screener)
+        self.scheduler = schedule.Scheduler()
+        self.screeners = {}
+        self.screener_results = {}
+        
     def _get_all_assets(self):
         """Extrai todos os ativos únicos de todos os traders."""
         all_assets = set()
@@ -51,6 +71,37 @@ class PortfolioAgent:
                 all_assets.update(trader.assets)
         return list(all_assets)
     
+    def add_screener(self, name: str, screener, assets, every_minutes: int = 60, callback=None):
+        """
+        Agenda um screener (se.screener.Screener) para rodar periodicamente no loop principal do agente.
+        
+        Args:
+            name: Nome do screener (chave em self.screener_results)
+            screener: Objeto se.screener.Screener com as condições já definidas
+            assets: Universo de ativos a ser varrido
+            every_minutes: Intervalo entre execuções em minutos
+            callback: Função opcional chamada com a tabela ranqueada a cada execução
+        """
+        if name in self.screeners:
+            self.scheduler.cancel_job(self.screeners[name]['job'])
+        job = self.scheduler.every(every_minutes).minutes.do(self._run_screener, name)
+        self.screeners[name] = {'screener': screener, 'assets': list(assets), 'callback': callback, 'job': job}
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Screener '{name}' agendado a cada {every_minutes} min ({len(assets)} ativos)")
+    
+    def _run_screener(self, name: str):
+        """Executa um screener agendado e guarda a tabela ranqueada em self.screener_results."""
+        entry = self.screeners[name]
+        try:
+            start = time.time()
+            table = entry['screener'].run(entry['assets'])
+            self.screener_results[name] = table
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Screener '{name}': {int(table['passed'].sum())} de {len(table)} ativos "
+                  f"passaram ({time.time() - start:.1f}s)")
+            if entry['callback'] is not None:
+                entry['callback'](table)
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Erro no screener '{name}': {e}")
+    
     def _get_trader_positions(self, trader_name):
         """
         Obtém posições específicas de um trader baseado em seu magic number.
@@ -438,6 +489,11 @@ class PortfolioAgent:
                     import traceback
                     traceback.print_exc()
                     continue
+            
+            # Indicadores pedidos por mais de um trader no mesmo bar são calculados uma única vez (se.cache)
+            cache_stats = se.cache.stats()
+            print(f"   - Cache de indicadores: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+                  f"(taxa de acerto {cache_stats['hit_rate']:.1%})")
                         
         except Exception as e:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Erro na execução: {e}")
@@ -538,6 +594,7 @@ class PortfolioAgent:
             # Converte lookback_period para timedelta se for DateOffset
             if hasattr(self.lookback_period, 'delta'):
                 lookback_delta = self.lookback_period.delta
+                lookback_start = lookback_end - lookback_delta
             else:
                 # Para DateOffset(minutes=10), converte manualmente
                 try:
@@ -552,6 +609,13 @@ class PortfolioAgent:
             print(f"   - Lookback: {lookback_start.date()} a {lookback_end.date()}")
             print(f"   - Prestart: {prestart_date.date()}")
             
+            # Modo incremental: só as barras desde a última já passada ao manager
+            incremental = (self.incremental and self.last_curve_time is not None
+                           and self.manager.equity_moments is not None and self.last_curve_time > lookback_start)
+            backtest_start = self.last_curve_time if incremental else lookback_start
+            if incremental:
+                print(f"   - Incremental: backtests a partir de {backtest_start}")
+            
             # Coleta dados históricos para cada trader
             lookback_curves = pd.DataFrame()
             successful_backtests = 0
@@ -575,7 +639,7 @@ class PortfolioAgent:
                     bts = se.backtest.set(
                         assets=assets_list,
                         prestart=prestart_date,
-                        start=lookback_start,
+                        start=backtest_start,
                         end=lookback_end,
                         period=period,
                         capital=100000.0,
@@ -613,7 +677,29 @@ class PortfolioAgent:
             # CORREÇÃO: Só rebalanceia se tiver dados suficientes
             if successful_backtests >= 2 and not lookback_curves.empty:
                 print(f"   - Atualizando pesos com {len(lookback_curves.columns)} traders")
-                self.manager.update_weights(lookback_curves)
+                if not self.incremental:
+                    self.manager.update_weights(lookback_curves)
+                else:
+                    missing = sorted(self.curve_traders - set(lookback_curves.columns)) if incremental else []
+                    if missing:
+                        # Sem o trecho de algum trader, a barra entraria como retorno zero: tenta de novo no próximo
+                        print(f"   - Sem barras novas de {', '.join(missing)}, histórico mantido")
+                    elif incremental:
+                        # Cada trecho recomeça zerado na última barra vista (aproximação, ver __init__):
+                        # entram só os retornos das barras novas com valor para todos os traders do histórico
+                        new_returns = lookback_curves[sorted(self.curve_traders)].pct_change()
+                        new_returns = new_returns.loc[new_returns.index > self.last_curve_time].dropna()
+                        for bar_time, row in new_returns.iterrows():
+                            self.manager.append_returns(row, bar_time)
+                        print(f"   - {len(new_returns)} barras novas acrescentadas")
+                        self.last_curve_time = lookback_curves.index.max()
+                    else:
+                        self.manager.set_equity_history(lookback_curves)
+                        self.curve_traders = set(lookback_curves.columns)
+                        self.last_curve_time = lookback_curves.index.max()
+                    
+                    if not self.manager.refresh_weights(start=lookback_start):
+                        print(f"   - Sem barras novas suficientes, pesos mantidos")
                 
                 # Executa traders e ajusta posições
                 self._execute_traders()
@@ -692,6 +778,9 @@ class PortfolioAgent:
                     self._trade_cycle()
                     last_trade_time = current_time
                 
+                # Executa screeners agendados
+                self.scheduler.run_pending()
+                
                 time.sleep(1)
                 
             except KeyboardInterrupt:
@@ -1,9 +1,13 @@
 # portfoliolib/backtester.py (versão final com simulação dia a dia)
 
 import pandas as pd
+import numpy as np
 from datetime import datetime
+from typing import List, Optional, Union
 import mt5se as se
 from .manager import PortfolioManager
+from .moments import RollingMoments, window_moments
+from .optimizers import batch_weights
 import math
 
 
@@ -145,13 +149,21 @@ class WeightToOrderAdapter(se.Trader):
 class PortfolioBacktester:
     def __init__(self, manager: PortfolioManager, start_date: datetime, end_date: datetime,
                  lookback_period: pd.DateOffset, rebalance_frequency: str,
-                 prestart_dt: datetime):
+                 prestart_dt: datetime, moments_halflife: Optional[float] = None,
+                 shrinkage: Union[None, str, float] = None):
+        """
+        Args:
+            moments_halflife: Meia-vida (em dias) da ponderação EWMA dos momentos do lookback. None usa pesos iguais
+            shrinkage: Shrinkage da covariância do lookback (None, 'ledoit_wolf' ou intensidade fixa), ver RollingMoments
+        """
         self.manager = manager
         self.start_date = start_date
         self.end_date = end_date
         self.lookback_period = lookback_period
         self.rebalance_frequency = rebalance_frequency
         self.prestart_dt = prestart_dt
+        self.moments_halflife = moments_halflife
+        self.shrinkage = shrinkage
 
     def _get_trader_returns(self, trader_name: str) -> pd.Series:
         """
@@ -212,10 +224,8 @@ class PortfolioBacktester:
         
         return returns
 
-    def run(self) -> pd.Series:
-        print("Iniciando backtest com simulação precisa dia a dia...")
-        
-        # 1. PRÉ-CÁLCULO DOS RETORNOS PUROS
+    def _collect_returns(self) -> pd.DataFrame:
+        """Executa a simulação base de cada trader e retorna a matriz de retornos diários (dias x traders)."""
         full_returns_df = pd.DataFrame()
         for trader_name in self.manager.trader_map.keys():
             returns_series = self._get_trader_returns(trader_name)
@@ -230,6 +240,34 @@ class PortfolioBacktester:
         
         if full_returns_df.empty:
             print("ERRO FATAL: Nenhum dado de retorno foi pré-calculado.")
+            return full_returns_df
+
+        # Traders que compartilham ativos reaproveitam os indicadores via se.cache
+        cache_stats = se.cache.stats()
+        print(f"\n    Cache de indicadores: {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+              f"(taxa de acerto {cache_stats['hit_rate']:.1%}, {cache_stats['size']} entradas)")
+        return full_returns_df
+
+    def _rebalance_schedule(self, trading_days: pd.DatetimeIndex) -> List[int]:
+        """
+        Índices dos dias de negociação em que o rebalanceamento é checado: o primeiro dia (a partir do segundo)
+        em ou após cada data do calendário de rebalanceamento, no máximo uma checagem por dia.
+        """
+        rebalance_dates = pd.date_range(self.start_date, self.end_date, freq=self.rebalance_frequency)
+        schedule = []
+        next_rebalance_idx = 0
+        for i in range(1, len(trading_days)):
+            if next_rebalance_idx < len(rebalance_dates) and trading_days[i] >= rebalance_dates[next_rebalance_idx]:
+                schedule.append(i)
+                next_rebalance_idx += 1
+        return schedule
+
+    def run(self) -> pd.Series:
+        print("Iniciando backtest com simulação precisa dia a dia...")
+        
+        # 1. PRÉ-CÁLCULO DOS RETORNOS PUROS
+        full_returns_df = self._collect_returns()
+        if full_returns_df.empty:
             return pd.Series(dtype=float)
 
         # 2. SIMULAÇÃO DIA A DIA
@@ -246,6 +284,12 @@ class PortfolioBacktester:
         equity.iloc[0] = self.manager.total_equity
         next_rebalance_idx = 0
 
+        # Momentos do lookback mantidos incrementalmente: cada dia entra uma vez e sai uma vez da janela
+        moments = RollingMoments(full_returns_df.columns, halflife=self.moments_halflife, shrinkage=self.shrinkage)
+        all_days = full_returns_df.index
+        all_returns = full_returns_df.to_numpy(dtype=float)
+        next_row = 0
+
         for i in range(1, len(trading_days)):
             today = trading_days[i]
             yesterday = trading_days[i-1]
@@ -257,21 +301,22 @@ class PortfolioBacktester:
                 # Verifica se temos dados suficientes no lookback
                 lookback_end = today - pd.DateOffset(days=1)
                 
-                # Tenta pegar dados de lookback
+                # Atualiza a janela de lookback: entram os dias até lookback_end, saem os anteriores a lookback_start
                 try:
-                    lookback_returns = full_returns_df.loc[lookback_start:lookback_end]
+                    while next_row < len(all_days) and all_days[next_row] <= lookback_end:
+                        moments.append(all_returns[next_row], all_days[next_row])
+                        # A primeira linha é o retorno nulo do dia inicial, não entra no EWMA
+                        if self.manager.ewma_decay is not None and next_row > 0:
+                            self.manager.observe_returns(all_returns[next_row])
+                        next_row += 1
+                    moments.drop_before(lookback_start)
                     
-                    if len(lookback_returns) >= 5:  # Mínimo 5 pontos de dados
-                        lookback_equity = (1 + lookback_returns).cumprod()
-                        
-                        if not lookback_equity.empty:
-                            self.manager.update_weights(lookback_equity.ffill())
-                            current_weights = pd.Series(self.manager.current_weights)
-                            print(f"   - Pesos atualizados com {len(lookback_returns)} pontos")
-                        else:
-                            print(f"   - Lookback equity vazio. Pesos mantidos.")
+                    if len(moments) >= 5:  # Mínimo 5 pontos de dados
+                        self.manager.update_weights_from_moments(moments)
+                        current_weights = pd.Series(self.manager.current_weights)
+                        print(f"   - Pesos atualizados com {len(moments)} pontos")
                     else:
-                        print(f"   - Lookback insuficiente ({len(lookback_returns)} pontos < 5). Pesos mantidos.")
+                        print(f"   - Lookback insuficiente ({len(moments)} pontos < 5). Pesos mantidos.")
                 except Exception as e:
                     print(f"   - Erro no lookback: {e}. Pesos mantidos.")
                     
@@ -287,4 +332,78 @@ class PortfolioBacktester:
                 print(f"   Day {i}: {today.date()}, Returns: {daily_returns.values}, Portfolio Return: {portfolio_return:.4f}, Equity: ${equity.iloc[i]:,.2f}")
 
         print("\nBacktest walk-forward concluído!")
-        return equity.ffill()
\ No newline at end of file
+        return equity.ffill()
+
+    def run_batch(self, n_jobs: Optional[int] = 1) -> pd.Series:
+        """
+        Versão em lote de run(): com a matriz de retornos dos traders e o calendário de rebalanceamento,
+        calcula de uma vez a média e a covariância das janelas de lookback de todas as datas
+        (moments.window_moments), resolve o otimizador para todas elas (optimizers.batch_weights: em sequência
+        com warm start, ou em n_jobs processos) e só então simula a curva de equity, de forma vetorizada.
+        O resultado é o mesmo de run() para otimizadores que calculam pesos a partir de momentos; os demais
+        usam run().
+
+        Args:
+            n_jobs: Número de processos usados pelo otimizador (1 resolve as datas em sequência com warm start,
+                None usa todas as CPUs)
+        """
+        optimizer = self.manager.optimizer
+        if not hasattr(optimizer, 'calculate_weights_from_moments'):
+            print(f"AVISO: {optimizer.__class__.__name__} não calcula pesos a partir de momentos, usando run()")
+            return self.run()
+        print("Iniciando backtest em lote...")
+
+        # 1. PRÉ-CÁLCULO DOS RETORNOS PUROS
+        full_returns_df = self._collect_returns()
+        if full_returns_df.empty:
+            return pd.Series(dtype=float)
+        trading_days = full_returns_df.loc[self.start_date:self.end_date].index
+        if trading_days.empty:
+            print("AVISO: Nenhum dia de negociação encontrado no período especificado.")
+            return pd.Series(dtype=float)
+
+        # 2. MOMENTOS DAS JANELAS DE LOOKBACK DE TODAS AS DATAS
+        schedule = self._rebalance_schedule(trading_days)
+        rebalance_days = trading_days[schedule]
+        all_days = full_returns_df.index
+        all_returns = full_returns_df.to_numpy(dtype=float)
+        starts = all_days.searchsorted(rebalance_days - self.lookback_period, side='left')
+        ends = all_days.searchsorted(rebalance_days - pd.DateOffset(days=1), side='right')
+        counts, means, covs = window_moments(full_returns_df, starts, ends,
+                                             halflife=self.moments_halflife, shrinkage=self.shrinkage)
+        enough = counts >= 5  # Mínimo 5 pontos de dados
+
+        # 3. PESOS DE TODAS AS DATAS
+        columns = full_returns_df.columns
+        initial = dict(self.manager.current_weights) if optimizer.supports_warm_start else None
+        solved = np.full(means.shape, np.nan)
+        if enough.any():
+            solved[enough] = batch_weights(optimizer, columns, means[enough], covs[enough], initial, n_jobs,
+                                           counts[enough])
+        print(f"   - {int(enough.sum())} de {len(schedule)} datas de rebalanceamento otimizadas")
+
+        # Aplica os pesos no manager em ordem (validação, renormalização e alavancagem como em run())
+        weights_table = [pd.Series(self.manager.current_weights).reindex(columns).fillna(0.0).to_numpy()]
+        next_row = 0
+        for k, day in enumerate(rebalance_days):
+            # Estimador EWMA de volatilidade do manager: cada dia do lookback é observado uma vez
+            while self.manager.ewma_decay is not None and next_row < ends[k]:
+                if next_row > 0:  # a primeira linha é o retorno nulo do dia inicial
+                    self.manager.observe_returns(all_returns[next_row])
+                next_row += 1
+            if enough[k] and np.all(np.isfinite(solved[k])):
+                print(f"\n--- Rebalanceamento em {day.date()} ({counts[k]} pontos) ---")
+                self.manager._cache_covariance(columns, covs[k])
+                self.manager._apply_weights(dict(zip(columns, solved[k])))
+            weights_table.append(pd.Series(self.manager.current_weights).reindex(columns).fillna(0.0).to_numpy())
+
+        # 4. SIMULAÇÃO VETORIZADA: pesos em vigor em cada dia (do último rebalanceamento até ele)
+        period = np.searchsorted(np.asarray(schedule, dtype=int), np.arange(len(trading_days)), side='right')
+        daily_weights = np.asarray(weights_table)[period]
+        daily_returns = np.nan_to_num(full_returns_df.loc[trading_days].to_numpy(dtype=float))
+        portfolio_returns = (daily_returns * daily_weights).sum(axis=1)
+        portfolio_returns[0] = 0.0
+        equity = pd.Series(self.manager.total_equity * np.cumprod(1 + portfolio_returns), index=trading_days)
+
+        print("\nBacktest em lote concluído!")
+        return equity
@@ -2,9 +2,12 @@
 
 import pandas as pd
 import numpy as np
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Sequence, Union
 from mt5se import Trader
 from .optimizers import BaseOptimizer
+from .moments import RollingMoments
+from .risk import RiskEngine
+from .stress import StressTester
 from datetime import datetime
 
 class PortfolioManager:
@@ -19,7 +22,10 @@ class PortfolioManager:
                  initial_weights: Dict[str, float] = None,
                  target_volatility: Optional[float] = None,
                  max_leverage: float = 1.0,
-                 volatility_floor: float = 0.001):
+                 volatility_floor: float = 0.001,
+                 volatility_halflife: Optional[float] = None,
+                 stress_tester: Optional[StressTester] = None,
+                 max_stress_loss: Optional[float] = None):
         """
         Args:
             traders: Lista de traders para o portfólio
@@ -29,6 +35,11 @@ class PortfolioManager:
             target_volatility: Volatilidade anual alvo (ex: 0.10 para 10%). None desativa o controle
             max_leverage: Alavancagem máxima permitida (ex: 1.5 para 150% de exposição)
             volatility_floor: Volatilidade mínima para evitar divisão por zero (padrão 0.1% anual)
+            volatility_halflife: Meia-vida (em dias) do estimador EWMA da covariância usado na volatilidade do
+                portfólio, atualizado a cada dia por observe_returns. None usa a covariância amostral do lookback
+            stress_tester: Cenários de estresse avaliados a cada atualização dos pesos (ver portfoliolib.stress)
+            max_stress_loss: Perda máxima aceita no pior cenário, em fração do capital (ex: 0.20). A alavancagem
+                fica limitada a stress_tester.max_leverage(pesos, max_stress_loss). None apenas reporta os cenários
         """
         
         if not traders:
@@ -44,10 +55,31 @@ class PortfolioManager:
         self.max_leverage = max(max_leverage, 0.1)  # Mínimo 10% para evitar problemas
         self.volatility_floor = max(volatility_floor, 0.0001)  # Mínimo 0.01% anual
         self.current_leverage = 1.0
+        self.base_leverage = 1.0  # alavancagem da volatilidade alvo, antes do limite de estresse
         self.realized_volatility = None
         
+        # Testes de estresse
+        self.stress_tester = stress_tester
+        self.max_stress_loss = max_stress_loss
+        self.stress_results: Optional[pd.Series] = None
+        self.stress_leverage = np.inf  # maior alavancagem dentro de max_stress_loss para os pesos atuais
+        self._stress_pnl: Optional[pd.Series] = None  # P&L dos cenários com alavancagem 1
+        
         # Histórico para cálculo de volatilidade
         self.historical_equity_curves = None
+        # Histórico incremental (append_equity / append_returns): momentos dos retornos e última linha de equity
+        self.equity_moments: Optional[RollingMoments] = None
+        self._last_equity: Optional[np.ndarray] = None
+        self._last_equity_time = None
+        self._rows_since_solve = 0
+        self._cov: Optional[np.ndarray] = None  # covariância diária do último lookback, alinhada a trader_names
+        self.volatility_halflife = volatility_halflife
+        self.ewma_decay = 0.5 ** (1.0 / volatility_halflife) if volatility_halflife else None
+        self.ewma_cov: Optional[np.ndarray] = None
+        # Retornos observados antes de o EWMA existir: ele é criado com as primeiras linhas (meia-vida, mín. 2)
+        self._ewma_buffer: List[np.ndarray] = []
+        self._ewma_seed_rows = max(int(np.ceil(volatility_halflife)), 2) if volatility_halflife else None
+        self._ewma_observed = False
         
         # Cria mapa de traders com nomes únicos
         self.trader_map: Dict[str, Trader] = {}
@@ -66,6 +98,10 @@ class PortfolioManager:
                 counter += 1
             
             self.trader_map[name] = trader
+
+        # Pesos como vetor NumPy alinhado a trader_names (ver a propriedade current_weights)
+        self.trader_names = pd.Index(self.trader_map.keys())
+        self.weights = np.zeros(len(self.trader_names))
         
         # Inicializa pesos
         if initial_weights:
@@ -104,9 +140,104 @@ class PortfolioManager:
         print(f"   - Max leverage: {max_leverage:.1f}x")
         print(f"   - Pesos iniciais: {self.current_weights}")
 
+    @property
+    def current_weights(self) -> Dict[str, float]:
+        """Pesos atuais por trader (cópia; para alterar, atribua um novo dicionário)."""
+        return dict(zip(self.trader_names, self.weights.tolist()))
+
+    @current_weights.setter
+    def current_weights(self, weights: Dict[str, float]):
+        # Traders ausentes ficam com peso zero, nomes desconhecidos são ignorados
+        self.weights = pd.Series(weights, dtype=float).reindex(self.trader_names).fillna(0.0).to_numpy(copy=True)
+
+    def _cache_covariance(self, columns, cov_matrix: np.ndarray):
+        """
+        Guarda a covariância diária do lookback alinhada a trader_names (traders sem dados com variância zero),
+        usada nos recálculos de volatilidade sem voltar às curvas de equity.
+        """
+        idx = self.trader_names.get_indexer(columns)
+        known = idx >= 0
+        cov = np.zeros((len(self.trader_names), len(self.trader_names)))
+        cov[np.ix_(idx[known], idx[known])] = np.asarray(cov_matrix, dtype=float)[np.ix_(known, known)]
+        self._cov = cov
+
+    def _cache_returns(self, returns: pd.DataFrame):
+        """Guarda a covariância dos retornos do lookback (e inicia o EWMA, se ativo)."""
+        if len(returns) >= 2:
+            self._cache_covariance(returns.columns, returns.cov().to_numpy())
+        self._seed_ewma(returns)
+
+    def _seed_ewma(self, returns: pd.DataFrame):
+        """
+        Estima o EWMA com os retornos do lookback enquanto nenhum retorno diário foi observado; a partir do
+        primeiro observe_returns ele só é atualizado por lá.
+        """
+        if self.ewma_decay is None or self._ewma_observed or len(returns) == 0:
+            return
+        self.ewma_cov = self._ewma_average(returns.reindex(columns=self.trader_names).to_numpy(dtype=float))
+
+    def _ewma_average(self, values: np.ndarray) -> np.ndarray:
+        """Média de r r' das linhas com pesos EWMA (a última linha com o maior peso)."""
+        values = np.nan_to_num(values)
+        w = self.ewma_decay ** np.arange(len(values) - 1, -1, -1)
+        return (values * (w / w.sum())[:, None]).T @ values
+
+    def observe_returns(self, returns: Union[Dict[str, float], pd.Series, np.ndarray]):
+        """
+        Atualiza o estimador EWMA com os retornos diários dos traders, Σ ← λΣ + (1-λ) r r' (RiskMetrics, média zero),
+        em O(N²), e recalcula a volatilidade e a alavancagem se target_volatility estiver ativo. Se o EWMA ainda
+        não existe (nem foi estimado com um lookback), as linhas são guardadas e ele é criado com a média ponderada
+        das primeiras (meia-vida, mín. 2 linhas); até lá vale a covariância amostral do lookback.
+        
+        Args:
+            returns: Retorno do dia de cada trader (dicionário, Series ou array na ordem de trader_names)
+        """
+        if self.ewma_decay is None:
+            raise ValueError("observe_returns requer volatility_halflife")
+        if isinstance(returns, np.ndarray):
+            r = np.nan_to_num(returns.astype(float))
+        else:
+            r = np.nan_to_num(pd.Series(returns, dtype=float).reindex(self.trader_names).to_numpy())
+        self._ewma_observed = True
+        if self.ewma_cov is None:
+            self._ewma_buffer.append(r)
+            if len(self._ewma_buffer) >= self._ewma_seed_rows:
+                self.ewma_cov = self._ewma_average(np.array(self._ewma_buffer))
+                self._ewma_buffer = []
+        else:
+            self.ewma_cov = self.ewma_decay * self.ewma_cov + (1.0 - self.ewma_decay) * np.outer(r, r)
+        if self.target_volatility is not None:
+            self.realized_volatility = self._portfolio_volatility()
+            self._set_leverage(self._calculate_leverage_factor(self.realized_volatility))
+
+    def _set_leverage(self, base_leverage: Optional[float] = None):
+        """
+        Alavancagem efetiva: a da volatilidade alvo (base_leverage, sem limite de estresse) limitada pela de
+        estresse dos pesos atuais, min(base, stress_leverage), de modo que o corte desfaz quando o cenário melhora.
+        """
+        if base_leverage is not None:
+            self.base_leverage = base_leverage
+        self.current_leverage = min(self.base_leverage, self.stress_leverage)
+        if self._stress_pnl is not None:
+            self.stress_results = self._stress_pnl * self.current_leverage
+
+    def _portfolio_volatility(self) -> float:
+        """
+        Volatilidade anualizada do portfólio com os pesos atuais, sqrt(w'Σw * 252), a partir da covariância
+        em cache (EWMA, se ativo, ou a amostral do último lookback).
+        """
+        cov = self.ewma_cov if self.ewma_cov is not None else self._cov
+        weight_sum = self.weights.sum()
+        if cov is None or weight_sum <= 0:
+            return self.volatility_floor
+        w = self.weights / weight_sum
+        annual_vol = np.sqrt(max(w @ cov @ w, 0.0) * 252)
+        return max(annual_vol, self.volatility_floor)
+
     def _calculate_portfolio_volatility(self, equity_curves: pd.DataFrame) -> float:
         """
-        Calcula a volatilidade anualizada do portfólio baseada nos pesos atuais.
+        Calcula a volatilidade anualizada do portfólio baseada nos pesos atuais e na covariância amostral
+        das curvas informadas (sem alterar a covariância em cache nem o EWMA).
         
         Args:
             equity_curves: DataFrame com curvas de equity históricas dos traders
@@ -118,35 +249,13 @@ class PortfolioManager:
             return self.volatility_floor
         
         try:
-            # Calcula retornos de cada trader
-            returns = equity_curves.pct_change().dropna()
-            
-            if returns.empty:
+            returns = equity_curves.pct_change().dropna().reindex(columns=self.trader_names)
+            weight_sum = self.weights.sum()
+            if len(returns) < 2 or weight_sum <= 0:
                 return self.volatility_floor
-            
-            # Cria série de pesos alinhada com as colunas de retornos
-            weights_series = pd.Series(index=returns.columns, dtype=float)
-            for col in returns.columns:
-                weights_series[col] = self.current_weights.get(col, 0.0)
-            
-            # Normaliza pesos se necessário
-            weight_sum = weights_series.sum()
-            if weight_sum > 0:
-                weights_series = weights_series / weight_sum
-            else:
-                return self.volatility_floor
-            
-            # Calcula retorno do portfólio ponderado
-            portfolio_returns = (returns * weights_series).sum(axis=1)
-            
-            # Calcula volatilidade
-            daily_vol = portfolio_returns.std()
-            
-            # Anualiza (assumindo 252 dias de trading)
-            annual_vol = daily_vol * np.sqrt(252)
-            
-            # Aplica floor para evitar divisão por zero
-            return max(annual_vol, self.volatility_floor)
+            cov = np.nan_to_num(returns.cov().to_numpy())
+            w = self.weights / weight_sum
+            return max(np.sqrt(max(w @ cov @ w, 0.0) * 252), self.volatility_floor)
             
         except Exception as e:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Erro ao calcular volatilidade: {e}")
@@ -198,6 +307,23 @@ class PortfolioManager:
         
         return var_5pct_percentage
 
+    def calculate_rolling_risk(self, equity: Union[pd.Series, pd.DataFrame], window: int = 250,
+                               levels: Sequence[float] = (0.95, 0.99), method: str = 'historical') -> pd.DataFrame:
+        """
+        VaR e CVaR móveis ao longo de toda a série de equity (ou de várias), em vários níveis de confiança.
+        Ver portfoliolib.risk.RiskEngine.
+        
+        Args:
+            equity: Série de equity do portfólio, ou DataFrame com uma curva por portfólio
+            window: Tamanho da janela móvel (dias)
+            levels: Níveis de confiança
+            method: 'historical', 'parametric' ou 'ewma'
+            
+        Returns:
+            DataFrame com colunas (medida 'var'/'cvar', nível, portfólio), em retorno (negativo em perdas)
+        """
+        return RiskEngine(window=window, levels=levels, method=method).compute_from_equity(equity)
+
     def update_weights(self, historical_equity_curves: pd.DataFrame):
         """
         Atualiza os pesos do portfólio baseado em curvas de equity históricas.
@@ -228,46 +354,204 @@ class PortfolioManager:
                     print(f"[{datetime.now().strftime('%H:%M:%S')}] AVISO: Dados extras ignorados: {extra}")
             
             # Calcula novos pesos apenas para traders com dados
-            new_weights = self.optimizer.calculate_weights(historical_equity_curves)
-            
-            if new_weights:
-                # Valida pesos retornados pelo optimizer
-                if not all(0 <= w <= 1 for w in new_weights.values()):
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] AVISO: Optimizer retornou pesos inválidos, mantendo anteriores")
-                    return
-                
-                # Atualiza apenas os pesos dos traders com dados
-                for trader_name, weight in new_weights.items():
-                    if trader_name in self.trader_map:
-                        self.current_weights[trader_name] = weight
-                
-                # Renormaliza pesos se necessário
-                total_weight = sum(self.current_weights.values())
-                if not np.isclose(total_weight, 1.0, rtol=1e-5) and total_weight > 0:
-                    for name in self.current_weights:
-                        self.current_weights[name] /= total_weight
-                
-                # Calcula volatilidade e ajusta leverage se target_volatility estiver ativo
-                if self.target_volatility is not None:
-                    self.realized_volatility = self._calculate_portfolio_volatility(historical_equity_curves)
-                    old_leverage = self.current_leverage
-                    self.current_leverage = self._calculate_leverage_factor(self.realized_volatility)
-                    
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Volatilidade e Alavancagem:")
-                    print(f"   - Volatilidade realizada: {self.realized_volatility:.1%}")
-                    print(f"   - Volatilidade alvo: {self.target_volatility:.1%}")
-                    print(f"   - Alavancagem: {old_leverage:.2f}x → {self.current_leverage:.2f}x")
-                
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] Pesos atualizados:")
-                for name, weight in self.current_weights.items():
-                    print(f"   - {name}: {weight:.4f} ({weight*100:.2f}%)")
+            if getattr(self.optimizer, 'supports_warm_start', False):
+                # Parte dos pesos atuais: poucas iterações quando os pesos mudam pouco entre rebalanceamentos
+                new_weights = self.optimizer.calculate_weights(historical_equity_curves,
+                                                               current_weights=self.current_weights)
             else:
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] AVISO: Otimizador não retornou novos pesos")
+                new_weights = self.optimizer.calculate_weights(historical_equity_curves)
+            
+            # Covariância do lookback em cache para os cálculos de volatilidade
+            self._cache_returns(historical_equity_curves.pct_change().dropna())
+            self._apply_weights(new_weights)
                 
         except Exception as e:
             print(f"[{datetime.now().strftime('%H:%M:%S')}] Erro ao atualizar pesos: {e}")
             print(f"   - Mantendo pesos e alavancagem atuais")
 
+    def update_weights_from_moments(self, moments: RollingMoments):
+        """
+        Atualiza os pesos a partir de um motor de momentos (RollingMoments) já atualizado com a janela de
+        lookback, sem recalcular retornos, médias e covariâncias. Otimizadores que não aceitam momentos
+        recebem as curvas de equity reconstruídas a partir dos retornos da janela.
+        
+        Args:
+            moments: Momentos dos retornos diários dos traders na janela de lookback
+        """
+        if not hasattr(self.optimizer, 'calculate_weights_from_moments'):
+            self.update_weights((1 + moments.frame()).cumprod())
+            return
+        try:
+            columns = moments.columns
+            if len(columns) == 0 or len(moments) < 2:
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] AVISO: Sem dados de equity para atualizar pesos")
+                return
+            mean_returns, cov_matrix = moments.moments()
+            current_weights = self.current_weights if getattr(self.optimizer, 'supports_warm_start', False) else None
+            new_weights = self.optimizer.weights_from_moments(columns, mean_returns, cov_matrix, current_weights,
+                                                              len(moments))
+            self._cache_covariance(columns, cov_matrix)
+            if self.ewma_decay is not None and not self._ewma_observed:
+                self._seed_ewma(moments.frame())
+            self._apply_weights(new_weights)
+        except Exception as e:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Erro ao atualizar pesos: {e}")
+            print(f"   - Mantendo pesos e alavancagem atuais")
+
+    def _align(self, values: Union[Dict[str, float], pd.Series, np.ndarray]) -> np.ndarray:
+        """Vetor alinhado a trader_names (arrays já devem estar nessa ordem; traders ausentes ficam NaN)."""
+        if isinstance(values, np.ndarray):
+            return values.astype(float)
+        return pd.Series(values, dtype=float).reindex(self.trader_names).to_numpy(copy=True)
+
+    def set_equity_history(self, equity_curves: pd.DataFrame):
+        """
+        Reinicia o histórico incremental com curvas de equity completas (uma passada); depois basta
+        acrescentar as novas linhas com append_equity ou append_returns.
+        
+        Args:
+            equity_curves: DataFrame com curvas de equity dos traders (índice = tempo)
+        """
+        self.equity_moments = RollingMoments(self.trader_names)
+        self._last_equity = None
+        self._last_equity_time = None
+        curves = equity_curves.reindex(columns=self.trader_names)
+        for time, row in zip(curves.index, curves.to_numpy(dtype=float)):
+            self.append_equity(row, time)
+
+    def append_equity(self, row: Union[Dict[str, float], pd.Series, np.ndarray], time=None):
+        """
+        Acrescenta uma linha de equity dos traders (ex: uma nova barra) ao histórico incremental: o retorno em
+        relação à linha anterior entra nos momentos em O(N²), sem copiar curvas nem recalcular retornos.
+        Linhas com tempo anterior ou igual ao da última são ignoradas.
+        
+        Args:
+            row: Equity de cada trader (dicionário, Series ou array na ordem de trader_names)
+            time: Tempo da linha
+        """
+        if self._last_equity_time is not None and time is not None and time <= self._last_equity_time:
+            return
+        equity = self._align(row)
+        if self._last_equity is not None:
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns = equity / self._last_equity - 1.0
+            self.append_returns(np.where(np.isfinite(returns), returns, np.nan), time)
+        # Traders sem valor na linha mantêm a última equity conhecida
+        if self._last_equity is None:
+            self._last_equity = equity
+        else:
+            self._last_equity = np.where(np.isnan(equity), self._last_equity, equity)
+        if time is not None:
+            self._last_equity_time = time
+
+    def append_returns(self, returns: Union[Dict[str, float], pd.Series, np.ndarray], time=None):
+        """
+        Acrescenta uma linha de retornos dos traders ao histórico incremental (NaN conta como 0), e ao
+        estimador EWMA de volatilidade, se ativo. Linhas com tempo anterior ou igual ao da última são ignoradas.
+        
+        Args:
+            returns: Retorno de cada trader (dicionário, Series ou array na ordem de trader_names)
+            time: Tempo da linha
+        """
+        if self._last_equity_time is not None and time is not None and time <= self._last_equity_time:
+            return
+        if self.equity_moments is None:
+            self.equity_moments = RollingMoments(self.trader_names)
+        r = self._align(returns)
+        self.equity_moments.append(r, time)
+        if self.ewma_decay is not None:
+            self.observe_returns(r)
+        self._rows_since_solve += 1
+        if time is not None:
+            self._last_equity_time = time
+
+    def refresh_weights(self, start=None, min_rows: int = 5) -> bool:
+        """
+        Atualiza os pesos a partir do histórico incremental, apenas se chegaram linhas novas desde a última
+        otimização (chamar a cada barra custa O(1) quando nada mudou).
+        
+        Args:
+            start: Início da janela de lookback; linhas anteriores saem dos momentos
+            min_rows: Mínimo de retornos na janela para otimizar
+            
+        Returns:
+            True se o otimizador foi chamado
+        """
+        if self.equity_moments is None:
+            return False
+        if start is not None:
+            before = len(self.equity_moments)
+            self.equity_moments.drop_before(start)
+            self._rows_since_solve += before - len(self.equity_moments)
+        if self._rows_since_solve == 0 or len(self.equity_moments) < min_rows:
+            return False
+        self.update_weights_from_moments(self.equity_moments)
+        self._rows_since_solve = 0
+        return True
+
+    def _apply_weights(self, new_weights: Dict[str, float]):
+        """
+        Valida e aplica os pesos retornados pelo otimizador e ajusta a alavancagem com a covariância em cache.
+        
+        Args:
+            new_weights: Pesos retornados pelo otimizador
+        """
+        if new_weights:
+            # Valida pesos retornados pelo optimizer
+            values = np.fromiter(new_weights.values(), dtype=float, count=len(new_weights))
+            if not np.all((values >= 0) & (values <= 1)):
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] AVISO: Optimizer retornou pesos inválidos, mantendo anteriores")
+                return
+            
+            # Atualiza apenas os pesos dos traders com dados
+            idx = self.trader_names.get_indexer(list(new_weights.keys()))
+            self.weights[idx[idx >= 0]] = values[idx >= 0]
+            
+            # Renormaliza pesos se necessário
+            total_weight = self.weights.sum()
+            if not np.isclose(total_weight, 1.0, rtol=1e-5) and total_weight > 0:
+                self.weights /= total_weight
+            
+            # Calcula volatilidade e ajusta leverage se target_volatility estiver ativo
+            if self.target_volatility is not None:
+                self.realized_volatility = self._portfolio_volatility()
+                old_leverage = self.current_leverage
+                self._set_leverage(self._calculate_leverage_factor(self.realized_volatility))
+                
+                print(f"[{datetime.now().strftime('%H:%M:%S')}] Volatilidade e Alavancagem:")
+                print(f"   - Volatilidade realizada: {self.realized_volatility:.1%}")
+                print(f"   - Volatilidade alvo: {self.target_volatility:.1%}")
+                print(f"   - Alavancagem: {old_leverage:.2f}x → {self.current_leverage:.2f}x")
+            
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] Pesos atualizados:")
+            for name, weight in self.current_weights.items():
+                print(f"   - {name}: {weight:.4f} ({weight*100:.2f}%)")
+            
+            # Limita a alavancagem pela perda no pior cenário de estresse
+            self._apply_stress_limit()
+        else:
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] AVISO: Otimizador não retornou novos pesos")
+
+    def _apply_stress_limit(self):
+        """
+        Avalia os cenários de estresse com os pesos atuais (um produto matricial), chamado a cada atualização
+        dos pesos, e limita a alavancagem a stress_tester.max_leverage(pesos, max_stress_loss).
+        """
+        if self.stress_tester is None or not self.stress_tester.names:
+            return
+        weights = pd.Series(self.weights, index=self.trader_names)
+        self._stress_pnl = self.stress_tester.evaluate(weights)
+        if self.max_stress_loss is not None:
+            self.stress_leverage = self.stress_tester.max_leverage(weights, self.max_stress_loss)
+        self._set_leverage()
+        worst_scenario = self.stress_results.idxmin()
+        worst_loss = -self.stress_results.min()
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] Estresse: pior cenário '{worst_scenario}' "
+              f"(perda de {worst_loss:.1%} do capital, ${worst_loss * self.total_equity:,.2f})")
+        if self.current_leverage < self.base_leverage:
+            print(f"   - Perda acima do limite de {self.max_stress_loss:.1%}: "
+                  f"alavancagem {self.base_leverage:.2f}x → {self.current_leverage:.2f}x")
+
     def allocate_capital(self) -> Dict[str, float]:
         """
         Aloca capital entre traders baseado nos pesos atuais e alavancagem.
@@ -277,12 +561,16 @@ class PortfolioManager:
         """
         self.capital_allocation = {}
         
+        # Estresse avaliado na atualização dos pesos; aqui só se ainda não houve nenhuma
+        if self._stress_pnl is None:
+            self._apply_stress_limit()
+        
         # Capital efetivo considerando alavancagem
         effective_capital = self.total_equity * self.current_leverage
         
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Alocando capital:")
         print(f"   - Capital base: ${self.total_equity:,.2f}")
-        if self.target_volatility is not None:
+        if self.target_volatility is not None or self.stress_tester is not None:
             print(f"   - Alavancagem: {self.current_leverage:.2f}x")
             print(f"   - Capital efetivo: ${effective_capital:,.2f}")
         
@@ -318,7 +606,9 @@ class PortfolioManager:
                 'realized_volatility': self.realized_volatility,
                 'current_leverage': self.current_leverage,
                 'max_leverage': self.max_leverage,
-                'effective_capital': self.total_equity * self.current_leverage
+                'effective_capital': self.total_equity * self.current_leverage,
+                'max_stress_loss': self.max_stress_loss,
+                'stress_results': self.stress_results.to_dict() if self.stress_results is not None else None
             }
         }
         return status
@@ -333,10 +623,10 @@ class PortfolioManager:
         old_target = self.target_volatility
         self.target_volatility = target_vol
         
-        # Recalcula leverage se temos dados históricos
-        if self.historical_equity_curves is not None and self.target_volatility is not None:
-            self.realized_volatility = self._calculate_portfolio_volatility(self.historical_equity_curves)
-            self.current_leverage = self._calculate_leverage_factor(self.realized_volatility)
+        # Recalcula leverage se temos a covariância de um lookback
+        if (self._cov is not None or self.ewma_cov is not None) and self.target_volatility is not None:
+            self.realized_volatility = self._portfolio_volatility()
+            self._set_leverage(self._calculate_leverage_factor(self.realized_volatility))
             
         print(f"[{datetime.now().strftime('%H:%M:%S')}] Target volatility atualizado:")
         print(f"   - Anterior: {f'{old_target:.1%}' if old_target else 'Desativado'}")
@@ -369,9 +659,12 @@ class PortfolioManager:
         self.current_weights = target_weights
         
         # Recalcula volatilidade e leverage se aplicável
-        if self.target_volatility is not None and self.historical_equity_curves is not None:
-            self.realized_volatility = self._calculate_portfolio_volatility(self.historical_equity_curves)
-            self.current_leverage = self._calculate_leverage_factor(self.realized_volatility)
+        if self.target_volatility is not None and (self._cov is not None or self.ewma_cov is not None):
+            self.realized_volatility = self._portfolio_volatility()
+            self._set_leverage(self._calculate_leverage_factor(self.realized_volatility))
+        
+        # Limita a alavancagem pela perda no pior cenário de estresse
+        self._apply_stress_limit()
         
         self.allocate_capital()
         
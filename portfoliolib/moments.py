@@ -0,0 +1,267 @@
+# portfoliolib/moments.py
+
+from collections import deque
+from typing import Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+
+class RollingMoments:
+    """
+    Motor de momentos (média e covariância) dos retornos de uma janela móvel.
+
+    Mantém as somas dos retornos e dos produtos cruzados enquanto linhas entram (append) e saem
+    (drop_before / pop) da janela, com custo O(N²) por linha, então a média e a covariância ficam
+    disponíveis em qualquer data sem percorrer a janela. Opcionalmente pondera as linhas por EWMA
+    (meia-vida em linhas) e aplica o shrinkage de Ledoit-Wolf (alvo: identidade escalada), cujos termos
+    de quarta ordem também são mantidos incrementalmente.
+
+    Uso:
+        moments = RollingMoments(traders)
+        moments.append(retornos_do_dia, data)
+        moments.drop_before(data - lookback)
+        mean, cov = moments.moments()
+    """
+
+    def __init__(self, columns: Sequence[str], halflife: Optional[float] = None,
+                 shrinkage: Union[None, str, float] = None, resum_every: int = 1000):
+        """
+        Args:
+            columns: Nomes das colunas (traders ou ativos), na ordem dos vetores de retornos
+            halflife: Meia-vida (em linhas) da ponderação EWMA. None usa pesos iguais
+            shrinkage: None, 'ledoit_wolf' ou intensidade fixa entre 0 e 1 do shrinkage para a identidade escalada
+            resum_every: Após este número de remoções as somas são recalculadas a partir da janela,
+                para não acumular erro numérico
+        """
+        if isinstance(shrinkage, str) and shrinkage != 'ledoit_wolf':
+            raise ValueError(f"Shrinkage inválido: {shrinkage}")
+        self.columns = pd.Index(columns)
+        self.halflife = halflife
+        self.decay = 0.5 ** (1.0 / halflife) if halflife else 1.0
+        self.shrinkage = shrinkage
+        self.resum_every = resum_every
+        self.rows = deque()  # (tempo, retornos, índice da linha)
+        self.count = 0       # índice da próxima linha
+        self.removed = 0
+        self.last_shrinkage = None
+        self._reset_sums()
+
+    def _reset_sums(self):
+        n = len(self.columns)
+        self.weight = 0.0          # Σ w
+        self.weight2 = 0.0         # Σ w²
+        self.s1 = np.zeros(n)      # Σ w r
+        self.s2 = np.zeros((n, n)) # Σ w r r'
+        self.q2 = 0.0              # Σ w ||r||²·||r||² (quarta ordem, Ledoit-Wolf)
+        self.q3 = np.zeros(n)      # Σ w ||r||² r
+        # Com EWMA as somas ficam na escala da linha mais recente; as linhas antigas valem decay^idade
+        self.scale_index = self.count
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    @classmethod
+    def from_frame(cls, returns: pd.DataFrame, **kwargs) -> 'RollingMoments':
+        """Cria o motor com todas as linhas de um DataFrame de retornos (índice = datas)."""
+        moments = cls(returns.columns, **kwargs)
+        for time, row in zip(returns.index, returns.to_numpy(dtype=float)):
+            moments.append(row, time)
+        return moments
+
+    def _rescale(self):
+        """Leva as somas EWMA para a escala da linha atual (self.count)."""
+        if self.decay != 1.0 and self.scale_index != self.count:
+            factor = self.decay ** (self.count - self.scale_index)
+            self.weight *= factor
+            self.weight2 *= factor ** 2
+            self.s1 *= factor
+            self.s2 *= factor
+            self.q2 *= factor
+            self.q3 *= factor
+            self.scale_index = self.count
+
+    def _add(self, r: np.ndarray, w: float):
+        norm2 = r @ r
+        self.weight += w
+        self.weight2 += w * abs(w)  # remoção (w < 0) subtrai o peso ao quadrado
+        self.s1 += w * r
+        self.s2 += w * np.outer(r, r)
+        self.q2 += w * norm2 * norm2
+        self.q3 += w * norm2 * r
+
+    def append(self, returns: Union[np.ndarray, pd.Series, Sequence[float]], time=None):
+        """
+        Adiciona uma linha de retornos (na ordem de columns, ou uma Series indexada pelas colunas). NaN conta como 0.
+        """
+        if isinstance(returns, pd.Series):
+            returns = returns.reindex(self.columns)
+        r = np.nan_to_num(np.asarray(returns, dtype=float))
+        self.count += 1
+        self._rescale()
+        self._add(r, 1.0)
+        self.rows.append((time, r, self.count))
+
+    def pop(self):
+        """Remove a linha mais antiga da janela."""
+        time, r, index = self.rows.popleft()
+        self._rescale()
+        self._add(r, -(self.decay ** (self.count - index)))
+        self.removed += 1
+        if self.removed >= self.resum_every:
+            self.resum()
+
+    def drop_before(self, time):
+        """Remove as linhas com tempo anterior a time (janela por tempo, ex: data - lookback)."""
+        while self.rows and self.rows[0][0] is not None and self.rows[0][0] < time:
+            self.pop()
+
+    def keep_last(self, n: int):
+        """Mantém apenas as últimas n linhas (janela por número de linhas)."""
+        while len(self.rows) > n:
+            self.pop()
+
+    def resum(self):
+        """Recalcula as somas a partir das linhas da janela."""
+        self._reset_sums()
+        for time, r, index in self.rows:
+            self._add(r, self.decay ** (self.count - index))
+        self.removed = 0
+
+    def mean(self) -> np.ndarray:
+        """Média (ponderada) dos retornos da janela."""
+        self._rescale()
+        if self.weight <= 0:
+            return np.zeros(len(self.columns))
+        return self.s1 / self.weight
+
+    def _biased_cov(self) -> np.ndarray:
+        mean = self.s1 / self.weight
+        return self.s2 / self.weight - np.outer(mean, mean)
+
+    def cov(self) -> np.ndarray:
+        """
+        Covariância da janela: amostral (ddof=1, como pandas.DataFrame.cov) sem EWMA, com correção
+        de viés dos pesos EWMA, e com shrinkage se configurado.
+        """
+        self._rescale()
+        n = len(self.columns)
+        if len(self.rows) < 2 or self.weight <= 0:
+            return np.zeros((n, n))
+        biased = self._biased_cov()
+        if self.shrinkage is not None:
+            return self._shrink(biased)
+        # Correção de viés para pesos (com pesos iguais equivale a T/(T-1))
+        correction = self.weight ** 2 / (self.weight ** 2 - self.weight2)
+        return biased * correction
+
+    def _shrink(self, cov: np.ndarray) -> np.ndarray:
+        """
+        Shrinkage para mu*I (Ledoit e Wolf, 2004). A variância das estimativas usa
+        Σ_t ||x_t x_t' - S||² = Σ_t ||x_t||⁴ - T||S||², com x_t = r_t - média, expandido nas somas mantidas.
+        """
+        n = len(self.columns)
+        mu = np.trace(cov) / n
+        target = mu * np.eye(n)
+        if isinstance(self.shrinkage, str):
+            d2 = np.sum((cov - target) ** 2)
+            if d2 <= 0:
+                self.last_shrinkage = 0.0
+                return cov
+            w = self.weight
+            m = self.s1 / w
+            mm = m @ m
+            # Σ w ||r - m||⁴ expandido em somas de r
+            s2m = self.s2 @ m
+            sum_norm2 = np.trace(self.s2)
+            fourth = (self.q2 - 4.0 * (self.q3 @ m) + 4.0 * (m @ s2m) + 2.0 * mm * sum_norm2
+                      - 4.0 * mm * (self.s1 @ m) + w * mm * mm)
+            b2 = max(fourth - w * np.sum(cov ** 2), 0.0) / (w * w)
+            delta = min(b2, d2) / d2
+        else:
+            delta = float(self.shrinkage)
+        self.last_shrinkage = delta
+        return delta * target + (1.0 - delta) * cov
+
+    def moments(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Retorna (média, covariância) da janela."""
+        return self.mean(), self.cov()
+
+    def moments_frame(self) -> Tuple[pd.Series, pd.DataFrame]:
+        """Retorna (média, covariância) como pandas, indexados pelas colunas."""
+        mean, cov = self.moments()
+        return pd.Series(mean, index=self.columns), pd.DataFrame(cov, index=self.columns, columns=self.columns)
+
+    def frame(self) -> pd.DataFrame:
+        """Linhas da janela como DataFrame de retornos (para otimizadores que só aceitam preços)."""
+        times = [time for time, r, index in self.rows]
+        values = np.array([r for time, r, index in self.rows]).reshape(len(self.rows), len(self.columns))
+        return pd.DataFrame(values, index=times, columns=self.columns)
+
+
+def window_moments(returns: Union[np.ndarray, pd.DataFrame], starts: Sequence[int], ends: Sequence[int],
+                   halflife: Optional[float] = None,
+                   shrinkage: Union[None, str, float] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcula de uma vez a média e a covariância de várias janelas de linhas [start, end) de uma matriz de
+    retornos (ex: as janelas de lookback de todas as datas de rebalanceamento).
+
+    Sem EWMA e sem shrinkage usa somas acumuladas de r e r r' nos limites das janelas: cada linha entra em
+    uma única soma parcial, e os momentos de todas as janelas saem de diferenças das somas acumuladas,
+    empilhados em arrays K x N e K x N x N. Com halflife ou shrinkage as janelas (com starts e ends não
+    decrescentes) são percorridas por um RollingMoments.
+
+    Args:
+        returns: Retornos (T x N), NaN conta como 0
+        starts: Primeira linha de cada janela
+        ends: Linha seguinte à última de cada janela
+        halflife: Meia-vida (em linhas) da ponderação EWMA
+        shrinkage: Shrinkage da covariância, ver RollingMoments
+
+    Returns:
+        Tupla (número de linhas (K), médias (K x N), covariâncias (K x N x N)). Janelas com menos de
+        2 linhas têm covariância nula
+    """
+    columns = returns.columns if isinstance(returns, pd.DataFrame) else range(np.shape(returns)[1])
+    values = np.nan_to_num(np.asarray(returns, dtype=float))
+    starts = np.asarray(starts, dtype=int)
+    ends = np.maximum(np.asarray(ends, dtype=int), starts)
+    counts = ends - starts
+    k, n = len(starts), values.shape[1]
+    means = np.zeros((k, n))
+    covs = np.zeros((k, n, n))
+    if k == 0:
+        return counts, means, covs
+
+    if halflife is not None or shrinkage is not None:
+        moments = RollingMoments(columns, halflife=halflife, shrinkage=shrinkage)
+        row = 0
+        for i, (start, end) in enumerate(zip(starts, ends)):
+            while row < end:
+                moments.append(values[row], row)
+                row += 1
+            moments.drop_before(start)
+            means[i], covs[i] = moments.moments()
+        return counts, means, covs
+
+    # Centraliza pela média global para reduzir o cancelamento em S2/n - m m'
+    center = values.mean(axis=0) if len(values) > 0 else np.zeros(n)
+    values = values - center
+    bounds = np.unique(np.concatenate((starts, ends, [0])))
+    # Somas de cada segmento entre limites consecutivos, acumuladas: P[j] = soma das linhas [0, bounds[j])
+    s1 = np.zeros((len(bounds), n))
+    s2 = np.zeros((len(bounds), n, n))
+    for j in range(1, len(bounds)):
+        segment = values[bounds[j - 1]:bounds[j]]
+        s1[j] = s1[j - 1] + segment.sum(axis=0)
+        s2[j] = s2[j - 1] + segment.T @ segment
+    a = np.searchsorted(bounds, starts)
+    b = np.searchsorted(bounds, ends)
+    safe = np.maximum(counts, 1)[:, None]
+    sums = s1[b] - s1[a]
+    mean = sums / safe
+    means = mean + center
+    scatter = s2[b] - s2[a] - safe[:, :, None] * mean[:, :, None] * mean[:, None, :]
+    valid = counts > 1
+    covs[valid] = scatter[valid] / (counts[valid] - 1)[:, None, None]
+    means[counts == 0] = 0.0
+    return counts, means, covs
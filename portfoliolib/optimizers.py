@@ -4,16 +4,209 @@ from abc import ABC, abstractmethod
 import pandas as pd
 import numpy as np
 import scipy.optimize as sco
-from typing import Dict
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+def _active_set_weights(cov_matrix: np.ndarray, target: np.ndarray, max_iter: int = 50) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Resolve min y'Σy com target'y = 1 e y >= 0 por conjunto ativo e retorna os pesos w = y/soma(y).
+    Com target = excesso de retorno é o portfólio tangente (Sharpe máximo); com target = 1 é o de mínima variância.
+    Nos ativos livres a solução é fechada, y ∝ Σ⁻¹target; ativos com peso negativo são zerados e a solução é
+    recalculada nos demais, até satisfazer as condições KKT (ativos zerados não melhoram o objetivo).
+
+    Returns:
+        Tupla (pesos ou None se não convergir, número de iterações)
+    """
+    n = len(target)
+    free = np.ones(n, dtype=bool)
+    for iteration in range(1, max_iter + 1):
+        idx = np.flatnonzero(free)
+        if len(idx) == 0:
+            return None, iteration
+        try:
+            z = np.linalg.solve(cov_matrix[np.ix_(idx, idx)], target[idx])
+        except np.linalg.LinAlgError:
+            return None, iteration
+        scale = target[idx] @ z
+        if not np.all(np.isfinite(z)) or scale <= 0:
+            return None, iteration
+        if np.any(z < 0):
+            free[idx[z < 0]] = False
+            continue
+        y = np.zeros(n)
+        y[idx] = z / scale
+        # Multiplicadores dos ativos zerados devem ser >= 0
+        multipliers = cov_matrix @ y - target / scale
+        violated = ~free & (multipliers < -1e-12 * max(np.abs(multipliers).max(), 1e-300))
+        if np.any(violated):
+            free[np.argmin(np.where(violated, multipliers, np.inf))] = True
+            continue
+        return y / y.sum(), iteration
+    return None, max_iter
+
+
+def _active_set_frontier_point(cov_matrix: np.ndarray, constraints: np.ndarray, bounds: np.ndarray,
+                               free: np.ndarray, max_iter: int = 50) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Resolve min w'Σw com A w = b e w >= 0 por conjunto ativo, partindo dos ativos livres em free.
+    Nos ativos livres w = Σ⁻¹A'λ, com λ tal que A w = b; ativos com peso negativo são zerados e ativos
+    zerados com multiplicador Σw - A'λ negativo voltam a ser livres, até satisfazer as condições KKT.
+
+    Returns:
+        Tupla (pesos ou None se não convergir, número de iterações)
+    """
+    n = len(cov_matrix)
+    free = free.copy()
+    for iteration in range(1, max_iter + 1):
+        idx = np.flatnonzero(free)
+        if len(idx) < len(bounds):
+            free[:] = True
+            idx = np.arange(n)
+        try:
+            z = np.linalg.solve(cov_matrix[np.ix_(idx, idx)], constraints[:, idx].T)
+            lagrange = np.linalg.solve(constraints[:, idx] @ z, bounds)
+        except np.linalg.LinAlgError:
+            return None, iteration
+        w = z @ lagrange
+        if not np.all(np.isfinite(w)):
+            return None, iteration
+        if np.any(w < -1e-12):
+            free[idx[w < -1e-12]] = False
+            continue
+        weights = np.zeros(n)
+        weights[idx] = np.clip(w, 0.0, None)
+        multipliers = cov_matrix @ weights - constraints.T @ lagrange
+        violated = ~free & (multipliers < -1e-10 * max(np.abs(multipliers).max(), 1e-300))
+        if np.any(violated):
+            free[np.argmin(np.where(violated, multipliers, np.inf))] = True
+            continue
+        return weights / weights.sum(), iteration
+    return None, max_iter
+
+
+def _regularize(cov_matrix: np.ndarray) -> np.ndarray:
+    """
+    Soma à diagonal uma fração mínima da variância média, para que traders quase colineares não tornem
+    a matriz singular (traders sem variação são excluídos antes, ver _exclude_flat).
+    """
+    n = len(cov_matrix)
+    ridge = 1e-10 * max(np.trace(cov_matrix) / max(n, 1), 1e-12)
+    return cov_matrix + ridge * np.eye(n)
+
+
+def _flat_columns(cov_matrix: np.ndarray) -> np.ndarray:
+    """
+    Máscara das colunas sem variação (ex: traders sem operações no lookback ou com equity constante):
+    variância desprezível frente à mediana das variâncias.
+    """
+    variances = np.diag(cov_matrix)
+    positive = variances[variances > 0]
+    scale = np.median(positive) if len(positive) > 0 else 0.0
+    return variances <= 1e-8 * scale
+
+
+def _exclude_flat(solve, flat: np.ndarray, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                  initial_weights: Optional[np.ndarray] = None, **vectors) -> np.ndarray:
+    """
+    Resolve sem as colunas sem variação, que ficam com peso zero: com a regularização mínima elas teriam
+    variância quase nula e receberiam todo o capital nos otimizadores baseados em risco. Se todas forem
+    sem variação, retorna pesos iguais.
+    """
+    n = len(flat)
+    if flat.all():
+        return np.full(n, 1.0 / n)
+    keep = ~flat
+    subset = {name: (v[keep] if v is not None else None) for name, v in vectors.items()}
+    weights = np.zeros(n)
+    weights[keep] = solve(np.asarray(mean_returns)[keep], np.asarray(cov_matrix)[np.ix_(keep, keep)],
+                          initial_weights[keep] if initial_weights is not None else None, **subset)
+    return weights
+
 
 class BaseOptimizer(ABC):
     """Classe base abstrata para todas as estratégias de otimização de portfólio."""
 
+    # Otimizadores que aceitam current_weights em calculate_weights (warm start a partir dos pesos atuais)
+    supports_warm_start = False
+
     @abstractmethod
     def calculate_weights(self, historical_prices: pd.DataFrame) -> Dict[str, float]:
         """Calcula os pesos ótimos para os ativos no portfólio."""
         pass
 
+    @staticmethod
+    def _moments_and_count(historical_prices: pd.DataFrame) -> Tuple[pd.Index, np.ndarray, np.ndarray, int]:
+        """
+        Calcula os momentos dos retornos diários a partir dos preços (ou curvas de equity).
+
+        Returns:
+            Tupla (colunas, retornos médios, matriz de covariância, número de retornos sem NaN)
+        """
+        returns = historical_prices.pct_change().dropna()
+        values = returns.to_numpy(dtype=float)
+        if len(values) == 0:
+            return returns.columns, np.zeros(len(returns.columns)), np.zeros((len(returns.columns),) * 2), 0
+        cov = np.cov(values, rowvar=False, ddof=1) if len(values) > 1 else np.zeros((values.shape[1],) * 2)
+        return returns.columns, values.mean(axis=0), np.atleast_2d(cov), len(values)
+
+    @classmethod
+    def _moments(cls, historical_prices: pd.DataFrame) -> Tuple[pd.Index, np.ndarray, np.ndarray]:
+        """
+        Calcula os momentos dos retornos diários a partir dos preços (ou curvas de equity).
+
+        Returns:
+            Tupla (colunas, retornos médios, matriz de covariância) como arrays NumPy
+        """
+        return cls._moments_and_count(historical_prices)[:3]
+
+    def weights_from_moments(self, columns, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                             current_weights: Optional[Dict[str, float]] = None,
+                             n_obs: Optional[int] = None) -> Dict[str, float]:
+        """
+        Calcula os pesos a partir de momentos já calculados (ex: portfoliolib.moments.RollingMoments),
+        sem passar pelos preços. Requer que a subclasse implemente calculate_weights_from_moments.
+
+        Args:
+            columns: Nomes das colunas, na ordem dos momentos
+            mean_returns: Retornos médios diários (N)
+            cov_matrix: Matriz de covariância diária (N x N)
+            current_weights: Pesos atuais, usados como ponto inicial dos solvers iterativos (warm start)
+            n_obs: Número de retornos da janela dos momentos (usado pelo ResampledOptimizer)
+
+        Returns:
+            Dicionário com o peso de cada coluna
+        """
+        if not hasattr(self, 'calculate_weights_from_moments'):
+            raise NotImplementedError(f"{self.__class__.__name__} não calcula pesos a partir de momentos")
+        if len(columns) == 0:
+            return {}
+        initial_guess = self._initial_weights(columns, current_weights)
+        weights = self.calculate_weights_from_moments(mean_returns, cov_matrix, initial_guess)
+        return dict(zip(columns, weights))
+
+    @staticmethod
+    def _initial_weights(columns, current_weights: Optional[Dict[str, float]] = None) -> np.ndarray:
+        """
+        Ponto inicial do otimizador: os pesos atuais alinhados às colunas (warm start) ou pesos iguais.
+        """
+        n = len(columns)
+        if current_weights:
+            w = np.clip(np.array([current_weights.get(c, 0.0) for c in columns], dtype=float), 0.0, 1.0)
+            if w.sum() > 0:
+                return w / w.sum()
+        return np.full(n, 1.0 / n)
+
+    def get_solver_stats(self) -> Dict[str, Optional[float]]:
+        """
+        Estatísticas da última otimização: iterações, tempo de solução (s) e convergência.
+        Otimizadores sem solver iterativo retornam None nos campos.
+        """
+        return {'n_iter': getattr(self, 'n_iter_', None),
+                'solve_time': getattr(self, 'solve_time_', None),
+                'converged': getattr(self, 'converged_', None)}
+
     def __repr__(self) -> str:
         return f"<{self.__class__.__name__}>"
 
@@ -27,11 +220,25 @@ class EqualWeightOptimizer(BaseOptimizer):
         equal_weight = 1.0 / num_assets
         return {ticker: equal_weight for ticker in historical_prices.columns}
 
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        num_assets = len(mean_returns)
+        return np.full(num_assets, 1.0 / num_assets)
+
 class SharpeOptimizer(BaseOptimizer):
     """Calcula os pesos do portfólio que maximizam o Índice de Sharpe."""
 
-    def __init__(self, risk_free_rate: float = 0.0):
+    supports_warm_start = True
+
+    def __init__(self, risk_free_rate: float = 0.0, large_n: int = 100):
+        """
+        Args:
+            risk_free_rate: Taxa livre de risco anual
+            large_n: A partir deste número de ativos, o fallback do caminho rápido é o SimplexOptimizer
+                (gradiente projetado) em vez do SLSQP, que escala mal
+        """
         self.risk_free_rate = risk_free_rate
+        self.large_n = large_n
 
     def _calculate_portfolio_performance(self, weights, mean_returns, cov_matrix):
         portfolio_return = np.sum(mean_returns * weights) * 252
@@ -41,22 +248,773 @@ class SharpeOptimizer(BaseOptimizer):
 
     def _negative_sharpe_ratio(self, weights, mean_returns, cov_matrix):
         return -self._calculate_portfolio_performance(weights, mean_returns, cov_matrix)[2]
-    
-    def calculate_weights(self, historical_prices: pd.DataFrame) -> Dict[str, float]:
-        returns = historical_prices.pct_change().dropna()
-        if returns.empty or len(returns.columns) == 0:
-            return {}
-        
-        mean_returns = returns.mean()
-        cov_matrix = returns.cov()
-        num_assets = len(returns.columns)
-        
+
+    def _negative_sharpe_and_gradient(self, weights, mean_returns, cov_matrix):
+        """
+        Índice de Sharpe negativo e seu gradiente analítico (apenas NumPy).
+        Com r = 252*mu'w - rf e s = sqrt(252*w'Σw): d(-r/s)/dw = -252*mu/s + r*252*Σw/s³
+        """
+        cov_w = cov_matrix @ weights
+        r = 252.0 * (mean_returns @ weights) - self.risk_free_rate
+        s = np.sqrt(max(252.0 * (weights @ cov_w), 1e-300))
+        gradient = -252.0 * mean_returns / s + r * 252.0 * cov_w / s ** 3
+        return -r / s, gradient
+
+    def _tangency_weights(self, mean_returns, cov_matrix, max_iter: int = 50) -> Optional[np.ndarray]:
+        """
+        Portfólio tangente long-only por conjunto ativo (ver _active_set_weights). Sem a restrição long-only
+        a solução é fechada, w ∝ Σ⁻¹(mu - rf/252).
+        Retorna None se não houver excesso de retorno positivo ou se não convergir (usa-se então o solver iterativo).
+        """
+        weights, self.n_iter_ = _active_set_weights(cov_matrix, mean_returns - self.risk_free_rate / 252.0, max_iter)
+        return weights
+
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calcula os pesos de Sharpe máximo a partir dos momentos dos retornos diários.
+
+        Args:
+            mean_returns: Retornos médios diários (N)
+            cov_matrix: Matriz de covariância diária (N x N)
+            initial_weights: Ponto inicial do solver iterativo (padrão: pesos iguais)
+
+        Returns:
+            Array com os pesos (long-only, soma 1)
+        """
+        mean_returns = np.asarray(mean_returns, dtype=float)
+        cov_matrix = np.asarray(cov_matrix, dtype=float)
+        num_assets = len(mean_returns)
+        start = time.perf_counter()
+
+        # Caminho rápido: solução fechada (conjunto ativo) do portfólio tangente
+        # (com muitos ativos, só a solução fechada sem conjunto ativo: cada iteração custa O(N³))
+        tangency = self._tangency_weights(mean_returns, cov_matrix, 50 if num_assets < self.large_n else 1)
+        if tangency is not None:
+            self.solve_time_ = time.perf_counter() - start
+            self.converged_ = True
+            return tangency
+
+        if num_assets >= self.large_n:
+            solver = SimplexOptimizer('sharpe', risk_free_rate=self.risk_free_rate)
+            weights = solver.calculate_weights_from_moments(mean_returns, cov_matrix, initial_weights)
+            self.n_iter_ = solver.n_iter_
+            self.solve_time_ = time.perf_counter() - start
+            self.converged_ = solver.converged_
+            return weights
+
+        if initial_weights is None:
+            initial_weights = np.full(num_assets, 1.0 / num_assets)
         args = (mean_returns, cov_matrix)
-        constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1})
+        constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': lambda x: np.ones_like(x)})
         bounds = tuple((0, 1) for _ in range(num_assets))
-        initial_guess = num_assets * [1. / num_assets,]
-        
-        result = sco.minimize(self._negative_sharpe_ratio, initial_guess, args=args,
+
+        result = sco.minimize(self._negative_sharpe_and_gradient, initial_weights, args=args, jac=True,
                               method='SLSQP', bounds=bounds, constraints=constraints)
-        
-        return dict(zip(returns.columns, result.x))
\ No newline at end of file
+        self.n_iter_ = result.nit
+        self.solve_time_ = time.perf_counter() - start
+        self.converged_ = bool(result.success)
+        return result.x
+
+    def calculate_weights(self, historical_prices: pd.DataFrame,
+                          current_weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """
+        Calcula os pesos de Sharpe máximo.
+
+        Args:
+            historical_prices: DataFrame com preços (ou curvas de equity) históricos
+            current_weights: Pesos atuais, usados como ponto inicial do otimizador (warm start)
+
+        Returns:
+            Dicionário com o peso de cada coluna
+        """
+        columns, mean_returns, cov_matrix, n_obs = self._moments_and_count(historical_prices)
+        # Sem ao menos 2 retornos válidos (ex: colunas só com NaN) os momentos não têm significado
+        if len(columns) == 0 or n_obs < 2:
+            return {}
+        return self.weights_from_moments(columns, mean_returns, cov_matrix, current_weights, n_obs)
+
+
+def project_simplex(v: np.ndarray) -> np.ndarray:
+    """
+    Projeção euclidiana de v no simplex {w >= 0, soma(w) = 1}, em O(N log N) por ordenação.
+    """
+    u = np.sort(v)[::-1]
+    css = np.cumsum(u) - 1.0
+    k = np.arange(1, len(v) + 1)
+    rho = np.flatnonzero(u - css / k > 0)[-1]
+    return np.maximum(v - css[rho] / (rho + 1), 0.0)
+
+
+class SimplexOptimizer(BaseOptimizer):
+    """
+    Otimizador long-only e totalmente investido para muitos traders/ativos (milhares), apenas com NumPy.
+    Usa gradiente projetado no simplex com aceleração de Nesterov (FISTA), busca de passo (backtracking)
+    e reinício adaptativo do momento quando o objetivo piora. O Sharpe não é convexo, mas é pseudo-côncavo onde
+    o excesso de retorno é positivo, então se algum peso tem retorno acima de risk_free_rate o ponto estacionário
+    encontrado é o ótimo global. Sem excesso de retorno positivo, ou se a busca de passo falha, o resultado vem
+    do SLSQP a partir do último ponto (ver get_solver_stats).
+    Cada iteração custa uma multiplicação Σw, O(N²), mais a projeção, O(N log N).
+    """
+
+    supports_warm_start = True
+
+    def __init__(self, objective: str = 'sharpe', risk_free_rate: float = 0.0, risk_aversion: float = 1.0,
+                 max_iter: int = 5000, tol: float = 1e-8):
+        """
+        Args:
+            objective: 'sharpe' (máximo Índice de Sharpe), 'mean_variance' (máximo retorno - risk_aversion/2 * variância,
+                anualizados) ou 'min_variance' (mínima variância)
+            risk_free_rate: Taxa livre de risco anual (objetivo sharpe)
+            risk_aversion: Aversão a risco (objetivo mean_variance)
+            max_iter: Número máximo de iterações
+            tol: Tolerância de convergência (maior variação de um peso entre iterações)
+        """
+        if objective not in ('sharpe', 'mean_variance', 'min_variance'):
+            raise ValueError(f"Objetivo inválido: {objective}")
+        self.objective = objective
+        self.risk_free_rate = risk_free_rate
+        self.risk_aversion = risk_aversion
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def _objective_and_gradient(self, weights, mean_returns, cov_matrix):
+        """
+        Valor (a minimizar) e gradiente do objetivo, com retornos e variância anualizados.
+        """
+        cov_w = 252.0 * (cov_matrix @ weights)
+        variance = weights @ cov_w
+        if self.objective == 'min_variance':
+            return variance, 2.0 * cov_w
+        if self.objective == 'mean_variance':
+            return (-252.0 * (mean_returns @ weights) + 0.5 * self.risk_aversion * variance,
+                    -252.0 * mean_returns + self.risk_aversion * cov_w)
+        r = 252.0 * (mean_returns @ weights) - self.risk_free_rate
+        s = np.sqrt(max(variance, 1e-300))
+        return -r / s, -252.0 * mean_returns / s + r * cov_w / s ** 3
+
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Calcula os pesos a partir dos momentos dos retornos diários.
+
+        Args:
+            mean_returns: Retornos médios diários (N)
+            cov_matrix: Matriz de covariância diária (N x N)
+            initial_weights: Ponto inicial (padrão: pesos iguais)
+
+        Returns:
+            Array com os pesos (long-only, soma 1; traders sem variação ficam com peso zero)
+        """
+        mean_returns = np.asarray(mean_returns, dtype=float)
+        cov_matrix = np.asarray(cov_matrix, dtype=float)
+        flat = _flat_columns(cov_matrix)
+        if flat.any():
+            return _exclude_flat(self.calculate_weights_from_moments, flat, mean_returns, cov_matrix, initial_weights)
+        n = len(mean_returns)
+        start = time.perf_counter()
+        w = project_simplex(np.asarray(initial_weights, dtype=float)) if initial_weights is not None else np.full(n, 1.0 / n)
+        if self.objective == 'sharpe' and 252.0 * np.max(mean_returns) <= self.risk_free_rate:
+            # Nenhum peso tem excesso de retorno positivo: o Sharpe não é pseudo-côncavo
+            self.n_iter_ = 0
+            return self._fallback(w, mean_returns, cov_matrix, start)
+        f, g = self._objective_and_gradient(w, mean_returns, cov_matrix)
+        # Passo inicial 1/L com L estimado pela diagonal de Σ (o backtracking corrige)
+        step = 1.0 / max(252.0 * np.trace(cov_matrix) * max(self.risk_aversion, 1.0), 1e-12)
+        y, fy, gy = w, f, g
+        momentum = 1.0
+        self.converged_ = False
+        line_search_failed = False
+        for self.n_iter_ in range(1, self.max_iter + 1):
+            # Backtracking: condição de decréscimo suficiente do gradiente projetado
+            while True:
+                candidate = project_simplex(y - step * gy)
+                diff = candidate - y
+                fc, gc = self._objective_and_gradient(candidate, mean_returns, cov_matrix)
+                if fc <= fy + gy @ diff + (diff @ diff) / (2 * step) + 1e-15 * abs(fy):
+                    break
+                step *= 0.5
+                if step < 1e-20:
+                    line_search_failed = True
+                    break
+            if line_search_failed:
+                break
+            if fc > f and momentum > 1.0:
+                # Reinício adaptativo: descarta o momento quando o objetivo piora
+                y, fy, gy = w, f, g
+                momentum = 1.0
+                continue
+            change = np.max(np.abs(candidate - w))
+            next_momentum = (1 + np.sqrt(1 + 4 * momentum ** 2)) / 2
+            y = candidate + ((momentum - 1) / next_momentum) * (candidate - w)
+            momentum = next_momentum
+            if momentum > 1.0 and np.any(y < 0):
+                y = project_simplex(y)
+            fy, gy = self._objective_and_gradient(y, mean_returns, cov_matrix)
+            w, f, g = candidate, fc, gc
+            step *= 1.25  # tenta um passo maior na próxima iteração
+            if change < self.tol:
+                self.converged_ = True
+                break
+        if line_search_failed:
+            return self._fallback(w, mean_returns, cov_matrix, start)
+        self.solve_time_ = time.perf_counter() - start
+        return w
+
+    def _fallback(self, weights: np.ndarray, mean_returns: np.ndarray, cov_matrix: np.ndarray, start: float) -> np.ndarray:
+        """
+        SLSQP a partir de weights, quando o gradiente projetado não se aplica ou falha. Mantém weights se o SLSQP
+        também falhar; a convergência fica registrada em converged_.
+        """
+        n = len(mean_returns)
+        result = sco.minimize(self._objective_and_gradient, weights, args=(mean_returns, cov_matrix), jac=True,
+                              method='SLSQP', bounds=tuple((0, 1) for _ in range(n)),
+                              constraints=({'type': 'eq', 'fun': lambda x: np.sum(x) - 1,
+                                            'jac': lambda x: np.ones_like(x)}))
+        self.n_iter_ += result.nit
+        self.converged_ = bool(result.success)
+        self.solve_time_ = time.perf_counter() - start
+        if not result.success or not np.all(np.isfinite(result.x)):
+            return weights
+        return project_simplex(result.x)
+
+    def calculate_weights(self, historical_prices: pd.DataFrame,
+                          current_weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """
+        Calcula os pesos ótimos do objetivo escolhido.
+
+        Args:
+            historical_prices: DataFrame com preços (ou curvas de equity) históricos
+            current_weights: Pesos atuais, usados como ponto inicial (warm start)
+
+        Returns:
+            Dicionário com o peso de cada coluna
+        """
+        columns, mean_returns, cov_matrix, n_obs = self._moments_and_count(historical_prices)
+        # Sem ao menos 2 retornos válidos (ex: colunas só com NaN) os momentos não têm significado
+        if len(columns) == 0 or n_obs < 2:
+            return {}
+        return self.weights_from_moments(columns, mean_returns, cov_matrix, current_weights, n_obs)
+
+
+class MomentsOptimizer(BaseOptimizer):
+    """
+    Base para otimizadores que dependem apenas dos momentos (média e covariância) dos retornos diários:
+    as subclasses implementam calculate_weights_from_moments.
+    """
+
+    supports_warm_start = True
+
+    @abstractmethod
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        """Calcula os pesos (array) a partir dos momentos dos retornos diários."""
+        pass
+
+    def calculate_weights(self, historical_prices: pd.DataFrame,
+                          current_weights: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+        """
+        Calcula os pesos a partir dos preços (ou curvas de equity) históricos.
+
+        Args:
+            historical_prices: DataFrame com preços (ou curvas de equity) históricos
+            current_weights: Pesos atuais, usados como ponto inicial dos solvers iterativos (warm start)
+
+        Returns:
+            Dicionário com o peso de cada coluna
+        """
+        columns, mean_returns, cov_matrix, n_obs = self._moments_and_count(historical_prices)
+        # Sem ao menos 2 retornos válidos (ex: colunas só com NaN) os momentos não têm significado
+        if len(columns) == 0 or n_obs < 2:
+            return {}
+        return self.weights_from_moments(columns, mean_returns, cov_matrix, current_weights, n_obs)
+
+
+class MinVarianceOptimizer(MomentsOptimizer):
+    """
+    Portfólio long-only de mínima variância. Usa a solução fechada w ∝ Σ⁻¹1 com conjunto ativo
+    e, a partir de large_n ativos, o gradiente projetado do SimplexOptimizer.
+    """
+
+    def __init__(self, large_n: int = 100):
+        """
+        Args:
+            large_n: A partir deste número de ativos usa o gradiente projetado em vez do conjunto ativo (O(N³) por iteração)
+        """
+        self.large_n = large_n
+
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        flat = _flat_columns(np.asarray(cov_matrix, dtype=float))
+        if flat.any():
+            return _exclude_flat(self.calculate_weights_from_moments, flat, mean_returns, cov_matrix, initial_weights)
+        cov_matrix = _regularize(np.asarray(cov_matrix, dtype=float))
+        n = len(cov_matrix)
+        start = time.perf_counter()
+        weights, self.n_iter_ = _active_set_weights(cov_matrix, np.ones(n), 50 if n < self.large_n else 1)
+        if weights is not None:
+            self.converged_ = True
+        else:
+            solver = SimplexOptimizer('min_variance')
+            weights = solver.calculate_weights_from_moments(np.zeros(n), cov_matrix, initial_weights)
+            self.n_iter_ = solver.n_iter_
+            self.converged_ = solver.converged_
+        self.solve_time_ = time.perf_counter() - start
+        return weights
+
+
+class RiskParityOptimizer(MomentsOptimizer):
+    """
+    Portfólio de contribuição de risco igual (ERC) ou proporcional a risk_budget.
+    Resolve min ½y'Σy - Σ b_i log(y_i) pelo método de Newton amortecido de Spinu (2013), vetorizado:
+    cada iteração resolve um sistema N x N; converge em poucas iterações. Os pesos são w = y/soma(y).
+    """
+
+    def __init__(self, risk_budget: Optional[Dict[str, float]] = None, max_iter: int = 100, tol: float = 1e-10):
+        """
+        Args:
+            risk_budget: Orçamento de risco de cada coluna (padrão: igual para todas)
+            max_iter: Número máximo de iterações de Newton
+            tol: Tolerância do decremento de Newton
+        """
+        self.risk_budget = risk_budget
+        self.max_iter = max_iter
+        self.tol = tol
+
+    def _budget(self, columns: Optional[pd.Index], n: int) -> np.ndarray:
+        if self.risk_budget is None or columns is None:
+            b = np.ones(n)
+        else:
+            b = np.array([self.risk_budget.get(c, 0.0) for c in columns], dtype=float)
+            b = np.maximum(b, 1e-12)
+        return b / b.sum()
+
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None,
+                                       budget: Optional[np.ndarray] = None) -> np.ndarray:
+        flat = _flat_columns(np.asarray(cov_matrix, dtype=float))
+        if flat.any():
+            return _exclude_flat(self.calculate_weights_from_moments, flat, mean_returns, cov_matrix, initial_weights,
+                                 budget=budget)
+        cov_matrix = _regularize(np.asarray(cov_matrix, dtype=float))
+        n = len(cov_matrix)
+        start = time.perf_counter()
+        b = budget if budget is not None else self._budget(None, n)
+        # Trabalha na matriz de correlação (bem condicionada) e volta à escala dos ativos no final
+        vol = np.sqrt(np.diag(cov_matrix))
+        corr = cov_matrix / np.outer(vol, vol)
+        if initial_weights is not None and np.all(np.asarray(initial_weights) > 0):
+            y = np.asarray(initial_weights, dtype=float) * vol
+        else:
+            y = b / np.sqrt(b @ corr @ b)
+        self.converged_ = False
+        for self.n_iter_ in range(1, self.max_iter + 1):
+            gradient = corr @ y - b / y
+            hessian = corr + np.diag(b / y ** 2)
+            delta = np.linalg.solve(hessian, gradient)
+            decrement = np.sqrt(max(delta @ gradient, 0.0))
+            if decrement > 0.225:
+                y = y - delta / (1.0 + decrement)
+            else:
+                y = y - delta
+            if decrement < self.tol:
+                self.converged_ = True
+                break
+        weights = y / vol
+        self.solve_time_ = time.perf_counter() - start
+        return weights / weights.sum()
+
+    def weights_from_moments(self, columns, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                             current_weights: Optional[Dict[str, float]] = None,
+                             n_obs: Optional[int] = None) -> Dict[str, float]:
+        initial_guess = self._initial_weights(columns, current_weights)
+        weights = self.calculate_weights_from_moments(mean_returns, cov_matrix, initial_guess,
+                                                      self._budget(columns, len(columns)))
+        return dict(zip(columns, weights))
+
+    @staticmethod
+    def risk_contributions(weights: np.ndarray, cov_matrix: np.ndarray) -> np.ndarray:
+        """
+        Contribuição de cada ativo para o risco: w_i(Σw)_i / w'Σw (soma 1).
+        """
+        cov_w = cov_matrix @ weights
+        return weights * cov_w / (weights @ cov_w)
+
+
+class HRPOptimizer(MomentsOptimizer):
+    """
+    Hierarchical Risk Parity (López de Prado, 2016): agrupa os ativos pela distância de correlação
+    sqrt((1-ρ)/2) com scipy.cluster.hierarchy.linkage, ordena a matriz em quase-diagonal (leaves_list)
+    e divide o capital por bissecção recursiva, inversamente à variância de cada metade.
+    Não inverte a covariância, então funciona com matrizes singulares (mais traders que observações).
+    """
+
+    def __init__(self, linkage_method: str = 'single'):
+        """
+        Args:
+            linkage_method: Método de agrupamento do scipy ('single', 'average', 'complete', 'ward', ...)
+        """
+        self.linkage_method = linkage_method
+
+    @staticmethod
+    def _cluster_variance(cov_matrix: np.ndarray, items: np.ndarray) -> float:
+        sub = cov_matrix[np.ix_(items, items)]
+        ivp = 1.0 / np.diag(sub)
+        ivp /= ivp.sum()
+        return ivp @ sub @ ivp
+
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        from scipy.cluster.hierarchy import linkage, leaves_list
+        from scipy.spatial.distance import squareform
+
+        flat = _flat_columns(np.asarray(cov_matrix, dtype=float))
+        if flat.any():
+            return _exclude_flat(self.calculate_weights_from_moments, flat, mean_returns, cov_matrix, initial_weights)
+        cov_matrix = _regularize(np.asarray(cov_matrix, dtype=float))
+        n = len(cov_matrix)
+        start = time.perf_counter()
+        if n == 1:
+            return np.ones(1)
+        vol = np.sqrt(np.diag(cov_matrix))
+        corr = np.clip(cov_matrix / np.outer(vol, vol), -1.0, 1.0)
+        distance = np.sqrt(np.clip((1.0 - corr) / 2.0, 0.0, None))
+        np.fill_diagonal(distance, 0.0)
+        order = leaves_list(linkage(squareform(distance, checks=False), method=self.linkage_method))
+
+        weights = np.ones(n)
+        clusters: List[np.ndarray] = [order]
+        self.n_iter_ = 0
+        while clusters:
+            # Bissecção de todos os grupos do nível atual
+            next_clusters = []
+            for items in clusters:
+                if len(items) <= 1:
+                    continue
+                half = len(items) // 2
+                left, right = items[:half], items[half:]
+                var_left = self._cluster_variance(cov_matrix, left)
+                var_right = self._cluster_variance(cov_matrix, right)
+                alpha = 1.0 - var_left / (var_left + var_right)
+                weights[left] *= alpha
+                weights[right] *= 1.0 - alpha
+                next_clusters.extend((left, right))
+            clusters = next_clusters
+            self.n_iter_ += 1
+        self.converged_ = True
+        self.solve_time_ = time.perf_counter() - start
+        return weights
+
+
+
+class FrontierOptimizer(MomentsOptimizer):
+    """
+    Fronteira eficiente long-only: para K retornos alvo entre o do portfólio de mínima variância e o maior
+    retorno médio, resolve min w'Σw com mu'w = alvo, soma(w) = 1 e w >= 0 (SLSQP com gradientes analíticos).
+    Os pontos são resolvidos em sequência, cada um partindo da solução do anterior (warm start): um conjunto
+    ativo iniciado no suporte do ponto anterior costuma convergir em uma ou duas iterações, e o SLSQP com
+    gradientes analíticos fica como alternativa quando ele não converge. Como otimizador, escolhe o ponto de Sharpe máximo
+    ou, com target_volatility, o de maior retorno com volatilidade até o alvo.
+    """
+
+    supports_warm_start = False
+
+    def __init__(self, n_points: int = 50, target_volatility: Optional[float] = None, risk_free_rate: float = 0.0):
+        """
+        Args:
+            n_points: Número de pontos da fronteira
+            target_volatility: Volatilidade anual máxima do ponto escolhido. None escolhe o ponto de Sharpe máximo
+            risk_free_rate: Taxa livre de risco anual (escolha por Sharpe)
+        """
+        if n_points < 2:
+            raise ValueError("A fronteira precisa de pelo menos 2 pontos")
+        self.n_points = n_points
+        self.target_volatility = target_volatility
+        self.risk_free_rate = risk_free_rate
+
+    def frontier(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                 n_points: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Calcula a fronteira eficiente a partir dos momentos dos retornos diários.
+
+        Args:
+            mean_returns: Retornos médios diários (N)
+            cov_matrix: Matriz de covariância diária (N x N)
+            n_points: Número de pontos (padrão: self.n_points)
+
+        Returns:
+            Tupla (retornos alvo diários (K), pesos de cada ponto (K x N)), do menor ao maior retorno.
+            Traders sem variação ficam com peso zero em todos os pontos (ver _exclude_flat)
+        """
+        mean_returns = np.asarray(mean_returns, dtype=float)
+        cov_matrix = np.asarray(cov_matrix, dtype=float)
+        n_points = n_points or self.n_points
+        flat = _flat_columns(cov_matrix)
+        if flat.any():
+            weights = np.zeros((n_points, len(flat)))
+            if flat.all():
+                weights[:] = 1.0 / len(flat)
+                self.n_iter_, self.converged_, self.solve_time_ = 0, True, 0.0
+                return np.full(n_points, mean_returns @ weights[0]), weights
+            keep = ~flat
+            targets, weights[:, keep] = self.frontier(mean_returns[keep], cov_matrix[np.ix_(keep, keep)], n_points)
+            return targets, weights
+        cov_matrix = _regularize(cov_matrix)
+        n = len(mean_returns)
+        start = time.perf_counter()
+
+        # Extremos: mínima variância e o ativo de maior retorno
+        min_variance = MinVarianceOptimizer().calculate_weights_from_moments(mean_returns, cov_matrix)
+        low, high = mean_returns @ min_variance, mean_returns.max()
+        targets = np.linspace(low, high, n_points)
+        weights = np.tile(min_variance, (n_points, 1))
+        self.n_iter_ = 0
+        self.converged_ = True
+        if high - low <= 1e-12 * max(abs(high), 1e-12):
+            self.solve_time_ = time.perf_counter() - start
+            return np.full(n_points, low), weights
+        weights[-1] = np.where(np.arange(n) == np.argmax(mean_returns), 1.0, 0.0)
+
+        # Cada ponto parte do suporte do anterior (conjunto ativo); se não convergir, SLSQP a partir dele
+        constraints = np.vstack((np.ones(n), mean_returns))
+        cov_scale = max(np.trace(cov_matrix) / n, 1e-300)
+        mean_scale = max(np.abs(mean_returns).max(), 1e-300)
+        objective = lambda x: (x @ cov_matrix @ x / cov_scale, 2.0 * (cov_matrix @ x) / cov_scale)
+        bounds = tuple((0, 1) for _ in range(n))
+        for k in range(1, n_points - 1):
+            point, iterations = _active_set_frontier_point(cov_matrix, constraints, np.array([1.0, targets[k]]),
+                                                           weights[k - 1] > 0)
+            self.n_iter_ += iterations
+            if point is not None:
+                weights[k] = point
+                continue
+            slsqp_constraints = ({'type': 'eq', 'fun': lambda x: np.sum(x) - 1, 'jac': lambda x: np.ones_like(x)},
+                                 {'type': 'eq', 'fun': lambda x, t=targets[k]: (mean_returns @ x - t) / mean_scale,
+                                  'jac': lambda x: mean_returns / mean_scale})
+            result = sco.minimize(objective, weights[k - 1], jac=True, method='SLSQP', bounds=bounds,
+                                  constraints=slsqp_constraints, options={'ftol': 1e-12, 'maxiter': 200})
+            x = np.clip(result.x, 0.0, None)
+            weights[k] = x / x.sum() if x.sum() > 0 else weights[k - 1]
+            self.n_iter_ += result.nit
+            self.converged_ = self.converged_ and bool(result.success)
+        self.solve_time_ = time.perf_counter() - start
+        return targets, weights
+
+    def _select(self, mean_returns: np.ndarray, cov_matrix: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        """Escolhe o ponto da fronteira (ver a documentação da classe)."""
+        returns = weights @ mean_returns * 252
+        vols = np.sqrt(np.maximum(np.einsum('ki,ij,kj->k', weights, cov_matrix, weights), 0.0) * 252)
+        if self.target_volatility is not None:
+            feasible = np.flatnonzero(vols <= self.target_volatility)
+            return weights[feasible[np.argmax(returns[feasible])]] if len(feasible) else weights[np.argmin(vols)]
+        sharpe = (returns - self.risk_free_rate) / np.maximum(vols, 1e-300)
+        return weights[np.argmax(sharpe)]
+
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None) -> np.ndarray:
+        targets, weights = self.frontier(mean_returns, cov_matrix)
+        return self._select(np.asarray(mean_returns, dtype=float), np.asarray(cov_matrix, dtype=float), weights)
+
+    def frontier_frame(self, historical_prices: pd.DataFrame, n_points: Optional[int] = None) -> pd.DataFrame:
+        """
+        Fronteira eficiente a partir dos preços (ou curvas de equity) históricos.
+
+        Returns:
+            DataFrame com uma linha por ponto: retorno e volatilidade anualizados, Sharpe e o peso de cada coluna
+        """
+        columns, mean_returns, cov_matrix = self._moments(historical_prices)
+        targets, weights = self.frontier(mean_returns, cov_matrix, n_points)
+        return _frontier_frame(columns, mean_returns, cov_matrix, weights, self.risk_free_rate)
+
+
+def _frontier_frame(columns, mean_returns: np.ndarray, cov_matrix: np.ndarray, weights: np.ndarray,
+                    risk_free_rate: float = 0.0) -> pd.DataFrame:
+    returns = weights @ mean_returns * 252
+    vols = np.sqrt(np.maximum(np.einsum('ki,ij,kj->k', weights, cov_matrix, weights), 0.0) * 252)
+    frame = pd.DataFrame(weights, columns=columns)
+    frame.insert(0, 'sharpe', (returns - risk_free_rate) / np.maximum(vols, 1e-300))
+    frame.insert(0, 'volatility', vols)
+    frame.insert(0, 'return', returns)
+    return frame
+
+
+def _sample_moments(mean_returns: np.ndarray, root: np.ndarray, n_obs: int, n_draws: int,
+                    rng: np.random.Generator) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Sorteia n_draws amostras de n_obs retornos normais com a média dada e covariância root root' e retorna
+    a média (n_draws x N) e a covariância (n_draws x N x N) de cada amostra.
+    """
+    n = len(mean_returns)
+    samples = mean_returns + rng.standard_normal((n_draws, n_obs, n)) @ root.T
+    means = samples.mean(axis=1)
+    centered = samples - means[:, None, :]
+    covs = np.matmul(centered.transpose(0, 2, 1), centered) / max(n_obs - 1, 1)
+    return means, covs
+
+
+def _resample_block(optimizer: BaseOptimizer, columns, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                    n_obs: int, seeds, n_points: Optional[int] = None) -> np.ndarray:
+    """
+    Resolve o otimizador em uma amostra por semente e retorna os pesos de cada uma (sementes x N, NaN se o
+    otimizador falhou). Cada amostra depende só da sua semente e é resolvida sem warm start, então o resultado
+    não depende de como as sementes são divididas entre processos. Com n_points, o otimizador deve ser um
+    FrontierOptimizer e os pesos são das fronteiras (sementes x n_points x N).
+    """
+    values, vectors = np.linalg.eigh(cov_matrix)
+    root = vectors * np.sqrt(np.clip(values, 0.0, None))
+    n = len(mean_returns)
+    weights = np.full((len(seeds), n_points, n) if n_points is not None else (len(seeds), n), np.nan)
+    for k, seed in enumerate(seeds):
+        means, covs = _sample_moments(mean_returns, root, n_obs, 1, np.random.default_rng(seed))
+        if n_points is not None:
+            weights[k] = optimizer.frontier(means[0], covs[0], n_points)[1]
+        else:
+            weights[k] = _solve_block(optimizer, columns, means, covs)[0]
+    return weights
+
+
+class ResampledOptimizer(MomentsOptimizer):
+    """
+    Pesos reamostrados (Michaud): sorteia n_draws amostras de retornos com a média e a covariância estimadas,
+    resolve o otimizador base em cada uma e usa a média dos pesos, menos sensível aos erros de estimação
+    que a solução única. Cada amostra tem sua própria semente (SeedSequence(seed).spawn) e é resolvida sem warm
+    start; as sementes são divididas entre n_jobs processos, então a mesma seed dá os mesmos pesos com qualquer
+    n_jobs. Com um FrontierOptimizer como base,
+    resampled_frontier() retorna a fronteira reamostrada (média dos pontos de mesma ordem).
+    """
+
+    supports_warm_start = False
+
+    def __init__(self, optimizer: Optional[BaseOptimizer] = None, n_draws: int = 100, n_obs: Optional[int] = None,
+                 n_jobs: Optional[int] = 1, seed: Optional[int] = None):
+        """
+        Args:
+            optimizer: Otimizador base que implementa calculate_weights_from_moments (padrão: SharpeOptimizer)
+            n_draws: Número de amostras
+            n_obs: Número de retornos de cada amostra (padrão: o número de retornos da janela dos momentos, ou 252
+                se não for informado)
+            n_jobs: Número de processos (None usa todas as CPUs)
+            seed: Semente dos sorteios
+        """
+        self.optimizer = optimizer if optimizer is not None else SharpeOptimizer()
+        if not hasattr(self.optimizer, 'calculate_weights_from_moments'):
+            raise ValueError(f"{self.optimizer.__class__.__name__} não calcula pesos a partir de momentos")
+        self.n_draws = n_draws
+        self.n_obs = n_obs
+        self.n_jobs = n_jobs
+        self.seed = seed
+
+    def _resample(self, columns, mean_returns: np.ndarray, cov_matrix: np.ndarray, n_obs: Optional[int] = None,
+                  n_points: Optional[int] = None) -> np.ndarray:
+        mean_returns = np.asarray(mean_returns, dtype=float)
+        cov_matrix = np.asarray(cov_matrix, dtype=float)
+        n_obs = self.n_obs or (max(int(n_obs), 2) if n_obs else 252)
+        start = time.perf_counter()
+        workers = self.n_jobs if self.n_jobs is not None else (os.cpu_count() or 1)
+        seeds = np.random.SeedSequence(self.seed).spawn(self.n_draws)
+        blocks = np.array_split(np.arange(self.n_draws), max(min(workers, self.n_draws), 1))
+        tasks = [(self.optimizer, columns, mean_returns, cov_matrix, n_obs, [seeds[i] for i in block], n_points)
+                 for block in blocks]
+        if len(tasks) == 1:
+            results = [_resample_block(*tasks[0])]
+        else:
+            with ProcessPoolExecutor(max_workers=len(tasks)) as pool:
+                futures = [pool.submit(_resample_block, *task) for task in tasks]
+                results = [f.result() for f in futures]
+        # Soma na ordem das amostras, independente dos blocos
+        draws = np.concatenate(results)
+        solved = np.all(np.isfinite(draws.reshape(len(draws), -1)), axis=1)
+        self.n_iter_ = int(solved.sum())
+        self.converged_ = self.n_iter_ == self.n_draws
+        self.solve_time_ = time.perf_counter() - start
+        if self.n_iter_ == 0:
+            raise RuntimeError("Nenhuma amostra foi resolvida pelo otimizador base")
+        weights = draws[solved].mean(axis=0)
+        return weights / weights.sum(axis=-1, keepdims=True)
+
+    def calculate_weights_from_moments(self, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                                       initial_weights: Optional[np.ndarray] = None,
+                                       n_obs: Optional[int] = None) -> np.ndarray:
+        return self._resample(range(len(mean_returns)), mean_returns, cov_matrix, n_obs)
+
+    def weights_from_moments(self, columns, mean_returns: np.ndarray, cov_matrix: np.ndarray,
+                             current_weights: Optional[Dict[str, float]] = None,
+                             n_obs: Optional[int] = None) -> Dict[str, float]:
+        # As colunas seguem para o otimizador base (ex: risk_budget do RiskParityOptimizer)
+        if len(columns) == 0:
+            return {}
+        return dict(zip(columns, self._resample(columns, mean_returns, cov_matrix, n_obs)))
+
+    def resampled_frontier(self, historical_prices: pd.DataFrame, n_points: Optional[int] = None) -> pd.DataFrame:
+        """
+        Fronteira eficiente reamostrada a partir dos preços (ou curvas de equity) históricos.
+        Requer um FrontierOptimizer como otimizador base.
+
+        Returns:
+            DataFrame como FrontierOptimizer.frontier_frame, avaliado com os momentos estimados
+        """
+        if not isinstance(self.optimizer, FrontierOptimizer):
+            raise ValueError("resampled_frontier requer um FrontierOptimizer como otimizador base")
+        columns, mean_returns, cov_matrix, n_obs = self._moments_and_count(historical_prices)
+        weights = self._resample(columns, mean_returns, cov_matrix, n_obs, n_points or self.optimizer.n_points)
+        return _frontier_frame(columns, mean_returns, cov_matrix, weights, self.optimizer.risk_free_rate)
+
+
+def _solve_block(optimizer: BaseOptimizer, columns, means: np.ndarray, covs: np.ndarray,
+                 initial_weights: Optional[Dict[str, float]] = None, counts: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Resolve em sequência um bloco de datas, usando os pesos de cada data como ponto inicial da seguinte.
+    Datas em que o otimizador falha ficam com NaN e mantêm o ponto inicial anterior.
+    """
+    weights = np.full(means.shape, np.nan)
+    current = initial_weights
+    for k in range(len(means)):
+        if not np.all(np.isfinite(means[k])) or not np.all(np.isfinite(covs[k])):
+            continue
+        try:
+            solution = optimizer.weights_from_moments(columns, means[k], covs[k], current,
+                                                      int(counts[k]) if counts is not None else None)
+        except Exception:
+            continue
+        if solution:
+            weights[k] = [solution[c] for c in columns]
+            if optimizer.supports_warm_start:
+                current = solution
+    return weights
+
+
+def batch_weights(optimizer: BaseOptimizer, columns, means: np.ndarray, covs: np.ndarray,
+                  initial_weights: Optional[Dict[str, float]] = None, n_jobs: int = 1,
+                  counts: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Calcula os pesos de várias datas de rebalanceamento a partir dos momentos empilhados de cada janela
+    (ex: portfoliolib.moments.window_moments). Com n_jobs=1 as datas são resolvidas em sequência, cada uma
+    partindo dos pesos da anterior (warm start); com n_jobs != 1 (None usa todas as CPUs) as datas são divididas
+    em blocos contíguos resolvidos em paralelo por processos, com warm start dentro de cada bloco.
+
+    Args:
+        optimizer: Otimizador que implementa calculate_weights_from_moments
+        columns: Nomes das colunas, na ordem dos momentos
+        means: Retornos médios diários de cada data (K x N)
+        covs: Matrizes de covariância diárias de cada data (K x N x N)
+        initial_weights: Pesos atuais, ponto inicial da primeira data
+        n_jobs: Número de processos
+        counts: Número de retornos da janela de cada data (K), repassado como n_obs (ver ResampledOptimizer)
+
+    Returns:
+        Array K x N com os pesos de cada data (NaN nas datas em que o otimizador falhou)
+    """
+    if not hasattr(optimizer, 'calculate_weights_from_moments'):
+        raise NotImplementedError(f"{optimizer.__class__.__name__} não calcula pesos a partir de momentos")
+    means = np.asarray(means, dtype=float)
+    covs = np.asarray(covs, dtype=float)
+    workers = n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+    workers = max(min(workers, len(means)), 1)
+    if workers == 1:
+        return _solve_block(optimizer, columns, means, covs, initial_weights, counts)
+    blocks = np.array_split(np.arange(len(means)), workers)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_solve_block, optimizer, columns, means[block], covs[block], initial_weights,
+                               counts[block] if counts is not None else None)
+                   for block in blocks]
+        return np.concatenate([f.result() for f in futures])
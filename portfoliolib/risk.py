@@ -0,0 +1,170 @@
+# portfoliolib/risk.py
+
+from typing import Sequence, Union
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+from scipy.stats import norm
+
+# Máximo de elementos copiados por bloco de janelas (limita a memória do np.partition)
+_BLOCK_ELEMENTS = 4_000_000
+
+
+def _as_frame(returns: Union[pd.Series, pd.DataFrame]) -> pd.DataFrame:
+    if isinstance(returns, pd.Series):
+        return returns.to_frame(returns.name if returns.name is not None else 'portfolio')
+    return returns
+
+
+def _windows_with_nan(values: np.ndarray, window: int) -> np.ndarray:
+    """Marca (T-window+1 x P) as janelas que contêm NaN, por somas acumuladas."""
+    nan_count = np.vstack((np.zeros((1, values.shape[1])), np.cumsum(np.isnan(values), axis=0)))
+    return (nan_count[window:] - nan_count[:-window]) > 0
+
+
+def rolling_quantiles(values: np.ndarray, window: int, levels: Sequence[float]):
+    """
+    VaR e CVaR históricos de todas as janelas móveis de uma matriz de retornos (T x P), de uma vez.
+
+    Em vez de ordenar cada janela, usa uma ordenação parcial (np.partition, O(window) por janela) que separa
+    os menores valores até a estatística de ordem do quantil mais extremo entre os níveis; só essa cauda é
+    ordenada, e dela saem os quantis e, por somas acumuladas, os CVaR de todos os níveis. As janelas vêm de
+    sliding_window_view (sem cópia) e são processadas em blocos para limitar a memória.
+
+    Args:
+        values: Retornos (T x P)
+        window: Tamanho da janela
+        levels: Níveis de confiança (ex: 0.95)
+
+    Returns:
+        Tupla (var, cvar), arrays (níveis x T x P) com NaN nas primeiras window-1 linhas e nas janelas com NaN.
+        O VaR é o quantil (1 - nível) dos retornos, interpolado como np.percentile, e o CVaR a média dos
+        retornos até a estatística de ordem inferior do quantil (ambos negativos em perdas)
+    """
+    values = np.asarray(values, dtype=float)
+    n_obs, n_series = values.shape
+    var = np.full((len(levels), n_obs, n_series), np.nan)
+    cvar = np.full((len(levels), n_obs, n_series), np.nan)
+    if n_obs < window:
+        return var, cvar
+    positions = np.array([(1.0 - level) * (window - 1) for level in levels])
+    lower = np.floor(positions).astype(int)
+    upper = np.minimum(lower + 1, window - 1)
+    deepest = int(upper.max())
+
+    windows = sliding_window_view(values, window, axis=0)  # (T-window+1) x P x window
+    block = max(_BLOCK_ELEMENTS // max(n_series * window, 1), 1)
+    for start in range(0, len(windows), block):
+        # Uma única partição na estatística de ordem mais alta, depois só a cauda (deepest+1 valores) é ordenada
+        tail = np.sort(np.partition(windows[start:start + block], deepest, axis=-1)[..., :deepest + 1], axis=-1)
+        tail_sums = np.cumsum(tail, axis=-1)
+        rows = slice(window - 1 + start, window - 1 + start + len(tail))
+        for i in range(len(levels)):
+            fraction = positions[i] - lower[i]
+            var[i, rows] = tail[..., lower[i]] + fraction * (tail[..., upper[i]] - tail[..., lower[i]])
+            cvar[i, rows] = tail_sums[..., lower[i]] / (lower[i] + 1)
+
+    invalid = _windows_with_nan(values, window)
+    var[:, window - 1:][:, invalid] = np.nan
+    cvar[:, window - 1:][:, invalid] = np.nan
+    return var, cvar
+
+
+def ewma_volatility(values: np.ndarray, halflife: float, seed_window: int = 20) -> np.ndarray:
+    """
+    Previsão EWMA (RiskMetrics, média zero) da volatilidade diária de cada coluna: a linha t é a previsão
+    para t+1 com os retornos até t, σ²(t+1) = λσ²(t) + (1-λ)r(t)². Calculada por filtro linear (lfilter) em
+    todas as colunas de uma vez, iniciada com a variância das primeiras seed_window linhas. NaN conta como 0.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    decay = 0.5 ** (1.0 / halflife)
+    initial = np.mean(values[:max(min(seed_window, len(values)), 1)] ** 2, axis=0)
+    variance, _ = lfilter([1.0 - decay], [1.0, -decay], values ** 2, axis=0, zi=(decay * initial)[None, :])
+    return np.sqrt(variance)
+
+
+class RiskEngine:
+    """
+    VaR e CVaR móveis, em vários níveis de confiança e para vários portfólios de uma vez, como séries completas
+    (extensão do PortfolioManager.calculate_var_5pct, que calcula um único percentil histórico).
+
+    Métodos:
+        'historical': quantil e média da cauda dos retornos da janela (ordenação parcial, ver rolling_quantiles)
+        'parametric': normal com média e desvio padrão da janela, μ + zσ e μ - σφ(z)/(1-nível)
+        'ewma': simulação histórica filtrada; os retornos são padronizados pela volatilidade EWMA prevista
+            no dia anterior, o quantil é dos resíduos da janela e a escala é a volatilidade prevista para o dia seguinte
+
+    A linha t usa os retornos até t (medida de risco para o dia seguinte). Valores em retorno: negativos em perdas.
+
+    Uso:
+        engine = RiskEngine(window=250, levels=(0.95, 0.99))
+        risk = engine.compute(retornos)          # colunas (medida, nível, portfólio)
+        risk['cvar'][0.99]                       # CVaR 99% de cada portfólio ao longo do tempo
+    """
+
+    METHODS = ('historical', 'parametric', 'ewma')
+
+    def __init__(self, window: int = 250, levels: Sequence[float] = (0.95, 0.99), method: str = 'historical',
+                 halflife: float = 30.0):
+        """
+        Args:
+            window: Tamanho da janela móvel (dias)
+            levels: Níveis de confiança
+            method: 'historical', 'parametric' ou 'ewma'
+            halflife: Meia-vida (dias) da volatilidade EWMA (método ewma)
+        """
+        if method not in self.METHODS:
+            raise ValueError(f"Método inválido: {method}")
+        if window < 2:
+            raise ValueError("A janela precisa de pelo menos 2 retornos")
+        self.window = window
+        self.levels = tuple(levels)
+        self.method = method
+        self.halflife = halflife
+
+    def _historical(self, values: np.ndarray):
+        return rolling_quantiles(values, self.window, self.levels)
+
+    def _parametric(self, values: np.ndarray):
+        frame = pd.DataFrame(values)
+        rolling = frame.rolling(self.window)
+        mean = rolling.mean().to_numpy()
+        std = rolling.std().to_numpy()
+        z = norm.ppf(1.0 - np.asarray(self.levels))
+        var = mean[None] + z[:, None, None] * std[None]
+        tail = norm.pdf(z) / (1.0 - np.asarray(self.levels))
+        cvar = mean[None] - tail[:, None, None] * std[None]
+        return var, cvar
+
+    def _ewma(self, values: np.ndarray):
+        forecast = ewma_volatility(values, self.halflife, self.window)
+        # Resíduo de t: retorno de t dividido pela previsão feita em t-1
+        previous = np.vstack((forecast[:1], forecast[:-1]))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            residuals = np.where(previous > 0, values / previous, np.nan)
+        var, cvar = rolling_quantiles(residuals, self.window, self.levels)
+        return var * forecast[None], cvar * forecast[None]
+
+    def compute(self, returns: Union[pd.Series, pd.DataFrame]) -> pd.DataFrame:
+        """
+        Calcula o VaR e o CVaR móveis.
+
+        Args:
+            returns: Retornos diários de um portfólio (Series) ou de vários (DataFrame, um por coluna)
+
+        Returns:
+            DataFrame com o índice dos retornos e colunas (medida 'var'/'cvar', nível, portfólio)
+        """
+        frame = _as_frame(returns)
+        values = frame.to_numpy(dtype=float)
+        var, cvar = getattr(self, f"_{self.method}")(values)
+        columns = pd.MultiIndex.from_product([['var', 'cvar'], self.levels, frame.columns],
+                                             names=['measure', 'level', 'portfolio'])
+        data = np.concatenate([np.concatenate(list(m), axis=1) for m in (var, cvar)], axis=1) \
+            if len(frame.columns) else np.empty((len(frame), 0))
+        return pd.DataFrame(data, index=frame.index, columns=columns)
+
+    def compute_from_equity(self, equity: Union[pd.Series, pd.DataFrame]) -> pd.DataFrame:
+        """Como compute(), a partir de curvas de equity (retornos pct_change, sem a primeira linha)."""
+        return self.compute(equity.pct_change().iloc[1:])
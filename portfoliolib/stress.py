@@ -0,0 +1,191 @@
+# portfoliolib/stress.py
+
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple, Union
+import numpy as np
+import pandas as pd
+
+# Janelas (pico → vale) das crises usadas como cenários históricos. Os retornos de cada cenário vêm dos
+# preços (ou curvas de equity) informados em add_historical, não são embutidos no pacote.
+HISTORICAL_SCENARIOS = {
+    '2008': (datetime(2008, 9, 1), datetime(2009, 3, 9)),     # crise financeira global
+    '2020': (datetime(2020, 2, 19), datetime(2020, 3, 23)),   # COVID-19
+    '2022': (datetime(2022, 1, 3), datetime(2022, 10, 12)),   # alta de juros e inflação
+}
+
+
+class StressTester:
+    """
+    Motor de cenários de estresse para a alocação atual entre traders.
+
+    Cada cenário é um choque (retorno acumulado) nos traders, nos ativos, ou em ambos. Choques nos ativos
+    chegam aos traders pela matriz de exposição (traders x ativos, fração do capital de cada trader em cada
+    ativo), então o retorno de todos os cenários em todos os traders é a matriz R = choques_traders +
+    choques_ativos @ exposiçãoᵀ (cenários x traders), montada uma vez. Avaliar uma alocação é um único
+    produto matricial, P&L = equity * alavancagem * R @ w, sem rodar backtests.
+
+    Uso:
+        stress = StressTester.from_traders(manager.trader_map)
+        stress.add_historical('2008', precos_dos_ativos)               # janela de HISTORICAL_SCENARIOS
+        stress.add_asset_scenario('petroleo -30%', {'PETR4': -0.30})
+        stress.evaluate(manager.current_weights, manager.current_leverage, manager.total_equity)
+    """
+
+    def __init__(self, traders: Sequence[str], assets: Sequence[str] = (), exposures: Optional[pd.DataFrame] = None):
+        """
+        Args:
+            traders: Nomes dos traders, na ordem dos pesos
+            assets: Ativos que podem receber choques
+            exposures: Exposição de cada trader a cada ativo (traders x ativos). Padrão: nenhuma exposição
+        """
+        self.traders = pd.Index(traders)
+        self.assets = pd.Index(assets)
+        self.exposures = np.zeros((len(self.traders), len(self.assets)))
+        if exposures is not None:
+            self.set_exposures(exposures)
+        self.names = []
+        self._trader_shocks = []  # vetores (traders)
+        self._asset_shocks = []   # vetores (ativos)
+        self._matrix = None
+
+    @classmethod
+    def from_traders(cls, trader_map: Dict[str, object]) -> 'StressTester':
+        """
+        Cria o motor para os traders de um PortfolioManager, com exposição igual nos ativos de cada trader
+        (assets_universe ou assets). Use set_exposures para as posições reais.
+        """
+        universe = {name: list(getattr(trader, 'assets_universe', None) or getattr(trader, 'assets', None) or [])
+                    for name, trader in trader_map.items()}
+        assets = sorted(set(a for trader_assets in universe.values() for a in trader_assets))
+        exposures = {name: {a: 1.0 / len(trader_assets) for a in trader_assets}
+                     for name, trader_assets in universe.items() if trader_assets}
+        return cls(list(trader_map.keys()), assets, exposures)
+
+    def set_exposures(self, exposures: Union[pd.DataFrame, Dict[str, Dict[str, float]]]):
+        """
+        Define a exposição dos traders aos ativos (ex: os pesos retornados pelos traders, {'NVDA': 0.6, 'cash': 0.4}).
+        Ativos desconhecidos (ex: 'cash') não recebem choques e são ignorados; traders ausentes ficam sem exposição.
+
+        Args:
+            exposures: DataFrame (traders x ativos) ou dicionário trader -> {ativo: fração do capital}
+        """
+        if not isinstance(exposures, pd.DataFrame):
+            exposures = pd.DataFrame.from_dict(exposures, orient='index')
+        self.exposures = exposures.reindex(index=self.traders, columns=self.assets).fillna(0.0).to_numpy(dtype=float)
+        self._matrix = None
+
+    def _add(self, name: str, trader_shocks: np.ndarray, asset_shocks: np.ndarray):
+        if name in self.names:
+            index = self.names.index(name)
+            self._trader_shocks[index] = trader_shocks
+            self._asset_shocks[index] = asset_shocks
+        else:
+            self.names.append(name)
+            self._trader_shocks.append(trader_shocks)
+            self._asset_shocks.append(asset_shocks)
+        self._matrix = None
+
+    def add_scenario(self, name: str, trader_shocks: Optional[Dict[str, float]] = None,
+                     asset_shocks: Optional[Dict[str, float]] = None):
+        """
+        Adiciona (ou substitui) um cenário hipotético com choques (retornos acumulados, ex: -0.3) em traders
+        e/ou ativos. Traders e ativos sem choque ficam com retorno zero.
+        """
+        trader_vector = pd.Series(trader_shocks or {}, dtype=float).reindex(self.traders).fillna(0.0).to_numpy()
+        asset_vector = pd.Series(asset_shocks or {}, dtype=float).reindex(self.assets).fillna(0.0).to_numpy()
+        self._add(name, trader_vector, asset_vector)
+
+    def add_trader_scenario(self, name: str, shocks: Dict[str, float]):
+        """Cenário hipotético com choques diretamente nos traders."""
+        self.add_scenario(name, trader_shocks=shocks)
+
+    def add_asset_scenario(self, name: str, shocks: Dict[str, float]):
+        """Cenário hipotético com choques nos ativos, propagados aos traders pela exposição."""
+        self.add_scenario(name, asset_shocks=shocks)
+
+    def add_historical(self, name: str, prices: pd.DataFrame, start: Optional[datetime] = None,
+                       end: Optional[datetime] = None):
+        """
+        Adiciona um cenário histórico: o retorno acumulado de cada coluna entre start e end. Colunas com nomes
+        de ativos recebem choques de ativo, colunas com nomes de traders (ex: curvas de equity de backtests)
+        choques de trader; as demais são ignoradas.
+
+        Args:
+            name: Nome do cenário. Sem start/end, deve ser uma chave de HISTORICAL_SCENARIOS ('2008', '2020', '2022')
+            prices: Preços (ou curvas de equity) históricos, índice = datas
+            start: Início da janela
+            end: Fim da janela
+        """
+        if start is None or end is None:
+            if name not in HISTORICAL_SCENARIOS:
+                raise ValueError(f"Cenário histórico desconhecido: {name}")
+            start, end = HISTORICAL_SCENARIOS[name]
+        window = prices.loc[start:end].ffill()
+        if len(window) < 2:
+            raise ValueError(f"Sem dados entre {start} e {end} para o cenário {name}")
+        returns = (window.iloc[-1] / window.iloc[0] - 1.0).dropna()
+        self.add_scenario(name, trader_shocks=returns[returns.index.isin(self.traders)].to_dict(),
+                          asset_shocks=returns[returns.index.isin(self.assets)].to_dict())
+
+    def add_historical_presets(self, prices: pd.DataFrame):
+        """Adiciona os cenários de HISTORICAL_SCENARIOS cobertos pelos preços informados."""
+        for name, (start, end) in HISTORICAL_SCENARIOS.items():
+            if len(prices.loc[start:end]) >= 2:
+                self.add_historical(name, prices, start, end)
+
+    def scenario_matrix(self) -> pd.DataFrame:
+        """Retorno de cada trader em cada cenário (cenários x traders)."""
+        if self._matrix is None:
+            n = len(self.names)
+            trader_shocks = np.array(self._trader_shocks).reshape(n, len(self.traders))
+            asset_shocks = np.array(self._asset_shocks).reshape(n, len(self.assets))
+            self._matrix = trader_shocks + asset_shocks @ self.exposures.T
+        return pd.DataFrame(self._matrix, index=self.names, columns=self.traders)
+
+    def _weights(self, weights: Union[Dict[str, float], pd.Series, np.ndarray, pd.DataFrame]) -> np.ndarray:
+        if isinstance(weights, pd.DataFrame):
+            return weights.reindex(self.traders).fillna(0.0).to_numpy(dtype=float)
+        if isinstance(weights, np.ndarray):
+            return weights.astype(float)
+        return pd.Series(weights, dtype=float).reindex(self.traders).fillna(0.0).to_numpy()
+
+    def evaluate(self, weights: Union[Dict[str, float], pd.Series, np.ndarray, pd.DataFrame],
+                 leverage: float = 1.0, equity: float = 1.0) -> Union[pd.Series, pd.DataFrame]:
+        """
+        P&L de todos os cenários para uma alocação, ou para várias de uma vez.
+
+        Args:
+            weights: Pesos dos traders (dicionário, Series, array na ordem de traders) ou DataFrame
+                (traders x alocações) com várias alocações
+            leverage: Alavancagem
+            equity: Capital base (1.0 retorna o P&L como fração do capital)
+
+        Returns:
+            Series (cenários) ou DataFrame (cenários x alocações) com o P&L (negativo em perdas)
+        """
+        self.scenario_matrix()
+        pnl = equity * leverage * (self._matrix @ self._weights(weights))
+        if isinstance(weights, pd.DataFrame):
+            return pd.DataFrame(pnl, index=self.names, columns=weights.columns)
+        return pd.Series(pnl, index=self.names)
+
+    def worst_case(self, weights: Union[Dict[str, float], pd.Series, np.ndarray],
+                   leverage: float = 1.0, equity: float = 1.0) -> Tuple[Optional[str], float]:
+        """
+        Pior cenário para a alocação.
+
+        Returns:
+            Tupla (nome do cenário, P&L), ou (None, 0.0) sem cenários
+        """
+        if not self.names:
+            return None, 0.0
+        pnl = self.evaluate(weights, leverage, equity)
+        return pnl.idxmin(), float(pnl.min())
+
+    def max_leverage(self, weights: Union[Dict[str, float], pd.Series, np.ndarray], max_loss: float) -> float:
+        """
+        Maior alavancagem com a qual nenhum cenário perde mais que max_loss (fração do capital). O P&L é linear
+        na alavancagem, então é max_loss dividido pela pior perda com alavancagem 1 (infinito se nenhum cenário perde).
+        """
+        _, pnl = self.worst_case(weights)
+        return max_loss / -pnl if pnl < 0 else np.inf